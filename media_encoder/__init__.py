@@ -16,7 +16,17 @@ __all__ = [
     'utils',
     'config',
     'data_manager',
-    'meta_updater'
+    'meta_updater',
+    'batch_encoder',
+    'encode_cache',
+    'library_sync',
+    'probe_cache',
+    'native_probe',
+    'scheduler',
+    'encode_history',
+    'benchmark',
+    'bulk_tagger',
+    'cover_art'
 ]
 
 # Clean up namespace
@@ -0,0 +1,462 @@
+"""
+Batch encoding engine for the Media Encoder.
+
+This module fans single-file ``Encoder`` jobs out over a bounded worker pool so
+that whole libraries can be converted using every available core. Results are
+yielded per file as soon as each job completes.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from loguru import logger
+from data_manager import ProfileDataManager, Profile
+from encoder import Encoder, ProgressEvent
+from encode_cache import EncodeCache
+from encode_history import EncodeHistory
+from scheduler import AdmissionPolicy, ScheduledJob
+from config import FFMPEG_PROFILES_PATH, get_logger
+
+if TYPE_CHECKING:
+    from meta_updater import TagPadding
+
+# Source file extensions picked up when scanning a directory
+SOURCE_EXTENSIONS = ('.flac', '.wav', '.mp3', '.m4a', '.mp4', '.aac', '.opus', '.ogg', '.aiff', '.aif')
+
+@dataclass(frozen=True)
+class BatchJob:
+    """
+    A single unit of work for the batch encoder.
+
+    Attributes:
+        input_path (str): Path to the source file
+        output_path (str): Optional target path, defaults to the input location
+        metadata_tags (dict): Optional metadata tags for this file only
+        output_paths (dict): Target path per profile name, set for multi-profile batches
+        profile (Profile): Optional profile overriding the batch one, single-profile batches only
+    """
+    input_path: str
+    output_path: Optional[str] = None
+    metadata_tags: Optional[Dict[str, str]] = None
+    output_paths: Optional[Dict[str, str]] = None
+    profile: Optional[Profile] = None
+
+@dataclass(frozen=True)
+class EncodeResult:
+    """
+    Outcome of a single batch job.
+
+    Attributes:
+        input_path (str): Path to the source file
+        output_path (str): Path to the encoded file, None if the job failed or
+            the batch has several profiles
+        success (bool): Whether the job succeeded
+        error (str): Error message when the job failed
+        elapsed (float): Wall time spent on the job in seconds
+        outputs (dict): Output path per profile name
+    """
+    input_path: str
+    output_path: Optional[str]
+    success: bool
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    outputs: Dict[str, str] = field(default_factory=dict)
+
+def _make_output_dirs(job: BatchJob) -> None:
+    for output_path in list((job.output_paths or {}).values()) + [job.output_path]:
+        if output_path:
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+def _copy(args: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # Encoder mutates some of the dicts it receives, never share them across jobs
+    return dict(args) if args else None
+
+def _encode_job(profiles: List[Profile], job: BatchJob, options: Dict[str, Any]) -> EncodeResult:
+    """Encode a single job. Module level so it can be pickled for process pools."""
+    start = time.perf_counter()
+    try:
+        _make_output_dirs(job)
+        # One encoder per job, FFmpegCommand instances are not thread safe
+        encoder = Encoder(profiles[0], cache=options.get('cache'), history=options.get('history'), tag_padding=options.get('tag_padding'))
+        if job.output_paths:
+            outputs = encoder.encode_many(
+                job.input_path,
+                profiles,
+                metadata_tags=_copy(job.metadata_tags),
+                ffmpeg_global_args=_copy(options.get('ffmpeg_global_args')),
+                profile_metadata=options.get('profile_metadata'),
+                output_paths=job.output_paths
+            )
+            return EncodeResult(job.input_path, None, True, elapsed=time.perf_counter() - start, outputs=outputs)
+
+        output_path = encoder.encode(
+            job.input_path,
+            job.output_path,
+            metadata_tags=_copy(job.metadata_tags),
+            ffmpeg_output_args=_copy(options.get('ffmpeg_output_args')),
+            ffmpeg_global_args=_copy(options.get('ffmpeg_global_args')),
+            progress=options.get('progress')
+        )
+        return EncodeResult(job.input_path, output_path, True, elapsed=time.perf_counter() - start,
+                            outputs={profiles[0].Name: output_path})
+    except Exception as e:
+        return EncodeResult(job.input_path, None, False, str(e), time.perf_counter() - start)
+
+async def _encode_job_async(encoder: Encoder, profiles: List[Profile], job: BatchJob, options: Dict[str, Any]) -> EncodeResult:
+    """Asyncio counterpart of _encode_job, cancellation propagates to the caller."""
+    start = time.perf_counter()
+    try:
+        _make_output_dirs(job)
+        if job.output_paths:
+            outputs = await encoder.encode_many_async(
+                job.input_path,
+                profiles,
+                metadata_tags=_copy(job.metadata_tags),
+                ffmpeg_global_args=_copy(options.get('ffmpeg_global_args')),
+                profile_metadata=options.get('profile_metadata'),
+                output_paths=job.output_paths
+            )
+            return EncodeResult(job.input_path, None, True, elapsed=time.perf_counter() - start, outputs=outputs)
+
+        output_path = await encoder.encode_async(
+            job.input_path,
+            job.output_path,
+            metadata_tags=_copy(job.metadata_tags),
+            ffmpeg_output_args=_copy(options.get('ffmpeg_output_args')),
+            ffmpeg_global_args=_copy(options.get('ffmpeg_global_args')),
+            progress=options.get('progress')
+        )
+        return EncodeResult(job.input_path, output_path, True, elapsed=time.perf_counter() - start,
+                            outputs={profiles[0].Name: output_path})
+    except Exception as e:
+        return EncodeResult(job.input_path, None, False, str(e), time.perf_counter() - start)
+
+class _Dispatcher:
+    """
+    Hand out the jobs to start, within the concurrency limit and the admission policies.
+
+    Without policies the jobs are pulled lazily. With policies the whole batch is
+    probed and ordered up front, then every waiting job is offered to the policies
+    in order, so smaller jobs fill the room a larger one can't use yet.
+    """
+    def __init__(self, jobs: Iterator[ScheduledJob], limit: int, policies: List[AdmissionPolicy], probe: Callable):
+        self.limit = limit
+        self.policies = policies
+        self._jobs = jobs
+        self._waiting: List[ScheduledJob] = []
+        if policies:
+            waiting = list(jobs)
+            metadata = probe([item.job.input_path for item in waiting]) if waiting else {}
+            waiting = [ScheduledJob(item.job, item.profiles, metadata.get(item.job.input_path)) for item in waiting]
+            for policy in policies:
+                waiting = policy.order(waiting)
+            self._waiting = waiting
+
+    def take(self, running: int) -> Tuple[List[ScheduledJob], List[EncodeResult]]:
+        """
+        Pick the jobs to start now.
+
+        Returns:
+            Tuple of (jobs to start, results of jobs no policy would ever admit)
+        """
+        started: List[ScheduledJob] = []
+        rejected: List[EncodeResult] = []
+        if not self.policies:
+            while running + len(started) < self.limit:
+                item = next(self._jobs, None)
+                if item is None:
+                    break
+                started.append(item)
+            return started, rejected
+
+        index = 0
+        while index < len(self._waiting) and running + len(started) < self.limit:
+            item = self._waiting[index]
+            reasons = [reason for reason in (policy.fits(item) for policy in self.policies) if reason]
+            if not reasons:
+                for policy in self.policies:
+                    policy.acquire(item)
+                started.append(self._waiting.pop(index))
+            elif index == 0 and running + len(started) == 0:
+                # nothing is running, no release will ever make room for it
+                self._waiting.pop(0)
+                rejected.append(EncodeResult(item.job.input_path, None, False, f"Not admitted: {'; '.join(reasons)}"))
+            else:
+                index += 1
+        return started, rejected
+
+    def release(self, item: ScheduledJob, result: EncodeResult) -> None:
+        for policy in self.policies:
+            policy.release(item, result)
+
+class BatchEncoder:
+    """
+    Encode many files with the same profile(s) over a bounded worker pool.
+
+    Threads are the default since the heavy lifting happens inside the ffmpeg
+    child processes; a process pool can be requested to also parallelize the
+    Python side of each job. With several profiles every job runs
+    Encoder.encode_many, so each source is decoded once and equivalent
+    profiles are encoded once.
+    """
+    def __init__(
+        self,
+        profile,
+        jobs: Optional[int] = None,
+        use_processes: bool = False,
+        logger: logger = None, # type: ignore
+        cache: Optional[EncodeCache] = None,
+        admission: Optional[Union[AdmissionPolicy, List[AdmissionPolicy]]] = None,
+        history: Optional[EncodeHistory] = None,
+        tag_padding: Optional["TagPadding"] = None
+    ):
+        """
+        Initialize the batch encoder.
+
+        Args:
+            profile: Profile name or Profile instance used for every job, or a list of them
+            jobs: Maximum number of concurrent jobs, defaults to the CPU count
+            use_processes: Use a process pool instead of a thread pool
+            logger: Optional logger instance. If not provided, creates a new one.
+            cache: Optional EncodeCache shared by every single-profile job
+            admission: Optional admission policy, or list of them, deciding when each job may
+                start (e.g. a CpuScheduler). ``jobs`` still bounds the number of running jobs.
+            history: Optional EncodeHistory recording the measurements of every single-profile job
+            tag_padding: Optional TagPadding reserved in the outputs of every single-profile job, see Encoder
+
+        Raises:
+            ValueError: If jobs is lower than 1 or the profile is unknown
+        """
+        self.profiles: List[Profile] = []
+        for item in (profile if isinstance(profile, (list, tuple)) else [profile]):
+            if isinstance(item, str):
+                item = ProfileDataManager().load_profiles(FFMPEG_PROFILES_PATH).get_profile_by_name(item)
+            elif not isinstance(item, Profile):
+                raise ValueError(f"Invalid profile: {item}")
+            if item.Name not in [known.Name for known in self.profiles]:
+                self.profiles.append(item)
+        if not self.profiles:
+            raise ValueError("At least one profile is required")
+        self.profile = self.profiles[0]
+
+        self.jobs = jobs if jobs is not None else (os.cpu_count() or 1)
+        if self.jobs < 1:
+            raise ValueError("Jobs must be a positive integer")
+
+        self.use_processes = use_processes
+        self.cache = cache
+        self.history = history
+        self.tag_padding = tag_padding
+        if admission is None:
+            admission = []
+        self.admission: List[AdmissionPolicy] = list(admission) if isinstance(admission, (list, tuple)) else [admission]
+        self.logger = logger if logger is not None else get_logger(__name__)
+        self._planner = Encoder(self.profile, logger=self.logger)
+
+    @staticmethod
+    def collect_jobs(
+        source_dir: str,
+        output_dir: Optional[str] = None,
+        metadata_tags: Optional[Dict[str, str]] = None,
+        extensions: Iterable[str] = SOURCE_EXTENSIONS
+    ) -> Iterator[BatchJob]:
+        """
+        Walk a directory and create a job for every supported source file.
+
+        Args:
+            source_dir: Directory to scan recursively
+            output_dir: Optional directory mirroring the source tree for the outputs
+            metadata_tags: Optional metadata tags applied to every job
+            extensions: File extensions to pick up
+
+        Returns:
+            Iterator of BatchJob, in a stable (sorted) order
+
+        Raises:
+            ValueError: If source_dir is not a directory
+        """
+        if not os.path.isdir(source_dir):
+            raise ValueError(f"Directory does not exist: {source_dir}")
+
+        extensions = tuple(ext.lower() for ext in extensions)
+        for root, dirs, files in os.walk(source_dir):
+            dirs.sort()
+            for file_name in sorted(files):
+                if not file_name.lower().endswith(extensions):
+                    continue
+                input_path = os.path.join(root, file_name)
+                output_path = None
+                if output_dir:
+                    output_path = os.path.join(output_dir, os.path.relpath(input_path, source_dir))
+                yield BatchJob(input_path, output_path, metadata_tags)
+
+    def encode(
+        self,
+        inputs: Iterable[Union[str, BatchJob]],
+        metadata_tags: Optional[Dict[str, str]] = None,
+        ffmpeg_output_args: Optional[Dict[str, str]] = None,
+        ffmpeg_global_args: Optional[Dict[str, str]] = None,
+        profile_metadata: Optional[Dict[str, Dict[str, str]]] = None,
+        progress: Optional[Callable[[ProgressEvent], None]] = None
+    ) -> Iterator[EncodeResult]:
+        """
+        Encode every input and yield the results in completion order.
+
+        Inputs are consumed lazily, at most ``jobs`` are in flight at any time. With
+        admission policies the inputs are collected and probed first, so the policies
+        can order the whole batch.
+
+        Args:
+            inputs: Input file paths or BatchJob instances
+            metadata_tags: Metadata tags for plain path inputs
+            ffmpeg_output_args: Additional FFmpeg output args for every job, single profile only
+            ffmpeg_global_args: Additional FFmpeg global args for every job
+            profile_metadata: Optional per-profile metadata tags, multiple profiles only
+            progress: Optional callback receiving the ProgressEvents of every single-profile job,
+                events carry the output path to tell the jobs apart. Not supported with use_processes,
+                callbacks can't reach back from the worker processes.
+
+        Returns:
+            Iterator of EncodeResult, one per input
+        """
+        if progress is not None and self.use_processes:
+            raise ValueError("progress callbacks are not supported with a process pool")
+        options = self._options(ffmpeg_output_args, ffmpeg_global_args, profile_metadata, progress)
+        executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        dispatcher = self._dispatcher(inputs, metadata_tags)
+        with executor_class(max_workers=self.jobs) as executor:
+            running = {}
+            while True:
+                started, rejected = dispatcher.take(len(running))
+                for item in started:
+                    running[executor.submit(_encode_job, item.profiles, item.job, options)] = item
+                for result in rejected:
+                    yield self._report(result)
+                if not running:
+                    if started or rejected:
+                        continue
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    dispatcher.release(running.pop(future), result)
+                    yield self._report(result)
+
+    async def encode_async(
+        self,
+        inputs: Iterable[Union[str, BatchJob]],
+        metadata_tags: Optional[Dict[str, str]] = None,
+        ffmpeg_output_args: Optional[Dict[str, str]] = None,
+        ffmpeg_global_args: Optional[Dict[str, str]] = None,
+        profile_metadata: Optional[Dict[str, Dict[str, str]]] = None,
+        progress: Optional[Callable[[ProgressEvent], None]] = None
+    ) -> AsyncIterator[EncodeResult]:
+        """
+        Asyncio counterpart of encode, driving every ffmpeg child from the running event loop.
+
+        At most ``jobs`` encodes run concurrently. Closing the iterator or cancelling
+        the consuming task cancels the in-flight jobs, which kills their ffmpeg children.
+
+        Args:
+            inputs: Input file paths or BatchJob instances
+            metadata_tags: Metadata tags for plain path inputs
+            ffmpeg_output_args: Additional FFmpeg output args for every job, single profile only
+            ffmpeg_global_args: Additional FFmpeg global args for every job
+            profile_metadata: Optional per-profile metadata tags, multiple profiles only
+            progress: Optional callback receiving the ProgressEvents of every single-profile job,
+                events carry the output path to tell the jobs apart. Jobs run on the event loop,
+                not in the pool, so use_processes doesn't apply.
+
+        Returns:
+            Async iterator of EncodeResult, in completion order
+        """
+        options = self._options(ffmpeg_output_args, ffmpeg_global_args, profile_metadata, progress)
+        encoders = {self.profile.Name: Encoder(self.profile, logger=self.logger, cache=self.cache, history=self.history, tag_padding=self.tag_padding)}
+        dispatcher = self._dispatcher(inputs, metadata_tags)
+        running = {}
+        try:
+            while True:
+                started, rejected = dispatcher.take(len(running))
+                for item in started:
+                    profile = item.profiles[0]
+                    if profile.Name not in encoders:
+                        encoders[profile.Name] = Encoder(profile, logger=self.logger, cache=self.cache, history=self.history, tag_padding=self.tag_padding)
+                    task = asyncio.ensure_future(_encode_job_async(encoders[profile.Name], item.profiles, item.job, options))
+                    running[task] = item
+                for result in rejected:
+                    yield self._report(result)
+                if not running:
+                    if started or rejected:
+                        continue
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    dispatcher.release(running.pop(task), result)
+                    yield self._report(result)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    def encode_all(self, inputs: Iterable[Union[str, BatchJob]], **kwargs) -> List[EncodeResult]:
+        """Encode every input and return all results once the batch is done."""
+        return list(self.encode(inputs, **kwargs))
+
+    def _as_jobs(self, inputs: Iterable[Union[str, BatchJob]], metadata_tags: Optional[Dict[str, str]]) -> Iterator[BatchJob]:
+        # Output paths are resolved here, in the dispatching thread, so that inputs
+        # sharing a base name (e.g. song.flac and song.wav) never race for one target
+        reserved = set()
+        for item in inputs:
+            job = item if isinstance(item, BatchJob) else BatchJob(item, None, metadata_tags)
+            if job.profile is not None:
+                if len(self.profiles) > 1:
+                    raise ValueError("Per-job profiles are only supported in single-profile batches")
+                output_path = self._planner._generate_unique_output_file_path(
+                    job.output_path or job.input_path, job.profile.Extension, reserved=reserved)
+                reserved.add(output_path)
+                yield BatchJob(job.input_path, output_path, job.metadata_tags, profile=job.profile)
+                continue
+            if len(self.profiles) > 1:
+                output_dir = os.path.dirname(job.output_path) if job.output_path else None
+                output_paths = job.output_paths or self._planner._generate_profile_output_paths(
+                    job.input_path, self.profiles, output_dir, reserved=reserved)
+                reserved.update(output_paths.values())
+                yield BatchJob(job.input_path, None, job.metadata_tags, output_paths)
+                continue
+            output_path = self._planner._generate_unique_output_file_path(
+                job.output_path or job.input_path, self.profile.Extension, reserved=reserved)
+            reserved.add(output_path)
+            yield BatchJob(job.input_path, output_path, job.metadata_tags)
+
+    def _dispatcher(self, inputs: Iterable[Union[str, BatchJob]], metadata_tags: Optional[Dict[str, str]]) -> _Dispatcher:
+        scheduled = (ScheduledJob(job, [job.profile] if job.profile else self.profiles)
+                     for job in self._as_jobs(inputs, metadata_tags))
+        return _Dispatcher(scheduled, self.jobs, self.admission,
+                           lambda paths: self._planner.get_metadata_many(paths, jobs=self.jobs))
+
+    def _options(self, ffmpeg_output_args, ffmpeg_global_args, profile_metadata, progress=None) -> Dict[str, Any]:
+        if ffmpeg_output_args and len(self.profiles) > 1:
+            raise ValueError("ffmpeg_output_args is only supported with a single profile")
+        return {
+            'ffmpeg_output_args': ffmpeg_output_args,
+            'ffmpeg_global_args': ffmpeg_global_args,
+            'profile_metadata': profile_metadata,
+            'cache': self.cache,
+            'history': self.history,
+            'tag_padding': self.tag_padding,
+            'progress': progress
+        }
+
+    def _report(self, result: EncodeResult) -> EncodeResult:
+        if result.success:
+            self.logger.success(f"Encoded: {result.input_path} -> {result.output_path} ({result.elapsed:.2f}s)")
+        else:
+            self.logger.error(f"Failed: {result.input_path}: {result.error}")
+        return result
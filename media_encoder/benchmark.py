@@ -0,0 +1,348 @@
+"""
+Encoder benchmarks for the Media Encoder.
+
+Synthesizes corpora of configurable duration, sample rate and bit depth with
+ffmpeg's lavfi sources, runs profiles over them and reports realtime factor,
+CPU time, peak memory and size ratio. Two modes are measured:
+
+- ``encode``: the regular ``Encoder.encode`` path, muxing to a file
+- ``null``: the same codec settings into the ``null`` muxer, the pure encode cost
+
+Reports are JSON so that runs on different builds or machines can be compared.
+"""
+
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from loguru import logger
+from data_manager import Profile
+from encoder import Encoder, FFmpegCommand
+from encode_history import parse_benchmark
+from native_probe import probe_file
+from utils import get_tool_version
+from config import FFMPEG_PATH, get_logger
+
+REPORT_VERSION = 1
+MODES = ('encode', 'null')
+
+# Global args of the benchmark runs: no -timelimit, long corpora must not be killed
+BENCH_GLOBAL_ARGS = {'-timelimit': None}
+
+# PCM codec per bit depth of the generated corpora
+PCM_CODECS = {16: 'pcm_s16le', 24: 'pcm_s24le', 32: 'pcm_s32le'}
+
+@dataclass(frozen=True)
+class CorpusSpec:
+    """
+    Settings of a synthesized benchmark source.
+
+    Attributes:
+        duration (float): Length in seconds
+        sample_rate (int): Sample rate in Hz
+        bit_depth (int): PCM bit depth, 16, 24 or 32
+        channels (int): Number of channels
+    """
+    duration: float = 30.0
+    sample_rate: int = 44100
+    bit_depth: int = 16
+    channels: int = 2
+
+    @property
+    def name(self) -> str:
+        return f"{self.sample_rate}Hz_{self.bit_depth}bit_{self.channels}ch_{self.duration:g}s"
+
+@dataclass(frozen=True)
+class BenchResult:
+    """
+    Measurements of one profile over one corpus.
+
+    Attributes:
+        profile (str): Profile name
+        corpus (str): Corpus name, see CorpusSpec.name
+        mode (str): 'encode' or 'null'
+        wall_seconds (float): Best wall time over the repeats
+        realtime_factor (float): Source seconds encoded per wall second
+        cpu_seconds (float): User plus system CPU time reported by ffmpeg, None if not reported
+        maxrss_kib (float): Peak resident memory reported by ffmpeg, None if not reported
+        size_ratio (float): Output bytes per input byte, None in null mode
+        error (str): Error message when the run failed
+    """
+    profile: str
+    corpus: str
+    mode: str
+    wall_seconds: Optional[float]
+    realtime_factor: Optional[float]
+    cpu_seconds: Optional[float] = None
+    maxrss_kib: Optional[float] = None
+    size_ratio: Optional[float] = None
+    error: Optional[str] = None
+
+def generate_corpus(spec: CorpusSpec, directory: str, ffmpeg_path: str = FFMPEG_PATH) -> str:
+    """
+    Synthesize a WAV source, reused when it already exists.
+
+    The signal mixes a tone sweep with pink noise, so lossless codecs get
+    something closer to music than pure silence or a single sine.
+
+    Raises:
+        ValueError: If the bit depth is not supported
+        subprocess.CalledProcessError: If ffmpeg fails
+    """
+    if spec.bit_depth not in PCM_CODECS:
+        raise ValueError(f"Unsupported bit depth: {spec.bit_depth}, expected one of {sorted(PCM_CODECS)}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"corpus_{spec.name}.wav")
+    if os.path.exists(path):
+        return path
+
+    rate, duration = spec.sample_rate, f"{spec.duration:g}"
+    graph = (f"sine=frequency=220:beep_factor=4:sample_rate={rate}:duration={duration}[tone];"
+             f"anoisesrc=color=pink:amplitude=0.25:sample_rate={rate}:duration={duration}[noise];"
+             f"[tone][noise]amix=inputs=2[mix]")
+    temp_path = os.path.join(directory, f".corpus_{spec.name}.partial.wav")
+    command = [ffmpeg_path, "-y", "-hide_banner", "-loglevel", "error", "-filter_complex", graph,
+               "-map", "[mix]", "-ac", str(spec.channels), "-c:a", PCM_CODECS[spec.bit_depth], temp_path]
+    subprocess.run(command, check=True, capture_output=True, text=True)
+    os.replace(temp_path, path)
+    return path
+
+class Benchmark:
+    """
+    Run profiles over synthesized corpora and collect BenchResults.
+    """
+    def __init__(
+        self,
+        profiles: Iterable[Profile],
+        corpora: Iterable[CorpusSpec],
+        modes: Iterable[str] = MODES,
+        repeat: int = 1,
+        work_dir: Optional[str] = None,
+        logger: logger = None # type: ignore
+    ):
+        """
+        Initialize the benchmark.
+
+        Args:
+            profiles: Profiles to measure
+            corpora: Sources to generate and encode
+            modes: Modes to measure, 'encode' and/or 'null'
+            repeat: Runs per measurement, the fastest one is kept
+            work_dir: Directory for corpora and outputs, a temporary one by default
+            logger: Optional logger instance. If not provided, creates a new one.
+
+        Raises:
+            ValueError: If a mode is unknown or repeat is lower than 1
+        """
+        self.profiles = list(profiles)
+        self.corpora = list(corpora)
+        self.modes = list(modes)
+        unknown = set(self.modes) - set(MODES)
+        if unknown:
+            raise ValueError(f"Unknown benchmark modes: {sorted(unknown)}")
+        if repeat < 1:
+            raise ValueError("Repeat must be a positive integer")
+        self.repeat = repeat
+        self.work_dir = work_dir
+        self.logger = logger if logger is not None else get_logger(__name__)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Generate the corpora, run every profile in every mode and build the report.
+
+        Returns:
+            The report, see save_report
+        """
+        work_dir = self.work_dir or tempfile.mkdtemp(prefix="media-encoder-bench-")
+        output_dir = os.path.join(work_dir, "out")
+        os.makedirs(output_dir, exist_ok=True)
+        results = []
+        try:
+            for spec in self.corpora:
+                source = generate_corpus(spec, os.path.join(work_dir, "corpora"))
+                duration = self._duration(source, spec)
+                for profile in self.profiles:
+                    for mode in self.modes:
+                        result = self._measure(profile, spec, source, duration, mode, output_dir)
+                        self.logger.info(f"bench {profile.Name} {spec.name} {mode}: {result.realtime_factor or 0:.1f}x")
+                        results.append(result)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+            if self.work_dir is None:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        return {
+            'version': REPORT_VERSION,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'ffmpeg': self._ffmpeg_version(),
+            'machine': {'platform': platform.platform(), 'processor': platform.processor(), 'cpu_count': os.cpu_count()},
+            'repeat': self.repeat,
+            'corpora': [dict(asdict(spec), name=spec.name) for spec in self.corpora],
+            'results': [asdict(result) for result in results],
+        }
+
+    def _measure(self, profile: Profile, spec: CorpusSpec, source: str, duration: float, mode: str, output_dir: str) -> BenchResult:
+        runs = []
+        try:
+            for _ in range(self.repeat):
+                runs.append(self._run_once(profile, source, mode, output_dir))
+        except Exception as e:
+            self.logger.error(f"bench {profile.Name} {spec.name} {mode} failed: {str(e)}")
+            return BenchResult(profile.Name, spec.name, mode, None, None, error=str(e))
+
+        wall_seconds, bench, output_bytes = min(runs, key=lambda run: run[0])
+        cpu_seconds = bench['utime'] + bench['stime'] if 'utime' in bench else None
+        return BenchResult(
+            profile=profile.Name,
+            corpus=spec.name,
+            mode=mode,
+            wall_seconds=wall_seconds,
+            realtime_factor=duration / wall_seconds if wall_seconds > 0 else None,
+            cpu_seconds=cpu_seconds,
+            maxrss_kib=bench.get('maxrss'),
+            size_ratio=output_bytes / os.path.getsize(source) if output_bytes is not None else None
+        )
+
+    def _run_once(self, profile: Profile, source: str, mode: str, output_dir: str):
+        """Run a single measurement, returns (wall seconds, -benchmark figures, output bytes or None)."""
+        encoder = Encoder(profile, logger=self.logger)
+        if mode == 'null':
+            command = encoder._build_command(FFmpegCommand(encoder.ffmpeg_cmd.ffmpeg_path, logger=self.logger),
+                                             source, "-", ffmpeg_output_args={'f': 'null'},
+                                             ffmpeg_global_args=BENCH_GLOBAL_ARGS)
+            start = time.perf_counter()
+            command.run(capture_stdout=True, capture_stderr=True)
+            return time.perf_counter() - start, parse_benchmark(command.stderr), None
+
+        output_path = os.path.join(output_dir, f"bench{profile.Extension}")
+        start = time.perf_counter()
+        output_path = encoder.encode(source, output_path, ffmpeg_global_args=BENCH_GLOBAL_ARGS)
+        wall_seconds = time.perf_counter() - start
+        try:
+            return wall_seconds, parse_benchmark(encoder.ffmpeg_cmd.stderr), os.path.getsize(output_path)
+        finally:
+            os.remove(output_path)
+
+    @staticmethod
+    def _duration(source: str, spec: CorpusSpec) -> float:
+        probed = probe_file(source)
+        try:
+            return float(probed['format']['duration'])
+        except (KeyError, TypeError, ValueError):
+            return spec.duration
+
+    @staticmethod
+    def _ffmpeg_version() -> Optional[str]:
+        try:
+            return get_tool_version(FFMPEG_PATH)
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+def save_report(report: Dict[str, Any], path: str) -> None:
+    """Write a report as JSON."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+def load_report(path: str) -> Dict[str, Any]:
+    """
+    Read a report written by save_report.
+
+    Raises:
+        ValueError: If the file is not a benchmark report of a supported version
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    if not isinstance(report, dict) or report.get('version') != REPORT_VERSION:
+        raise ValueError(f"Not a benchmark report (version {REPORT_VERSION}): {path}")
+    return report
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.05) -> List[Dict[str, Any]]:
+    """
+    Compare the measurements two reports have in common.
+
+    Args:
+        baseline: Reference report
+        current: New report
+        tolerance: Relative realtime factor drop flagged as a regression
+
+    Returns:
+        One row per (profile, corpus, mode) with the baseline and current realtime
+        factor and CPU time, their relative change and a regression flag
+    """
+    def index(report):
+        return {(result['profile'], result['corpus'], result['mode']): result
+                for result in report.get('results', []) if not result.get('error')}
+
+    def change(old, new):
+        return (new - old) / old if old and new is not None else None
+
+    baseline_results = index(baseline)
+    rows = []
+    for key, result in index(current).items():
+        reference = baseline_results.get(key)
+        if reference is None:
+            continue
+        speed_change = change(reference['realtime_factor'], result['realtime_factor'])
+        rows.append({
+            'profile': key[0],
+            'corpus': key[1],
+            'mode': key[2],
+            'baseline_realtime': reference['realtime_factor'],
+            'current_realtime': result['realtime_factor'],
+            'realtime_change': speed_change,
+            'baseline_cpu_seconds': reference.get('cpu_seconds'),
+            'current_cpu_seconds': result.get('cpu_seconds'),
+            'cpu_change': change(reference.get('cpu_seconds'), result.get('cpu_seconds')),
+            'regression': speed_change is not None and speed_change < -tolerance,
+        })
+    return rows
+
+def format_results(report: Dict[str, Any]) -> str:
+    """Table of the results of a report."""
+    from tabulate import tabulate
+    headers = ["Profile", "Corpus", "Mode", "Realtime x", "CPU (s)", "Peak RSS (MiB)", "Size Ratio", "Error"]
+    rows = []
+    for result in report.get('results', []):
+        rows.append([
+            result['profile'],
+            result['corpus'],
+            result['mode'],
+            _figure(result.get('realtime_factor'), 1),
+            _figure(result.get('cpu_seconds'), 3),
+            _figure(result['maxrss_kib'] / 1024 if result.get('maxrss_kib') is not None else None, 1),
+            _figure(result.get('size_ratio'), 3),
+            (result.get('error') or '').splitlines()[0][:60] if result.get('error') else ''
+        ])
+    return tabulate(rows, headers, tablefmt="github")
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    """Table of the rows returned by compare_reports."""
+    from tabulate import tabulate
+    headers = ["Profile", "Corpus", "Mode", "Realtime x", "Change", "CPU (s)", "Change", ""]
+    table = []
+    for row in rows:
+        table.append([
+            row['profile'],
+            row['corpus'],
+            row['mode'],
+            f"{_figure(row['baseline_realtime'], 1)} -> {_figure(row['current_realtime'], 1)}",
+            _percent(row['realtime_change']),
+            f"{_figure(row['baseline_cpu_seconds'], 3)} -> {_figure(row['current_cpu_seconds'], 3)}",
+            _percent(row['cpu_change']),
+            "REGRESSION" if row['regression'] else ""
+        ])
+    return tabulate(table, headers, tablefmt="github")
+
+def _figure(value: Optional[float], digits: int):
+    return round(value, digits) if value is not None else "-"
+
+def _percent(value: Optional[float]) -> str:
+    return f"{value * 100:+.1f}%" if value is not None else "-"
@@ -0,0 +1,236 @@
+"""
+Bulk metadata tagging for the Media Encoder.
+
+``BulkTagger`` applies tag lists to many files over a worker pool, one
+``AudioMetaUpdater`` per file writing all of its tags with a single save.
+Mutagen parses and serializes tags in pure Python, so a process pool is the
+default; every worker compiles the tag schema once and shares it between the
+files it tags. Results are yielded per file as soon as each one is done.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Mapping, Optional, Union
+from loguru import logger
+from config import MUTAGEN_AUDIO_TAGS, get_logger
+from utils import Tags, as_tag_list
+
+if TYPE_CHECKING:
+    from meta_updater import TagPadding
+
+# Extension of the per-file tag manifests read by collect_jobs, e.g. song.flac.json
+SIDECAR_EXTENSION = ".json"
+
+@dataclass
+class TagJob:
+    """
+    A single file to tag.
+
+    Attributes:
+        file_path (str): Path to the audio file
+        tags (list): Tags written to the file, in any format accepted by as_tag_list
+        error (str): Why the tags of the file couldn't be read, the job then fails without tagging
+    """
+    file_path: str
+    tags: Tags
+    error: Optional[str] = None
+
+@dataclass
+class TagResult:
+    """
+    Outcome of a single tag job.
+
+    Attributes:
+        file_path (str): Path to the audio file
+        success (bool): Whether all tags were written
+        error (str): Error message when the job failed
+        elapsed (float): Wall time spent on the job in seconds
+        tags (int): Number of tags written
+    """
+    file_path: str
+    success: bool
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    tags: int = 0
+
+def _tag_file(job: TagJob, options: Dict[str, Any]) -> TagResult:
+    """Tag a single file. Module level so it can be pickled for process pools."""
+    # imported here, so that importing this module doesn't load mutagen
+    from meta_updater import AudioMetaUpdater
+    start = time.perf_counter()
+    try:
+        tags = as_tag_list(job.tags)
+        updater = AudioMetaUpdater(job.file_path, options['tags_path'], padding=options['padding'])
+        updater.update_metadata_list(tags, options['encoding'], options['lang'])
+        return TagResult(job.file_path, True, elapsed=time.perf_counter() - start, tags=len(tags))
+    except Exception as e:
+        return TagResult(job.file_path, False, str(e), time.perf_counter() - start)
+
+class BulkTagger:
+    """
+    Tag many audio files in parallel.
+
+    Every file is opened once and saved once, whatever the number of tags. A
+    process pool is used by default since tagging is CPU-bound Python; a
+    thread pool avoids the process start up for small batches.
+    """
+    def __init__(
+        self,
+        jobs: Optional[int] = None,
+        use_processes: bool = True,
+        tags_path: str = MUTAGEN_AUDIO_TAGS,
+        encoding: int = 3,
+        lang: str = 'eng',
+        logger: logger = None, # type: ignore
+        padding: Optional["TagPadding"] = None
+    ):
+        """
+        Initialize the bulk tagger.
+
+        Args:
+            jobs: Maximum number of concurrent files, defaults to the CPU count
+            use_processes: Use a process pool instead of a thread pool
+            tags_path: Path to the tags mapping file
+            encoding: The encoding to use for the metadata (1-4)
+            lang: The language code to use for the metadata (ISO 639-2)
+            logger: Optional logger instance. If not provided, creates a new one.
+            padding: Optional TagPadding of the saves, so that files tagged again later are
+                updated in place. Mutagen's default padding when not provided.
+
+        Raises:
+            ValueError: If jobs is lower than 1
+        """
+        self.jobs = jobs if jobs is not None else (os.cpu_count() or 1)
+        if self.jobs < 1:
+            raise ValueError("Jobs must be a positive integer")
+        self.use_processes = use_processes
+        self.tags_path = tags_path
+        self.encoding = encoding
+        self.lang = lang
+        self.padding = padding
+        self.logger = logger if logger is not None else get_logger(__name__)
+
+    @staticmethod
+    def collect_jobs(
+        directory: str,
+        manifest_path: Optional[str] = None,
+        tags: Optional[Tags] = None
+    ) -> Iterator[TagJob]:
+        """
+        Walk a directory and create a job for every audio file with tags to write.
+
+        The tags of a file come from the manifest, a JSON object mapping file paths
+        (relative to the directory, or absolute) to tags, or without a manifest
+        from a sidecar file next to it (song.flac -> song.flac.json). Tags given
+        here apply to every file, before its own ones. Files left without tags are skipped,
+        files whose sidecar or manifest entry is invalid get a job carrying the error.
+
+        Args:
+            directory: Directory to scan recursively
+            manifest_path: Optional JSON manifest of the tags per file
+            tags: Optional tags written to every file
+
+        Returns:
+            Iterator of TagJob, in a stable (sorted) order
+
+        Raises:
+            ValueError: If directory is not a directory or the manifest is not a JSON object
+        """
+        from meta_updater import AudioMetaUpdater
+        if not os.path.isdir(directory):
+            raise ValueError(f"Directory does not exist: {directory}")
+
+        manifest = None
+        if manifest_path is not None:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("Tag manifest must map file paths to tags")
+            manifest = {os.path.normpath(os.path.join(directory, path)): value for path, value in data.items()}
+
+        common = as_tag_list(tags) if tags else []
+        extensions = tuple(AudioMetaUpdater.SUPPORTED_FORMATS)
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for file_name in sorted(files):
+                if not file_name.lower().endswith(extensions):
+                    continue
+                file_path = os.path.join(root, file_name)
+                try:
+                    if manifest is not None:
+                        own = manifest.get(os.path.normpath(file_path))
+                    else:
+                        own = BulkTagger._read_sidecar(file_path + SIDECAR_EXTENSION)
+                    file_tags = common + (as_tag_list(own) if own else [])
+                except (OSError, ValueError) as e:
+                    # a bad sidecar or manifest entry fails its own file, not the batch
+                    yield TagJob(file_path, [], f"Invalid tags: {str(e)}")
+                    continue
+                if file_tags:
+                    yield TagJob(file_path, file_tags)
+
+    def tag(self, inputs: Union[Mapping[str, Tags], Iterable[TagJob]]) -> Iterator[TagResult]:
+        """
+        Tag every file and yield the results in completion order.
+
+        Inputs are consumed lazily, only a couple of jobs per worker are queued at any time.
+
+        Args:
+            inputs: Mapping of file path to tags, or TagJob instances
+
+        Returns:
+            Iterator of TagResult, one per file
+        """
+        options = {'tags_path': self.tags_path, 'encoding': self.encoding, 'lang': self.lang, 'padding': self.padding}
+        jobs = self._as_jobs(inputs)
+        executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=self.jobs) as executor:
+            running = set()
+            exhausted = False
+            while True:
+                # tagging a file is short, keep the workers fed while results come back
+                while not exhausted and len(running) < self.jobs * 2:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                    elif job.error is not None:
+                        yield self._report(TagResult(job.file_path, False, job.error))
+                    else:
+                        running.add(executor.submit(_tag_file, job, options))
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield self._report(future.result())
+
+    def tag_all(self, inputs: Union[Mapping[str, Tags], Iterable[TagJob]]) -> List[TagResult]:
+        """Tag every file and return all results once the batch is done."""
+        return list(self.tag(inputs))
+
+    @staticmethod
+    def _as_jobs(inputs: Union[Mapping[str, Tags], Iterable[TagJob]]) -> Iterator[TagJob]:
+        if isinstance(inputs, Mapping):
+            for file_path, tags in inputs.items():
+                yield TagJob(file_path, tags)
+            return
+        for job in inputs:
+            if not isinstance(job, TagJob):
+                raise ValueError(f"Invalid tag job: {job}")
+            yield job
+
+    @staticmethod
+    def _read_sidecar(sidecar_path: str) -> Optional[Tags]:
+        if not os.path.isfile(sidecar_path):
+            return None
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _report(self, result: TagResult) -> TagResult:
+        if result.success:
+            self.logger.success(f"Tagged: {result.file_path} ({result.tags} tags, {result.elapsed:.2f}s)")
+        else:
+            self.logger.error(f"Failed: {result.file_path}: {result.error}")
+        return result
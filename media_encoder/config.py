@@ -1,5 +1,6 @@
 import os
 import sys
+import threading
 from loguru import logger
 
 def resolve_root(path:str):    
@@ -14,11 +15,36 @@ FFPROBE_PATH = os.environ.get("FFPROBE_PATH", resolve_root("build/ffprobe.exe"))
 FFMPEG_PROFILES_PATH = os.environ.get("FFMPEG_PROFILES_PATH", resolve_root("media_encoder/_config/ffmpeg.audio.profiles.json"))
 FFMPEG_GLOBALARGS_PATH = os.environ.get("FFMPEG_GLOBALARGS_PATH", resolve_root("media_encoder/_config/ffmpeg.audio.arguments.json"))
 MUTAGEN_AUDIO_TAGS = os.environ.get("MUTAGEN_AUDIO_TAGS", resolve_root("media_encoder/_config/mutagen.audio.tags.json"))
+ENCODE_CACHE_PATH = os.environ.get("ENCODE_CACHE_PATH", resolve_root(".cache/encodes"))
+ENCODE_CACHE_MAX_BYTES = int(os.environ.get("ENCODE_CACHE_MAX_BYTES", 10 * 1024 ** 3))
+PROBE_CACHE_PATH = os.environ.get("PROBE_CACHE_PATH", resolve_root(".cache/probes.sqlite3"))
+ENCODE_HISTORY_PATH = os.environ.get("ENCODE_HISTORY_PATH", resolve_root(".cache/history.sqlite3"))
+DISK_HEADROOM_BYTES = int(os.environ.get("DISK_HEADROOM_BYTES", 1024 ** 3))
+COVER_ART_CACHE_MAX_BYTES = int(os.environ.get("COVER_ART_CACHE_MAX_BYTES", 64 * 1024 ** 2))
+TAG_PADDING_BYTES = int(os.environ.get("TAG_PADDING_BYTES", 64 * 1024))
+TAG_PADDING_GROWTH = float(os.environ.get("TAG_PADDING_GROWTH", 2.0))
 
 
-# Configure the shared logger
-logger.add("app.log", rotation="5 MB", level="DEBUG", format="{time} {level} {message}", enqueue=True)
+# The shared app.log sink is added by the first get_logger call: an enqueued sink starts a
+# writer thread, which invocations that never log shouldn't pay for
+_file_sink_lock = threading.Lock()
+_file_sink_id = None
+
+def configure_file_sink() -> bool:
+    """Add the shared app.log sink unless it is already configured, returns whether it was added."""
+    global _file_sink_id
+    with _file_sink_lock:
+        if _file_sink_id is not None:
+            return False
+        _file_sink_id = logger.add("app.log", rotation="5 MB", level="DEBUG", format="{time} {level} {message}", enqueue=True)
+        return True
+
+def file_sink_configured() -> bool:
+    """Whether the shared app.log sink has been added."""
+    return _file_sink_id is not None
 
 # Function to get the logger
 def get_logger(name):
-    return logger.bind(module=name)
\ No newline at end of file
+    if _file_sink_id is None:
+        configure_file_sink()
+    return logger.bind(module=name)
@@ -0,0 +1,228 @@
+"""
+Cover art cache for the Media Encoder.
+
+Tagging an album embeds the same image in every track. ``CoverArtCache``
+reads each image file once, detects its MIME type and dimensions from the
+image header, and keeps the prepared payload of every tag format (FLAC
+``Picture``, ID3 ``APIC``, ``MP4Cover``) so all tracks share one in-memory
+buffer. Entries are keyed by content, so copies of the same image at
+different paths are stored once, and evicted least recently used once the
+cache exceeds its size budget.
+"""
+
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from mutagen.flac import Picture
+from mutagen.id3 import APIC
+from mutagen.mp4 import MP4Cover
+from config import COVER_ART_CACHE_MAX_BYTES
+
+# ID3/FLAC picture type of a front cover
+FRONT_COVER = 3
+
+# JPEG start of frame markers, they carry the image dimensions
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# JPEG markers without a length field
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8, 0xD9}
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Channels per PNG color type
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+class CoverArtError(Exception):
+    """Raised for images that can't be embedded as cover art."""
+    pass
+
+class CoverImage:
+    """
+    A cover image with its header information and the tag payloads built from it.
+
+    Payloads are built on first use and shared by every file tagged with the
+    image, they must not be modified.
+
+    Attributes:
+        data (bytes): Image file content
+        mime (str): MIME type detected from the header, 'image/jpeg' or 'image/png'
+        width (int): Width in pixels, 0 if the header doesn't tell
+        height (int): Height in pixels, 0 if the header doesn't tell
+        depth (int): Bits per pixel, 0 if the header doesn't tell
+        digest (str): SHA-1 of the content
+    """
+
+    def __init__(self, data: bytes, mime: str, width: int, height: int, depth: int, digest: str):
+        self.data = data
+        self.mime = mime
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self.digest = digest
+        self._payloads: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def flac_picture(self) -> Picture:
+        """FLAC/Vorbis Picture block of the image."""
+        return self._payload(('flac',), self._build_picture)
+
+    def apic(self, encoding: int = 3) -> APIC:
+        """ID3 APIC frame of the image."""
+        return self._payload(('apic', encoding), lambda: APIC(
+            encoding=encoding,
+            mime=self.mime,
+            type=FRONT_COVER,
+            desc='Cover',
+            data=self.data
+        ))
+
+    def mp4_cover(self) -> MP4Cover:
+        """MP4 covr atom value of the image."""
+        image_format = MP4Cover.FORMAT_PNG if self.mime == 'image/png' else MP4Cover.FORMAT_JPEG
+        return self._payload(('mp4',), lambda: MP4Cover(self.data, imageformat=image_format))
+
+    def _build_picture(self) -> Picture:
+        picture = Picture()
+        picture.type = FRONT_COVER
+        picture.mime = self.mime
+        picture.width = self.width
+        picture.height = self.height
+        picture.depth = self.depth
+        picture.data = self.data
+        return picture
+
+    def _payload(self, key: Tuple, build):
+        with self._lock:
+            payload = self._payloads.get(key)
+            if payload is None:
+                payload = self._payloads[key] = build()
+            return payload
+
+def probe_image(data: bytes) -> Optional[Tuple[str, int, int, int]]:
+    """
+    Detect the MIME type, width, height and bits per pixel of an image from its header.
+
+    Returns:
+        Tuple of (mime, width, height, depth), None if the data is neither JPEG nor PNG
+    """
+    if not isinstance(data, bytes):
+        return None
+    if data.startswith(PNG_SIGNATURE) and len(data) >= 26 and data[12:16] == b'IHDR':
+        width, height, bit_depth, color_type = struct.unpack('>IIBB', data[16:26])
+        return 'image/png', width, height, bit_depth * PNG_CHANNELS.get(color_type, 1)
+    if data.startswith(b'\xff\xd8\xff'):
+        width, height, depth = _jpeg_dimensions(data)
+        return 'image/jpeg', width, height, depth
+    return None
+
+def _jpeg_dimensions(data: bytes) -> Tuple[int, int, int]:
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            break
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # fill byte before a marker
+            position += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            position += 2
+            continue
+        length = struct.unpack('>H', data[position + 2:position + 4])[0]
+        if marker in JPEG_SOF_MARKERS and position + 10 <= len(data):
+            precision, height, width, components = struct.unpack('>BHHB', data[position + 4:position + 10])
+            return width, height, precision * components
+        position += 2 + length
+    return 0, 0, 0
+
+class CoverArtCache:
+    """
+    Size-bounded cache of cover images, keyed by content.
+
+    A path is only read again when its modification time or size changes.
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_bytes: int = COVER_ART_CACHE_MAX_BYTES):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Total image bytes kept in memory, 0 disables caching
+
+        Raises:
+            ValueError: If max_bytes is negative
+        """
+        if max_bytes < 0:
+            raise ValueError("Cache size must not be negative")
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._lock = threading.Lock()
+        self._images: "OrderedDict[str, CoverImage]" = OrderedDict()
+        # path -> (mtime, size, digest) of the content last read from it
+        self._paths: Dict[str, Tuple[int, int, str]] = {}
+
+    def load(self, image_path: str) -> CoverImage:
+        """
+        Return the cover image of a file, reading it only if it isn't cached.
+
+        Raises:
+            OSError: If the file can't be read
+            CoverArtError: If the file is neither a JPEG nor a PNG image
+        """
+        version = self._version(image_path)
+        if version is not None:
+            with self._lock:
+                known = self._paths.get(os.path.abspath(image_path))
+                if known is not None and known[:2] == version and known[2] in self._images:
+                    self._images.move_to_end(known[2])
+                    return self._images[known[2]]
+
+        with open(image_path, 'rb') as f:
+            data = f.read()
+        probed = probe_image(data)
+        if probed is None:
+            ext = os.path.splitext(image_path)[1].lower()
+            raise CoverArtError(f"Unsupported image format: {ext}")
+        digest = hashlib.sha1(data).hexdigest()
+
+        with self._lock:
+            image = self._images.get(digest)
+            if image is None:
+                image = CoverImage(data, *probed, digest)
+                self._store(image)
+            else:
+                self._images.move_to_end(digest)
+            if version is not None and digest in self._images:
+                self._paths[os.path.abspath(image_path)] = (*version, digest)
+        return image
+
+    def clear(self) -> None:
+        """Drop every cached image."""
+        with self._lock:
+            self._images.clear()
+            self._paths.clear()
+            self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def _store(self, image: CoverImage) -> None:
+        if len(image.data) > self.max_bytes:
+            return
+        self._images[image.digest] = image
+        self.size_bytes += len(image.data)
+        while self.size_bytes > self.max_bytes:
+            _, evicted = self._images.popitem(last=False)
+            self.size_bytes -= len(evicted.data)
+
+    @staticmethod
+    def _version(image_path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+# Cache shared by every AudioMetaUpdater of the process
+COVER_ART_CACHE = CoverArtCache()
@@ -1,14 +1,91 @@
+import dataclasses
+import operator
+import os
+import threading
+from functools import lru_cache
 from utils import JsonLoader
-from typing import Dict, List
-from models import Profile, Argument   
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from models import BASELINE_PROFILE, Profile, Argument   
 
-class ProfileDataManager:
+# FFmpeg option aliases folded together when comparing profile setups
+SETUP_ALIASES = {
+    'c:a': 'acodec',
+    'codec:a': 'acodec',
+    'ab': 'b:a',
+}
 
-    def __init__(self):        
-        self.profiles: List[Profile] = None
-        self.arguments: List[Argument] = None
+@lru_cache(maxsize=None)
+def _parse_setup(setup: str) -> Tuple[Tuple[str, str], ...]:
+    return tuple(tuple(item.strip().split("=")) for item in setup.split(","))
 
-    def load_profiles(self, profiles_path: str) :
+def _same_items(snapshot: Optional[Tuple], items: Optional[List]) -> bool:
+    """Whether a list still holds exactly the objects it held when the snapshot was taken."""
+    return snapshot is not None and items is not None and len(snapshot) == len(items) and all(map(operator.is_, snapshot, items))
+
+class ProfileIndex:
+    """
+    Profiles with lookups by lowercased name, codec and extension.
+
+    Building the index also parses every FFmpegSetup once, later
+    get_FFmpegSetup_as_dict calls are served from the parsed setups.
+    """
+
+    def __init__(self, profiles: Iterable[Profile]):
+        self.profiles: List[Profile] = list(profiles)
+        self.by_name: Dict[str, Profile] = {}
+        self.by_codec: Dict[str, List[Profile]] = {}
+        self.by_extension: Dict[str, List[Profile]] = {}
+        for profile in self.profiles:
+            # the first profile of a name wins, as with the linear scan
+            self.by_name.setdefault(profile.Name.lower(), profile)
+            self.by_codec.setdefault(profile.Codec.lower(), []).append(profile)
+            self.by_extension.setdefault(profile.Extension.lower(), []).append(profile)
+            _parse_setup(profile.FFmpegSetup)
+
+class ProfileRegistry:
+    """
+    Process-wide cache of the parsed profiles and global arguments files.
+
+    Every file is parsed once and parsed again only when its modification
+    time or size changes, so building an Encoder per job costs a stat call
+    instead of a JSON parse. Safe to share between threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (path, kind) -> ((mtime, size), parsed content)
+        self._entries: Dict[Tuple[str, str], Tuple[Tuple[int, int], Any]] = {}
+
+    def profiles(self, profiles_path: str) -> ProfileIndex:
+        """Indexed profiles of a profiles file."""
+        return self._get(profiles_path, 'profiles', self._parse_profiles)
+
+    def arguments(self, arguments_path: str) -> Tuple[List[Argument], Dict[str, str]]:
+        """Arguments of a global arguments file, as a list and as a name -> default dict."""
+        return self._get(arguments_path, 'arguments', self._parse_arguments)
+
+    def clear(self) -> None:
+        """Forget every parsed file."""
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, path: str, kind: str, parse: Callable[[str], Any]) -> Any:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # let JsonLoader report the missing file, nothing gets cached
+            return parse(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = (os.path.abspath(path), kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                entry = (version, parse(path))
+                self._entries[key] = entry
+            return entry[1]
+
+    @staticmethod
+    def _parse_profiles(profiles_path: str) -> ProfileIndex:
         data = JsonLoader(profiles_path).load()
         profiles_lst = []
         for profile in data["Profiles"]:
@@ -21,41 +98,126 @@ class ProfileDataManager:
                 CpuFactor=float(profile["CpuFactor"]),
                 Description=profile["Description"]
             )
-            profiles_lst.append(profile_obj)            
-        self.profiles = profiles_lst
+            profiles_lst.append(profile_obj)
+        return ProfileIndex(profiles_lst)
+
+    @staticmethod
+    def _parse_arguments(arguments_path: str) -> Tuple[List[Argument], Dict[str, str]]:
+        data = JsonLoader(arguments_path).load()
+        arguments = [Argument(**argument) for argument in data]
+        return arguments, {argument.Name: argument.Default for argument in arguments}
+
+# Registry shared by every ProfileDataManager of the process
+PROFILE_REGISTRY = ProfileRegistry()
+
+class ProfileDataManager:
+
+    def __init__(self, registry: Optional[ProfileRegistry] = None):        
+        self.profiles: List[Profile] = None
+        self.arguments: List[Argument] = None
+        self.registry = registry if registry is not None else PROFILE_REGISTRY
+        self._index: Optional[ProfileIndex] = None
+        self._indexed_profiles: Optional[Tuple[Profile, ...]] = None
+        self._arguments_dict: Optional[Dict[str, str]] = None
+        self._dict_arguments: Optional[Tuple[Argument, ...]] = None
+
+    def load_profiles(self, profiles_path: str) :
+        index = self.registry.profiles(profiles_path)
+        self.profiles = list(index.profiles)
+        self._index, self._indexed_profiles = index, tuple(self.profiles)
+        return self
+
+    def apply_measurements(self, history, source_format: Optional[str] = None, min_samples: int = 3):
+        """
+        Replace the static SizeFactor/CpuFactor of the loaded profiles with the figures
+        fitted from an EncodeHistory.
+
+        Profiles with fewer than min_samples recorded encodes keep their static
+        figures, as does a figure that can't be fitted (e.g. no -benchmark output).
+        CpuFactors are relative to the baseline profile (MP3 320 kbps), they are
+        kept static until the baseline has min_samples encodes too.
+
+        Args:
+            history: EncodeHistory holding the recorded encodes
+            source_format: Optional source extension (e.g. 'flac') to prefer figures measured on it,
+                falling back to the figures of all formats
+            min_samples: Number of encodes required before a measurement is trusted
+        """
+        estimates = history.estimates()
+        baseline = estimates.get((BASELINE_PROFILE, None))
+        baseline_trusted = baseline is not None and baseline.samples >= min_samples
+        if source_format:
+            by_format = history.estimates(by_source_format=True)
+            for (name, fmt), estimate in by_format.items():
+                if fmt == source_format.lstrip('.').lower() and estimate.samples >= min_samples:
+                    estimates[(name, None)] = estimate
+
+        measured = []
+        for profile in self.profiles:
+            estimate = estimates.get((profile.Name, None))
+            if estimate is not None and estimate.samples >= min_samples:
+                profile = dataclasses.replace(
+                    profile,
+                    SizeFactor=round(estimate.size_factor, 2) if estimate.size_factor is not None else profile.SizeFactor,
+                    CpuFactor=round(estimate.cpu_factor, 2) if estimate.cpu_factor is not None and baseline_trusted else profile.CpuFactor)
+            measured.append(profile)
+        self.profiles = measured
         return self
 
     def load_arguments(self, globals_args_path: str):
-        data =  JsonLoader(globals_args_path).load()
-        self.arguments = [Argument(**argument) for argument in data]
+        arguments, self._arguments_dict = self.registry.arguments(globals_args_path)
+        self.arguments = list(arguments)
+        self._dict_arguments = tuple(self.arguments)
         return self
 
     def get_profile_by_name(self, profile_name: str) -> Profile:
-        for profile in self.profiles:
-            if profile_name.lower() == profile.Name.lower():
-                return profile
-        raise ValueError(f"Profile '{profile_name}' not found")
+        profile = self._indexed().by_name.get(profile_name.lower())
+        if profile is None:
+            raise ValueError(f"Profile '{profile_name}' not found")
+        return profile
 
     def get_profiles_by_codec(self, codec: str) -> List[Profile]:
-        profiles = []
-        for profile in self.profiles:
-            if profile.Codec.lower() == codec.lower():
-                profiles.append(profile)
-        return profiles
+        return list(self._indexed().by_codec.get(codec.lower(), []))
 
     def get_profiles_by_extension(self, extension: str) -> List[Profile]:
-        profiles = []
-        for profile in self.profiles:
-            if profile.Extension.lower() == extension.lower():
-                profiles.append(profile)
-        return profiles
+        return list(self._indexed().by_extension.get(extension.lower(), []))
+
+    def _indexed(self) -> ProfileIndex:
+        # rebuilt when the list or any profile in it was replaced since, e.g. by apply_measurements
+        if self._index is None or not _same_items(self._indexed_profiles, self.profiles):
+            self._index, self._indexed_profiles = ProfileIndex(self.profiles), tuple(self.profiles)
+        return self._index
     
     @staticmethod
     def get_FFmpegSetup_as_dict(profile:Profile)->Dict[str,str]:
-        # Return FFmpegSetup as dict str
-        return dict(item.strip().split("=") for item in profile.FFmpegSetup.split(","))
+        # Return FFmpegSetup as dict str, parsed once per distinct setup
+        return dict(_parse_setup(profile.FFmpegSetup))
+
+    @staticmethod
+    def get_equivalence_key(profile: Profile) -> Tuple:
+        """
+        Key shared by profiles that produce byte-identical encodings.
+
+        The FFmpegSetup is normalized (lowercased option names, folded aliases,
+        sorted options) and combined with the extension, which selects the muxer.
+        """
+        setup = {}
+        for key, value in ProfileDataManager.get_FFmpegSetup_as_dict(profile).items():
+            key = key.strip().lower()
+            setup[SETUP_ALIASES.get(key, key)] = value.strip()
+        return (profile.Extension.lower(), tuple(sorted(setup.items())))
+
+    @staticmethod
+    def group_equivalent_profiles(profiles: Iterable[Profile]) -> Dict[Tuple, List[Profile]]:
+        """Group profiles by equivalence key, keeping the input order inside each group."""
+        groups: Dict[Tuple, List[Profile]] = {}
+        for profile in profiles:
+            groups.setdefault(ProfileDataManager.get_equivalence_key(profile), []).append(profile)
+        return groups
 
     def get_arguments_as_dict(self)->Dict[str,str]:
+        if _same_items(self._dict_arguments, self.arguments):
+            return dict(self._arguments_dict)
         arguments_as_dic: Dict[str, Argument] = {}
         for argument in self.arguments:
             arguments_as_dic[argument.Name] = argument.Default
@@ -0,0 +1,221 @@
+"""
+Content-addressed encode cache for the Media Encoder.
+
+Encoded artifacts are stored under a key derived from everything that can
+change the output bytes: the input content, the output and global FFmpeg
+arguments, the metadata tags and the ffmpeg version. Re-running a pipeline
+over an unchanged library then serves every file from the cache instead of
+spawning ffmpeg. The cache is bounded in size and evicts least recently used
+artifacts first.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+from config import ENCODE_CACHE_PATH, ENCODE_CACHE_MAX_BYTES, get_logger
+from utils import materialize_file
+
+@dataclass(frozen=True)
+class CacheStats:
+    """
+    Snapshot of the cache content.
+
+    Attributes:
+        cache_dir (str): Root directory of the cache
+        entries (int): Number of stored artifacts
+        size_bytes (int): Total size of the stored artifacts
+        max_size_bytes (int): Size budget enforced by pruning
+    """
+    cache_dir: str
+    entries: int
+    size_bytes: int
+    max_size_bytes: int
+
+class EncodeCache:
+    """
+    On-disk, size-bounded LRU cache of encoded files.
+
+    Recency is tracked with the artifact modification time, which is refreshed
+    on every hit, so no index has to be kept in sync with the objects.
+    """
+
+    OBJECTS_DIR = "objects"
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(
+        self,
+        cache_dir: str = ENCODE_CACHE_PATH,
+        max_size_bytes: int = ENCODE_CACHE_MAX_BYTES,
+        allow_hardlinks: bool = False,
+        logger: logger = None # type: ignore
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Root directory of the cache, created on first store
+            max_size_bytes: Size budget, least recently used artifacts are evicted beyond it
+            allow_hardlinks: Serve hits as hardlinks. Only safe when outputs are never
+                modified in place afterwards (e.g. retagged), since that would alter the cache
+            logger: Optional logger instance. If not provided, creates a new one.
+
+        Raises:
+            ValueError: If max_size_bytes is negative
+        """
+        if max_size_bytes < 0:
+            raise ValueError("Cache size must not be negative")
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.allow_hardlinks = allow_hardlinks
+        self.logger = logger if logger is not None else get_logger(__name__)
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+
+    def file_digest(self, file_path: str) -> str:
+        """SHA-256 of the file content, memoized per (path, size, mtime_ns)."""
+        stat = os.stat(file_path)
+        memo_key = (os.path.realpath(file_path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(memo_key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b''):
+                    sha.update(chunk)
+            digest = self._digests[memo_key] = sha.hexdigest()
+        return digest
+
+    def make_key(
+        self,
+        input_file_path: str,
+        extension: str,
+        output_args: Dict[str, str],
+        global_args: List[str],
+        metadata_tags: Optional[Dict[str, str]],
+        ffmpeg_version: str
+    ) -> str:
+        """
+        Build the cache key of an encode.
+
+        Args:
+            input_file_path: Path to the input file, hashed by content
+            extension: Output extension, it selects the muxer
+            output_args: Normalized FFmpeg output args
+            global_args: Formatted FFmpeg global args
+            metadata_tags: Metadata tags written by ffmpeg
+            ffmpeg_version: Version string of the ffmpeg binary
+
+        Returns:
+            Hex digest identifying the encoded artifact
+        """
+        material = {
+            'input': self.file_digest(input_file_path),
+            'extension': extension.lower(),
+            'output_args': sorted((str(key), str(value)) for key, value in output_args.items()),
+            'global_args': [str(arg) for arg in global_args],
+            'metadata': sorted((str(key), str(value)) for key, value in (metadata_tags or {}).items()),
+            'ffmpeg': ffmpeg_version
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, key: str, extension: str, target_path: str) -> Optional[str]:
+        """
+        Serve a cached artifact by materializing it at target_path.
+
+        Returns:
+            The method used ('reflink', 'hardlink' or 'copy'), None on a miss
+        """
+        object_path = self._object_path(key, extension)
+        if not os.path.isfile(object_path):
+            return None
+        try:
+            method = materialize_file(object_path, target_path, allow_hardlink=self.allow_hardlinks)
+            # refresh recency for the LRU eviction
+            os.utime(object_path)
+        except OSError as e:
+            self.logger.warning(f"Failed to serve cached encode {key}: {str(e)}")
+            return None
+        self.logger.info(f"Encode cache hit: {target_path} ({method})")
+        return method
+
+    def put(self, key: str, extension: str, source_path: str) -> str:
+        """
+        Store an encoded file, then prune the cache back under its budget.
+
+        Returns:
+            Path of the stored artifact
+        """
+        object_path = self._object_path(key, extension)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+
+        # write next to the final location and rename, readers never see partial objects
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(object_path), suffix='.tmp')
+        os.close(fd)
+        os.remove(temp_path)
+        try:
+            materialize_file(source_path, temp_path, allow_hardlink=self.allow_hardlinks)
+            os.replace(temp_path, object_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self.logger.debug(f"Encode cache store: {key}{extension}")
+        self.prune()
+        return object_path
+
+    def stats(self) -> CacheStats:
+        """Return the number and total size of the stored artifacts."""
+        entries = self._entries()
+        return CacheStats(self.cache_dir, len(entries), sum(size for _, size, _ in entries), self.max_size_bytes)
+
+    def prune(self, max_size_bytes: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Evict least recently used artifacts until the cache fits the budget.
+
+        Args:
+            max_size_bytes: Optional budget overriding the configured one, 0 empties the cache
+
+        Returns:
+            Tuple of (removed entries, freed bytes)
+        """
+        budget = self.max_size_bytes if max_size_bytes is None else max_size_bytes
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+
+        removed = freed = 0
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= budget:
+                break
+            try:
+                os.remove(path)
+            except OSError as e:
+                self.logger.warning(f"Failed to evict {path}: {str(e)}")
+                continue
+            total -= size
+            removed += 1
+            freed += size
+
+        if removed:
+            self.logger.info(f"Encode cache pruned {removed} entries ({freed} bytes)")
+        return removed, freed
+
+    def _object_path(self, key: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, self.OBJECTS_DIR, key[:2], f"{key}{extension.lower()}")
+
+    def _entries(self) -> List[Tuple[str, int, float]]:
+        """List (path, size, mtime) of every stored artifact."""
+        entries = []
+        objects_dir = os.path.join(self.cache_dir, self.OBJECTS_DIR)
+        for root, _, files in os.walk(objects_dir):
+            for file_name in files:
+                if file_name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
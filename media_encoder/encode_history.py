@@ -0,0 +1,226 @@
+"""
+Encode history for the Media Encoder.
+
+Every recorded encode stores its wall time, the CPU time and peak memory
+reported by ffmpeg's ``-benchmark`` lines, the source duration and the
+input/output sizes in a local SQLite database. Per-profile (and per source
+format) estimates fitted from that history replace the hand-written
+``SizeFactor``/``CpuFactor`` of the profiles with numbers measured on the
+machine that runs the encodes.
+"""
+
+import dataclasses
+import re
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+from config import ENCODE_HISTORY_PATH, get_logger
+from models import BASELINE_PROFILE
+from sqlite_store import SQLiteStore
+
+# Lines printed by ffmpeg -benchmark, e.g. "bench: utime=0.024s stime=0.004s rtime=0.029s"
+BENCH_PATTERN = re.compile(r'bench:.*?utime=([\d.]+)s stime=([\d.]+)s rtime=([\d.]+)s')
+MAXRSS_PATTERN = re.compile(r'bench: maxrss=(\d+)\s*KiB')
+
+def parse_benchmark(stderr: Optional[str]) -> Dict[str, float]:
+    """
+    Extract the -benchmark figures from ffmpeg's stderr.
+
+    Returns:
+        Dict with utime, stime and rtime in seconds and maxrss in KiB, only the ones found
+    """
+    bench = {}
+    if not stderr:
+        return bench
+    times = BENCH_PATTERN.findall(stderr)
+    if times:
+        bench['utime'], bench['stime'], bench['rtime'] = (float(value) for value in times[-1])
+    maxrss = MAXRSS_PATTERN.findall(stderr)
+    if maxrss:
+        bench['maxrss'] = float(maxrss[-1])
+    return bench
+
+@dataclass(frozen=True)
+class EncodeSample:
+    """
+    Measurements of a single encode.
+
+    Attributes:
+        profile (str): Name of the profile used
+        source_format (str): Source file extension without the dot, e.g. 'flac'
+        input_bytes (int): Size of the source file
+        output_bytes (int): Size of the encoded file
+        duration (float): Source duration in seconds, None if unknown
+        wall_seconds (float): Wall time of the ffmpeg run
+        cpu_seconds (float): User plus system CPU time of ffmpeg, None if not reported
+        maxrss_kib (float): Peak resident memory of ffmpeg in KiB, None if not reported
+        timestamp (float): When the encode finished, seconds since the epoch
+    """
+    profile: str
+    source_format: str
+    input_bytes: int
+    output_bytes: int
+    duration: Optional[float]
+    wall_seconds: float
+    cpu_seconds: Optional[float] = None
+    maxrss_kib: Optional[float] = None
+    timestamp: float = 0.0
+
+@dataclass(frozen=True)
+class ProfileEstimate:
+    """
+    Figures fitted from the recorded encodes of a profile.
+
+    Attributes:
+        profile (str): Name of the profile
+        source_format (str): Source format the figures apply to, None for all of them
+        samples (int): Number of encodes the figures are fitted from
+        size_factor (float): Measured SizeFactor, output bytes per input byte
+        cpu_factor (float): Measured CpuFactor, CPU seconds per source second relative to the
+            baseline profile. None without -benchmark figures of both
+        realtime_factor (float): Source seconds encoded per wall second, None without known durations
+        maxrss_kib (float): Highest peak memory seen, None without -benchmark figures
+        cpu_per_second (float): CPU seconds spent per source second, None without -benchmark figures
+        cores (float): Cores kept busy by an encode (CPU time / wall time), None without -benchmark figures
+    """
+    profile: str
+    source_format: Optional[str]
+    samples: int
+    size_factor: Optional[float]
+    cpu_factor: Optional[float]
+    realtime_factor: Optional[float]
+    maxrss_kib: Optional[float] = None
+    cpu_per_second: Optional[float] = None
+    cores: Optional[float] = None
+
+class EncodeHistory(SQLiteStore):
+    """
+    SQLite store of encode measurements.
+
+    Recording never fails an encode, errors are only logged.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS encodes (
+            profile TEXT NOT NULL,
+            source_format TEXT NOT NULL,
+            input_bytes INTEGER NOT NULL,
+            output_bytes INTEGER NOT NULL,
+            duration REAL,
+            wall_seconds REAL NOT NULL,
+            cpu_seconds REAL,
+            maxrss_kib REAL,
+            timestamp REAL NOT NULL
+        )
+    """
+
+    def __init__(
+        self,
+        db_path: str = ENCODE_HISTORY_PATH,
+        logger: logger = None # type: ignore
+    ):
+        """
+        Initialize the history, the database is created on first use.
+
+        Args:
+            db_path: Path of the SQLite database
+            logger: Optional logger instance. If not provided, creates a new one.
+        """
+        self.db_path = db_path
+        self.logger = logger if logger is not None else get_logger(__name__)
+        self._init_local()
+
+    def record(self, sample: EncodeSample) -> None:
+        """Store the measurements of an encode."""
+        timestamp = sample.timestamp or time.time()
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute(
+                    "INSERT INTO encodes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (sample.profile, sample.source_format, sample.input_bytes, sample.output_bytes, sample.duration,
+                     sample.wall_seconds, sample.cpu_seconds, sample.maxrss_kib, timestamp))
+        except sqlite3.Error as e:
+            self.logger.warning(f"Encode history write failed: {str(e)}")
+
+    def samples(self, profile: Optional[str] = None) -> List[EncodeSample]:
+        """Return the recorded encodes, oldest first, optionally of a single profile."""
+        query = "SELECT * FROM encodes"
+        params: Tuple = ()
+        if profile is not None:
+            query += " WHERE profile = ?"
+            params = (profile,)
+        rows = self._connection().execute(query + " ORDER BY timestamp", params).fetchall()
+        return [EncodeSample(*row) for row in rows]
+
+    def estimates(
+        self,
+        by_source_format: bool = False,
+        baseline: str = BASELINE_PROFILE
+    ) -> Dict[Tuple[str, Optional[str]], ProfileEstimate]:
+        """
+        Fit the figures of every profile from the recorded encodes.
+
+        Figures are ratios of sums over the samples, so long encodes weigh more
+        than short ones, where the process start up dominates. The CpuFactor of
+        a profile is its CPU time per source second over the baseline's, taken
+        from the same source format when the baseline was measured on it.
+
+        Args:
+            by_source_format: Fit separate figures per source format
+            baseline: Name of the profile whose CpuFactor is 1.0
+
+        Returns:
+            ProfileEstimate keyed by (profile name, source format), the format is None
+            unless by_source_format is set
+        """
+        samples = self.samples()
+        groups: Dict[Tuple[str, Optional[str]], List[EncodeSample]] = {}
+        for sample in samples:
+            groups.setdefault((sample.profile, sample.source_format if by_source_format else None), []).append(sample)
+        estimates = {key: self._fit(key[0], key[1], group) for key, group in groups.items()}
+
+        overall = self._fit(baseline, None, [sample for sample in samples if sample.profile == baseline])
+        for key, estimate in estimates.items():
+            reference = estimates.get((baseline, key[1]))
+            if reference is None or not reference.cpu_per_second:
+                reference = overall
+            if estimate.cpu_per_second is not None and reference.cpu_per_second:
+                estimates[key] = dataclasses.replace(estimate, cpu_factor=estimate.cpu_per_second / reference.cpu_per_second)
+        return estimates
+
+    def clear(self) -> None:
+        """Drop every recorded encode."""
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM encodes")
+
+    @staticmethod
+    def _fit(profile: str, source_format: Optional[str], samples: List[EncodeSample]) -> ProfileEstimate:
+        timed = [sample for sample in samples if sample.duration]
+        benched = [sample for sample in samples if sample.cpu_seconds is not None and sample.wall_seconds > 0]
+        input_bytes = sum(sample.input_bytes for sample in samples)
+        realtime_factor = cpu_per_second = cores = None
+        if timed:
+            duration = sum(sample.duration for sample in timed)
+            wall = sum(sample.wall_seconds for sample in timed)
+            realtime_factor = duration / wall if wall > 0 else None
+        if benched:
+            cores = sum(sample.cpu_seconds for sample in benched) / sum(sample.wall_seconds for sample in benched)
+        timed_benched = [sample for sample in benched if sample.duration]
+        if timed_benched:
+            cpu_per_second = sum(sample.cpu_seconds for sample in timed_benched) / sum(sample.duration for sample in timed_benched)
+        maxrss = [sample.maxrss_kib for sample in samples if sample.maxrss_kib is not None]
+        return ProfileEstimate(
+            profile=profile,
+            source_format=source_format,
+            samples=len(samples),
+            size_factor=sum(sample.output_bytes for sample in samples) / input_bytes if input_bytes else None,
+            cpu_factor=None,
+            realtime_factor=realtime_factor,
+            maxrss_kib=max(maxrss) if maxrss else None,
+            cpu_per_second=cpu_per_second,
+            cores=cores
+        )
@@ -1,37 +1,183 @@
-import ffmpeg
+import asyncio
+import collections
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import os
-from typing import Dict, Optional
+import re
+import dataclasses
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Union
 from loguru import logger
 from data_manager import ProfileDataManager, Profile
+from utils import LazyModule, Tags, as_tag_list, get_tool_version, materialize_file
+from encode_cache import EncodeCache
+from probe_cache import ProbeCache
+from encode_history import EncodeHistory, EncodeSample, parse_benchmark
+from native_probe import probe_file
 from config import FFMPEG_PROFILES_PATH, FFMPEG_GLOBALARGS_PATH, FFMPEG_PATH, FFPROBE_PATH, get_logger
 
+if TYPE_CHECKING:
+    from meta_updater import FFmpegTagPlan, TagPadding
+
+# ffmpeg-python is only needed to probe with ffprobe, most invocations never touch it
+ffmpeg = LazyModule('ffmpeg')
+
+# Number of CommandTemplates kept, see Encoder.command_template
+TEMPLATE_CACHE_SIZE = 256
+
+# Output options embedding the second input as cover art, see FFmpegCommand.attach_picture
+ATTACHED_PICTURE_OPTIONS = ('-map', '0:a:0', '-map', '1:v:0', '-c:v', 'copy', '-disposition:v', 'attached_pic')
+
+# Chunk size used when streaming through ffmpeg pipes
+STREAM_CHUNK_SIZE = 64 * 1024
+# Lines of ffmpeg stderr kept to report a failed stream
+STREAM_STDERR_LINES = 50
+
+# Muxer (-f) and muxer options for each extension when writing to a pipe, which has no
+# file name to guess the format from. MP4 needs a fragmented layout on non seekable outputs.
+PIPE_MUXERS = {
+    '.mp3': ('mp3', {}),
+    '.flac': ('flac', {}),
+    '.wav': ('wav', {}),
+    '.m4a': ('ipod', {'movflags': '+frag_keyframe+empty_moov'}),
+    '.mp4': ('mp4', {'movflags': '+frag_keyframe+empty_moov'}),
+    '.aac': ('adts', {}),
+    '.opus': ('opus', {}),
+    '.ogg': ('ogg', {}),
+}
+
 class EncodingError(Exception):
     """Custom exception for processing errors."""
     pass
 
+@dataclass(frozen=True)
+class ProgressEvent:
+    """
+    Progress of a running encode, parsed from one `-progress` block.
+
+    Attributes:
+        out_time_us (int): Position of the output, in microseconds
+        total_size (int): Bytes written so far
+        speed (float): Realtime factor reported by ffmpeg, None while unknown
+        elapsed (float): Wall time since ffmpeg started, in seconds
+        done (bool): True on the last event of a successful encode
+        duration_us (int): Duration of the input in microseconds, None if unknown
+        output_file (str): Output of the encode
+    """
+    out_time_us: int
+    total_size: int
+    speed: Optional[float]
+    elapsed: float
+    done: bool = False
+    duration_us: Optional[int] = None
+    output_file: Optional[str] = None
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """Completed fraction between 0 and 1, None if the duration is unknown."""
+        if not self.duration_us:
+            return None
+        return 1.0 if self.done else min(self.out_time_us / self.duration_us, 1.0)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated remaining wall time in seconds, None if unknown."""
+        if self.done:
+            return 0.0
+        if not self.duration_us or not self.speed:
+            return None
+        return max(self.duration_us - self.out_time_us, 0) / 1e6 / self.speed
+
+class ProgressParser:
+    """
+    Incremental parser of ffmpeg `-progress` output.
+
+    ffmpeg writes key=value lines and closes every block with a progress=continue
+    or progress=end line, which is when an event is emitted.
+    """
+    def __init__(self, start: Optional[float] = None):
+        self.start = time.monotonic() if start is None else start
+        self._values: Dict[str, str] = {}
+
+    def feed(self, line: Union[str, bytes]) -> Optional[ProgressEvent]:
+        """Parse one line, returning a ProgressEvent when it closes a block."""
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        key, separator, value = line.strip().partition('=')
+        if not separator:
+            return None
+        if key != 'progress':
+            self._values[key] = value.strip()
+            return None
+
+        values, self._values = self._values, {}
+        speed = values.get('speed', 'N/A').rstrip('x')
+        return ProgressEvent(
+            out_time_us=self._to_int(values.get('out_time_us')),
+            total_size=self._to_int(values.get('total_size')),
+            speed=float(speed) if self._is_number(speed) else None,
+            elapsed=time.monotonic() - self.start,
+            done=value.strip() == 'end')
+
+    @staticmethod
+    def _to_int(value: Optional[str]) -> int:
+        # N/A until ffmpeg has written the first packet
+        return int(value) if value and value.lstrip('-').isdigit() else 0
+
+    @staticmethod
+    def _is_number(value: str) -> bool:
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+
 class Encoder:
     """
     A class to handle encoding and metadata manipulation using FFmpeg.
     """
-    def __init__(self, profile, logger: logger = None): # type: ignore
+    # CommandTemplates shared by every Encoder of the process, batches build an Encoder per job
+    _templates: Dict[tuple, "CommandTemplate"] = {}
+
+    def __init__(
+        self,
+        profile,
+        logger: logger = None, # type: ignore
+        cache: Optional[EncodeCache] = None,
+        probe_cache: Optional[ProbeCache] = None,
+        native_probe: bool = True,
+        history: Optional[EncodeHistory] = None,
+        tag_padding: Optional["TagPadding"] = None
+    ):
         """
         Initialize the Reencoder with the codec configuration.
 
         Args:
             codec: Codec configuration for re-encoding.
             logger: Optional logger instance. If not provided, creates a new one.           
+            cache: Optional EncodeCache, encodes already in the cache are served without running ffmpeg.
+            probe_cache: Optional ProbeCache, get_metadata only spawns ffprobe for uncached files.
+            native_probe: Read metadata from the container headers in process, falling back to ffprobe
+                for the files that can't be probed natively.
+            history: Optional EncodeHistory, every encode ran by ffmpeg records its timings and sizes.
+            tag_padding: Optional TagPadding, MP3, FLAC, MP4 and WAV outputs get at least its reserve of
+                tag padding, so later tag edits are in place. Files are saved once more if ffmpeg left less.
 
         Raises:
             ValueError: If codec is None or invalid.
         """
-        if isinstance(profile, str):
-            self.profile = ProfileDataManager().load_profiles(FFMPEG_PROFILES_PATH).get_profile_by_name(profile)  
-        elif isinstance(profile, Profile):
-            self.profile = profile
+        if isinstance(profile, (str, Profile)):
+            self.profile = self._resolve_profile(profile)
 
         self.logger = logger if logger is not None else get_logger(__name__)        
         self.ffmpeg_cmd = FFmpegCommand(FFMPEG_PATH)
+        self.cache = cache
+        self.probe_cache = probe_cache
+        self.native_probe = native_probe
+        self.history = history
+        self.tag_padding = tag_padding
     
     # Use ffmpeg-python to copy streams without re-encoding
     def copy(
@@ -41,16 +187,25 @@ class Encoder:
         delete_original: bool = False,
         metadata_tags: Optional[Dict[str, str]] = None,
         ffmpeg_output_args: Optional[Dict[str, str]] = None,
-        ffmpeg_global_args: Optional[Dict[str, str]] = None
+        ffmpeg_global_args: Optional[Dict[str, str]] = None,
+        tags: Optional[Tags] = None
     ) -> Optional[str]:
         self.logger.info("Copying...")
+        return self.encode(input_file_path, output_path, delete_original, metadata_tags, self._copy_output_args(ffmpeg_output_args), ffmpeg_global_args, tags=tags)
 
-        if ffmpeg_output_args:
-            ffmpeg_output_args.update({'c':'copy'})
-        else:    
-            ffmpeg_output_args = {'c':'copy'}
-            
-        return self.encode(input_file_path, output_path, delete_original, metadata_tags, ffmpeg_output_args, ffmpeg_global_args)
+    async def copy_async(
+        self,
+        input_file_path: str,
+        output_path: Optional[str] = None,
+        delete_original: bool = False,
+        metadata_tags: Optional[Dict[str, str]] = None,
+        ffmpeg_output_args: Optional[Dict[str, str]] = None,
+        ffmpeg_global_args: Optional[Dict[str, str]] = None,
+        tags: Optional[Tags] = None
+    ) -> Optional[str]:
+        """Asyncio counterpart of copy, see encode_async."""
+        self.logger.info("Copying...")
+        return await self.encode_async(input_file_path, output_path, delete_original, metadata_tags, self._copy_output_args(ffmpeg_output_args), ffmpeg_global_args, tags=tags)
 
     def encode(
         self,
@@ -59,18 +214,29 @@ class Encoder:
         delete_original: bool = False,
         metadata_tags: Optional[Dict[str, str]] = None,
         ffmpeg_output_args: Optional[Dict[str, str]] = None,
-        ffmpeg_global_args: Optional[Dict[str, str]] = None
+        ffmpeg_global_args: Optional[Dict[str, str]] = None,
+        progress: Optional[Callable[[ProgressEvent], None]] = None,
+        tags: Optional[Tags] = None
     ) -> Optional[str]:
         """
         Re-encode the file to the specified codec and optionally modify metadata.
 
+        Tags are translated through the mutagen tag mappings into ffmpeg -metadata
+        pairs and, for MP3, FLAC and MP4 outputs, a cover art attached picture.
+        The tags ffmpeg can't write (e.g. ID3 lyrics and comments, MP4 freeform
+        atoms) are applied to the output with a single AudioMetaUpdater save
+        before it's finalized or cached.
+
         Args:
             input_file_path: Path to the input file
             output_path: Optional path for the output file
             delete_original: Whether to delete the original file after encoding
             metadata_tags: List of metadata tags to modify (format: "key=value")
             ffmpeg_output_args: Additional FFmpeg output args
-            ffmpeg_global_args: Additional FFmpeg global args
+            ffmpeg_global_args: Additional FFmpeg global args, a None value drops a default one
+            progress: Optional callback receiving ProgressEvents while ffmpeg runs
+            tags: Optional tags as taken by AudioMetaUpdater, including 'cover_art', in any
+                format accepted by utils.as_tag_list
 
         Returns:
             Path to the output file if successful, None otherwise
@@ -84,72 +250,629 @@ class Encoder:
         output_file_path = self._generate_unique_output_file_path(output_path or input_file_path, self.profile.Extension)
         
         try:            
-            # add default output args
+            tag_plan = self._tag_plan(tags)
+            ffmpeg_command = self._build_command(
+                self.ffmpeg_cmd, input_file_path, output_file_path, metadata_tags, ffmpeg_output_args, ffmpeg_global_args, tag_plan)
+            progress = self._progress_callback(progress, input_file_path, output_file_path)
+            cache_key, hit = self._cache_fetch(ffmpeg_command, input_file_path, output_file_path, tag_plan)
+            if not hit:
+                start = time.perf_counter()
+                ffmpeg_command.run(capture_stdout=True, capture_stderr=True, progress=progress)
+                self._record_history(ffmpeg_command, input_file_path, output_file_path, time.perf_counter() - start)
+                self._write_tags(tag_plan, output_file_path)
+                self._cache_store(cache_key, output_file_path)
+            elif progress is not None:
+                progress(ProgressEvent(0, os.path.getsize(output_file_path), None, 0.0, done=True))
+            self._finalize(input_file_path, output_file_path, output_path, delete_original)
+        except Exception as e:
+            raise self._encoding_error(input_file_path, e) from e
+
+        return output_file_path
+
+    async def encode_async(
+        self,
+        input_file_path: str,
+        output_path: Optional[str] = None,
+        delete_original: bool = False,
+        metadata_tags: Optional[Dict[str, str]] = None,
+        ffmpeg_output_args: Optional[Dict[str, str]] = None,
+        ffmpeg_global_args: Optional[Dict[str, str]] = None,
+        progress: Optional[Callable[[ProgressEvent], None]] = None,
+        tags: Optional[Tags] = None
+    ) -> Optional[str]:
+        """
+        Asyncio counterpart of encode, running ffmpeg with asyncio.create_subprocess_exec.
+
+        Every call builds its own FFmpegCommand, so a single Encoder can drive many
+        concurrent encodes from one event loop. Cancelling the awaiting task kills
+        the ffmpeg child and removes the partial output.
+
+        Args:
+            input_file_path: Path to the input file
+            output_path: Optional path for the output file
+            delete_original: Whether to delete the original file after encoding
+            metadata_tags: List of metadata tags to modify (format: "key=value")
+            ffmpeg_output_args: Additional FFmpeg output args
+            ffmpeg_global_args: Additional FFmpeg global args, a None value drops a default one
+            progress: Optional callback receiving ProgressEvents while ffmpeg runs, see encode_progress
+            tags: Optional tags as taken by AudioMetaUpdater, including 'cover_art', see encode
+
+        Returns:
+            Path to the output file if successful, None otherwise
+
+        Raises:
+            EncodingError: If encoding fails
+            asyncio.CancelledError: If the task was cancelled
+        """
+        if not os.path.isfile(input_file_path):
+            raise ValueError(f"File does not exist: {input_file_path}")
+
+        output_file_path = self._generate_unique_output_file_path(output_path or input_file_path, self.profile.Extension)
+
+        try:
+            # hashing, probing and reading the cover art block, keep them off the event loop
+            loop = asyncio.get_running_loop()
+            tag_plan = await loop.run_in_executor(None, self._tag_plan, tags)
+            ffmpeg_command = self._build_command(
+                FFmpegCommand(self.ffmpeg_cmd.ffmpeg_path, logger=self.logger),
+                input_file_path, output_file_path, metadata_tags, ffmpeg_output_args, ffmpeg_global_args, tag_plan)
+            progress = await loop.run_in_executor(
+                None, self._progress_callback, progress, input_file_path, output_file_path)
+            cache_key, hit = await loop.run_in_executor(
+                None, self._cache_fetch, ffmpeg_command, input_file_path, output_file_path, tag_plan)
+            if not hit:
+                start = time.perf_counter()
+                await ffmpeg_command.run_async(capture_stdout=True, capture_stderr=True, progress=progress)
+                await loop.run_in_executor(None, self._record_history,
+                                           ffmpeg_command, input_file_path, output_file_path, time.perf_counter() - start)
+                await loop.run_in_executor(None, self._write_tags, tag_plan, output_file_path)
+                await loop.run_in_executor(None, self._cache_store, cache_key, output_file_path)
+            elif progress is not None:
+                progress(ProgressEvent(0, os.path.getsize(output_file_path), None, 0.0, done=True))
+            self._finalize(input_file_path, output_file_path, output_path, delete_original)
+        except asyncio.CancelledError:
+            self.logger.warning(f"Encoding cancelled: {input_file_path}")
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+            raise
+        except Exception as e:
+            raise self._encoding_error(input_file_path, e) from e
+
+        return output_file_path
+
+    async def encode_progress(self, input_file_path: str, output_path: Optional[str] = None, **kwargs) -> AsyncIterator[ProgressEvent]:
+        """
+        Run encode_async and yield its ProgressEvents as they arrive.
+
+        The last event of a successful encode has done=True and carries the output
+        path. Encoding errors are raised once the pending events are consumed;
+        closing the iterator early cancels the encode.
+
+        Args:
+            input_file_path: Path to the input file
+            output_path: Optional path for the output file
+            **kwargs: Other encode_async arguments
+
+        Returns:
+            Async iterator of ProgressEvent
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        task = asyncio.ensure_future(self.encode_async(input_file_path, output_path, progress=queue.put_nowait, **kwargs))
+        try:
+            while not task.done() or not queue.empty():
+                if queue.empty():
+                    getter = asyncio.ensure_future(queue.get())
+                    await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                    if not getter.done():
+                        getter.cancel()
+                        continue
+                    yield getter.result()
+                else:
+                    yield queue.get_nowait()
+            task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    def encode_stream(
+        self,
+        source,
+        metadata_tags: Optional[Dict[str, str]] = None,
+        ffmpeg_output_args: Optional[Dict[str, str]] = None,
+        ffmpeg_global_args: Optional[Dict[str, str]] = None,
+        input_args: Optional[List[str]] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """
+        Encode a byte stream without touching the disk, through ffmpeg pipe:0 and pipe:1.
+
+        The output format comes from the profile extension, see PIPE_MUXERS. Inputs
+        whose format can't be probed from the stream (e.g. raw PCM) need input_args,
+        e.g. ["-f", "s16le", "-ar", "44100", "-ac", "2"].
+
+        Args:
+            source: Readable binary file object or iterable of bytes
+            metadata_tags: List of metadata tags to modify (format: "key=value")
+            ffmpeg_output_args: Additional FFmpeg output args
+            ffmpeg_global_args: Additional FFmpeg global args, a None value drops a default one
+            input_args: Optional FFmpeg input args
+            chunk_size: Size of the chunks read from the source and yielded
+
+        Returns:
+            Iterator of encoded chunks
+
+        Raises:
+            EncodingError: If encoding fails or the extension can't be streamed
+        """
+        muxer = PIPE_MUXERS.get(self.profile.Extension.lower())
+        if muxer is None:
+            raise EncodingError(f"Streaming is not supported for {self.profile.Extension} outputs")
+        muxer_format, muxer_args = muxer
+
+        ffmpeg_command = self._build_command(
+            FFmpegCommand(self.ffmpeg_cmd.ffmpeg_path, logger=self.logger),
+            "pipe:0", "pipe:1", metadata_tags, {**muxer_args, 'f': muxer_format, **(ffmpeg_output_args or {})}, ffmpeg_global_args)
+        ffmpeg_command.input_args(input_args or [])
+        try:
+            yield from ffmpeg_command.run_stream(source, chunk_size)
+        except Exception as e:
+            raise self._encoding_error("stream", e) from e
+
+    def encode_many(
+        self,
+        input_file_path: str,
+        profiles: Iterable[Union[str, Profile]],
+        output_dir: Optional[str] = None,
+        metadata_tags: Optional[Dict[str, str]] = None,
+        ffmpeg_global_args: Optional[Dict[str, str]] = None,
+        profile_metadata: Optional[Dict[str, Dict[str, str]]] = None,
+        output_paths: Optional[Dict[str, str]] = None
+    ) -> Dict[str, str]:
+        """
+        Encode one source to several profiles with a single ffmpeg run.
+
+        The source is decoded once. Profiles that share the same sample rate and
+        sample format also share the resampling step, which is split (asplit)
+        into one stream per output. Profiles with the same equivalence key
+        (see ProfileDataManager.get_equivalence_key) are encoded only once, the
+        other outputs of the class are materialized as reflinks, hardlinks or
+        copies of that encoding.
+
+        Args:
+            input_file_path: Path to the input file
+            profiles: Profile names or Profile instances
+            output_dir: Optional directory for the outputs, defaults to the input directory
+            metadata_tags: Metadata tags applied to every output
+            ffmpeg_global_args: Additional FFmpeg global args, a None value drops a default one
+            profile_metadata: Optional per-profile metadata tags (profile name to tags),
+                applied with AudioMetaUpdater once the outputs exist
+            output_paths: Optional explicit output path per profile name
+
+        Returns:
+            Dictionary of profile name to output file path
+
+        Raises:
+            ValueError: If the input does not exist or no profile is given
+            EncodingError: If encoding fails
+        """
+        if not os.path.isfile(input_file_path):
+            raise ValueError(f"File does not exist: {input_file_path}")
+
+        classes = self._equivalence_classes(profiles)
+        output_paths = self._profile_output_paths(input_file_path, classes, output_dir, output_paths)
+
+        try:
+            ffmpeg_command = self._build_many_command(
+                FFmpegCommand(self.ffmpeg_cmd.ffmpeg_path, logger=self.logger),
+                input_file_path, classes, output_paths, metadata_tags, ffmpeg_global_args)
+            ffmpeg_command.run(capture_stdout=True, capture_stderr=True)
+            self._finalize_many(input_file_path, classes, output_paths, profile_metadata)
+        except Exception as e:
+            raise self._encoding_error(input_file_path, e) from e
+
+        return output_paths
+
+    async def encode_many_async(
+        self,
+        input_file_path: str,
+        profiles: Iterable[Union[str, Profile]],
+        output_dir: Optional[str] = None,
+        metadata_tags: Optional[Dict[str, str]] = None,
+        ffmpeg_global_args: Optional[Dict[str, str]] = None,
+        profile_metadata: Optional[Dict[str, Dict[str, str]]] = None,
+        output_paths: Optional[Dict[str, str]] = None
+    ) -> Dict[str, str]:
+        """Asyncio counterpart of encode_many, see encode_async for cancellation."""
+        if not os.path.isfile(input_file_path):
+            raise ValueError(f"File does not exist: {input_file_path}")
+
+        classes = self._equivalence_classes(profiles)
+        output_paths = self._profile_output_paths(input_file_path, classes, output_dir, output_paths)
+
+        try:
+            ffmpeg_command = self._build_many_command(
+                FFmpegCommand(self.ffmpeg_cmd.ffmpeg_path, logger=self.logger),
+                input_file_path, classes, output_paths, metadata_tags, ffmpeg_global_args)
+            await ffmpeg_command.run_async(capture_stdout=True, capture_stderr=True)
+            self._finalize_many(input_file_path, classes, output_paths, profile_metadata)
+        except asyncio.CancelledError:
+            self.logger.warning(f"Encoding cancelled: {input_file_path}")
+            for output_file_path in output_paths.values():
+                if os.path.exists(output_file_path):
+                    os.remove(output_file_path)
+            raise
+        except Exception as e:
+            raise self._encoding_error(input_file_path, e) from e
+
+        return output_paths
+
+    def _equivalence_classes(self, profiles: Iterable[Union[str, Profile]]) -> List[List[Profile]]:
+        """Resolve and deduplicate profiles, grouped by equivalence key. The first member encodes the class."""
+        resolved: Dict[str, Profile] = {}
+        for profile in profiles:
+            profile = self._resolve_profile(profile)
+            resolved.setdefault(profile.Name, profile)
+        if not resolved:
+            raise ValueError("At least one profile is required")
+        return list(ProfileDataManager.group_equivalent_profiles(resolved.values()).values())
+
+    def _profile_output_paths(
+        self,
+        input_file_path: str,
+        classes: List[List[Profile]],
+        output_dir: Optional[str] = None,
+        output_paths: Optional[Dict[str, str]] = None
+    ) -> Dict[str, str]:
+        profiles = [profile for members in classes for profile in members]
+        if output_paths is None:
+            return self._generate_profile_output_paths(input_file_path, profiles, output_dir)
+        missing = [profile.Name for profile in profiles if profile.Name not in output_paths]
+        if missing:
+            raise ValueError(f"Missing output path for profiles: {', '.join(missing)}")
+        return {profile.Name: output_paths[profile.Name] for profile in profiles}
+
+    def _build_many_command(
+        self,
+        ffmpeg_command: "FFmpegCommand",
+        input_file_path: str,
+        classes: List[List[Profile]],
+        output_paths: Dict[str, str],
+        metadata_tags: Optional[Dict[str, str]] = None,
+        ffmpeg_global_args: Optional[Dict[str, str]] = None
+    ) -> "FFmpegCommand":
+        representatives = [members[0] for members in classes]
+
+        ffmpeg_command = ffmpeg_command.input(input_file_path)
+        ffmpeg_command = ffmpeg_command.global_args(self._global_args_list(ffmpeg_global_args))
+
+        filter_graph, stream_maps = self._plan_shared_filters(representatives)
+        if filter_graph:
+            ffmpeg_command = ffmpeg_command.filter_complex(filter_graph)
+
+        for profile in representatives:
+            output_args = ProfileDataManager.get_FFmpegSetup_as_dict(profile)
+            if profile.Name in stream_maps:
+                # resampling and sample format conversion happen in the shared filter
+                output_args.pop('ar', None)
+                output_args.pop('sample_fmt', None)
+            ffmpeg_command = ffmpeg_command.add_output(
+                output_paths[profile.Name], output_args, metadata_tags, stream_maps.get(profile.Name, '0:a:0'))
+        return ffmpeg_command
+
+    def _finalize_many(
+        self,
+        input_file_path: str,
+        classes: List[List[Profile]],
+        output_paths: Dict[str, str],
+        profile_metadata: Optional[Dict[str, Dict[str, str]]] = None
+    ) -> None:
+        profile_metadata = profile_metadata or {}
+        for members in classes:
+            source_path = output_paths[members[0].Name]
+            for profile in members[1:]:
+                # hardlinks share the inode, they would leak per-profile tags between outputs
+                method = materialize_file(source_path, output_paths[profile.Name], allow_hardlink=not profile_metadata)
+                self.logger.debug(f"Materialized {output_paths[profile.Name]} from {source_path} ({method})")
+
+        for name, tags in profile_metadata.items():
+            if tags and name in output_paths:
+                # imported here, mutagen is only needed for per-profile tagging
+                from meta_updater import AudioMetaUpdater
+                AudioMetaUpdater(output_paths[name]).update_metadata_list(list(tags.items()))
+
+        for output_file_path in output_paths.values():
+            self._finalize(input_file_path, output_file_path, None, False)
+
+    def _resolve_profile(self, profile: Union[str, Profile]) -> Profile:
+        if isinstance(profile, Profile):
+            return profile
+        return ProfileDataManager().load_profiles(FFMPEG_PROFILES_PATH).get_profile_by_name(profile)
+
+    def _plan_shared_filters(self, profiles: List[Profile]):
+        """
+        Group profiles by their ('ar', 'sample_fmt') setup and build a filter graph
+        that resamples once per group and splits the result.
+
+        Returns:
+            Tuple of the filter graph (None when nothing is shared) and a dictionary
+            of profile name to the filter output label it must be mapped from
+        """
+        groups: Dict[tuple, List[Profile]] = {}
+        for profile in profiles:
+            setup = ProfileDataManager.get_FFmpegSetup_as_dict(profile)
+            if 'ar' in setup or 'sample_fmt' in setup:
+                groups.setdefault((setup.get('ar'), setup.get('sample_fmt')), []).append(profile)
+
+        chains = []
+        stream_maps: Dict[str, str] = {}
+        for (sample_rate, sample_fmt), members in groups.items():
+            if len(members) < 2:
+                continue
+            filters = []
+            if sample_rate:
+                filters.append(f"aresample={sample_rate}")
+            if sample_fmt:
+                filters.append(f"aformat=sample_fmts={sample_fmt}")
+            labels = []
+            for profile in members:
+                labels.append(f"[s{len(stream_maps)}]")
+                stream_maps[profile.Name] = labels[-1]
+            filters.append(f"asplit={len(members)}")
+            chains.append(f"[0:a]{','.join(filters)}{''.join(labels)}")
+
+        if not chains:
+            return None, stream_maps
+        # [0:a] can only be consumed once, split it when several chains need it
+        if len(chains) > 1:
+            inputs = ''.join(f"[in{index}]" for index in range(len(chains)))
+            chains = [f"[0:a]asplit={len(chains)}{inputs}"] + [
+                chain.replace("[0:a]", f"[in{index}]", 1) for index, chain in enumerate(chains)]
+        return ';'.join(chains), stream_maps
+
+    def _generate_profile_output_paths(
+        self,
+        input_file_path: str,
+        profiles: List[Profile],
+        output_dir: Optional[str] = None,
+        reserved: Optional[Set[str]] = None
+    ) -> Dict[str, str]:
+        """Generate one unique output path per profile, tagged with a slug of the profile name."""
+        base_name = os.path.splitext(os.path.basename(input_file_path))[0]
+        base_dir = output_dir or os.path.dirname(input_file_path)
+        reserved = set(reserved or ())
+        output_paths: Dict[str, str] = {}
+        for profile in profiles:
+            slug = re.sub(r'[^A-Za-z0-9]+', '_', profile.Name).strip('_')
+            output_path = self._generate_unique_output_file_path(
+                os.path.join(base_dir, f"{base_name}_{slug}"), profile.Extension, reserved=reserved)
+            reserved.add(output_path)
+            output_paths[profile.Name] = output_path
+        return output_paths
+
+    def _copy_output_args(self, ffmpeg_output_args: Optional[Dict[str, str]]) -> Dict[str, str]:
+        if ffmpeg_output_args:
+            ffmpeg_output_args.update({'c':'copy'})
+        else:    
+            ffmpeg_output_args = {'c':'copy'}
+        return ffmpeg_output_args
+
+    def command_template(
+        self,
+        ffmpeg_output_args: Optional[Dict[str, str]] = None,
+        ffmpeg_global_args: Optional[Dict[str, str]] = None
+    ) -> "CommandTemplate":
+        """
+        Compiled argv template of the profile merged with the given extra args.
+
+        Templates are built once per profile, args and global arguments and are
+        shared by every Encoder of the process. Build the argv of many jobs with
+        template.argv(input, output, metadata) or FFmpegCommands with template.command.
+
+        Args:
+            ffmpeg_output_args: Additional FFmpeg output args
+            ffmpeg_global_args: Additional FFmpeg global args, a None value drops a default one
+
+        Returns:
+            CommandTemplate shared by every encode with these args
+        """
+        defaults = ProfileDataManager().load_arguments(FFMPEG_GLOBALARGS_PATH).get_arguments_as_dict()
+        key = (self.ffmpeg_cmd.ffmpeg_path, self.profile, tuple(defaults.items()),
+               tuple((ffmpeg_output_args or {}).items()), tuple((ffmpeg_global_args or {}).items()))
+        template = Encoder._templates.get(key)
+        if template is None:
+            # add default output args, then the user output args
             output_args: dict[str,str] = ProfileDataManager.get_FFmpegSetup_as_dict(self.profile)
-                                                                 
-            # add user output args
             output_args.update(ffmpeg_output_args or {})
-            
-            # add default global args
-            global_args: dict[str,str] = ProfileDataManager().load_arguments(FFMPEG_GLOBALARGS_PATH).get_arguments_as_dict()      
-
-            # add user global args
-            global_args.update(ffmpeg_global_args or {})                        
-            
-            # format global args
-            global_args_formated = self._format_global_args(global_args)
-            
-            # Create the FFmpeg command
-            ffmpeg_command = self.ffmpeg_cmd.input(input_file_path).output(output_file_path)
-            
-            ffmpeg_command = ffmpeg_command.global_args(global_args_formated)
-            ffmpeg_command = ffmpeg_command.output_args(output_args)
-            if metadata_tags:
-                ffmpeg_command = ffmpeg_command.metadata(metadata_tags)
-                                    
-            ffmpeg_command.run(capture_stdout=True, capture_stderr=True)
-            
-            # check the stats
-            Stats(input_file_path, output_file_path).compare_file_sizes()
-
-            # Optionally delete the original file
-            if delete_original and input_file_path != output_path:
-                try:
-                    os.remove(input_file_path)
-                    self.logger.debug(f"Deleted original file: {input_file_path}")
-                except OSError as e:
-                    self.logger.warning(f"Failed to delete original file {input_file_path}: {str(e)}")
+            # add default global args, then the user global args
+            defaults.update(ffmpeg_global_args or {})
+            template = CommandTemplate(self.ffmpeg_cmd.ffmpeg_path, self._format_global_args(defaults), output_args)
+            if len(Encoder._templates) >= TEMPLATE_CACHE_SIZE:
+                Encoder._templates.clear()
+            Encoder._templates[key] = template
+        return template
+
+    def _build_command(
+        self,
+        ffmpeg_command: "FFmpegCommand",
+        input_file_path: str,
+        output_file_path: str,
+        metadata_tags: Optional[Dict[str, str]] = None,
+        ffmpeg_output_args: Optional[Dict[str, str]] = None,
+        ffmpeg_global_args: Optional[Dict[str, str]] = None,
+        tag_plan: Optional["FFmpegTagPlan"] = None
+    ) -> "FFmpegCommand":
+        template = self.command_template(ffmpeg_output_args, ffmpeg_global_args)
+        if tag_plan is None:
+            return ffmpeg_command.from_template(template, input_file_path, output_file_path, metadata_tags)
+        # translated tags win over raw ffmpeg metadata of the same key
+        ffmpeg_command = ffmpeg_command.from_template(
+            template, input_file_path, output_file_path, {**(metadata_tags or {}), **tag_plan.metadata})
+        if tag_plan.cover_path:
+            ffmpeg_command = ffmpeg_command.attach_picture(tag_plan.cover_path)
+        return ffmpeg_command
+
+    def _tag_plan(self, tags: Optional[Tags]) -> Optional["FFmpegTagPlan"]:
+        """Split the tags of an encode between ffmpeg and the save applied to its output."""
+        if not tags:
+            return None
+        # imported here, mutagen is only needed for encodes with tags
+        from meta_updater import plan_ffmpeg_tags
+        return plan_ffmpeg_tags(self.profile.Extension, as_tag_list(tags))
+
+    def _write_tags(self, tag_plan: Optional["FFmpegTagPlan"], output_file_path: str) -> None:
+        """Write the tags ffmpeg couldn't and reserve the tag padding, all in memory and with a single save."""
+        remaining = tag_plan.remaining if tag_plan is not None else []
+        if not remaining and self.tag_padding is None:
+            return
+        from meta_updater import AudioMetaUpdater, PADDED_FORMATS
+        reserve = self.tag_padding is not None and os.path.splitext(output_file_path)[1].lower() in PADDED_FORMATS
+        if not remaining and not reserve:
+            return
+        updater = AudioMetaUpdater(output_file_path, padding=self.tag_padding)
+        with updater.batch():
+            if remaining:
+                updater.update_metadata_list(remaining)
+            if reserve:
+                updater.reserve_padding()
+        if updater.last_save is not None:
+            method = "in place" if updater.last_save.in_place else "rewritten"
+            self.logger.debug(f"Tags of {output_file_path} saved {method}, {updater.last_save.padding} bytes of padding")
+
+    def _progress_callback(
+        self,
+        progress: Optional[Callable[[ProgressEvent], None]],
+        input_file_path: str,
+        output_file_path: str
+    ) -> Optional[Callable[[ProgressEvent], None]]:
+        """Wrap a progress callback so its events carry the input duration and the output path."""
+        if progress is None:
+            return None
+        try:
+            duration_us = int(float(self.get_metadata(input_file_path)['format']['duration']) * 1e6)
+        except Exception:
+            duration_us = None  # progress is still reported, without fraction and ETA
+        return lambda event: progress(dataclasses.replace(event, duration_us=duration_us, output_file=output_file_path))
+
+    def _cache_fetch(
+        self,
+        ffmpeg_command: "FFmpegCommand",
+        input_file_path: str,
+        output_file_path: str,
+        tag_plan: Optional["FFmpegTagPlan"] = None
+    ):
+        """
+        Look the built command up in the encode cache and serve it on a hit.
+
+        Cached outputs carry all of their tags, the cover art, the tags written
+        after the encode and the tag padding are part of the key.
+
+        Returns:
+            Tuple of (cache key or None when caching is off/unavailable, hit)
+        """
+        if self.cache is None:
+            return None, False
+        metadata = dict(ffmpeg_command.metadata_options)
+        if tag_plan is not None:
+            metadata.update(tag_plan.fingerprint())
+        if self.tag_padding is not None:
+            metadata['tag_plan:padding'] = f"{self.tag_padding.reserve}x{self.tag_padding.growth}"
+        try:
+            cache_key = self.cache.make_key(
+                input_file_path,
+                self.profile.Extension,
+                ffmpeg_command.output_options,
+                ffmpeg_command.global_options,
+                metadata,
+                get_tool_version(ffmpeg_command.ffmpeg_path))
+        except (OSError, subprocess.SubprocessError) as e:
+            self.logger.warning(f"Encode cache disabled for {input_file_path}: {str(e)}")
+            return None, False
+        return cache_key, self.cache.get(cache_key, self.profile.Extension, output_file_path) is not None
 
+    def _cache_store(self, cache_key: Optional[str], output_file_path: str) -> None:
+        if cache_key is None:
+            return
+        try:
+            self.cache.put(cache_key, self.profile.Extension, output_file_path)
+        except OSError as e:
+            # a failed store only costs a future re-encode
+            self.logger.warning(f"Failed to cache {output_file_path}: {str(e)}")
+
+    def _record_history(self, ffmpeg_command: "FFmpegCommand", input_file_path: str, output_file_path: str, wall_seconds: float) -> None:
+        if self.history is None:
+            return
+        try:
+            duration = float(self.get_metadata(input_file_path)['format']['duration'])
+        except Exception:
+            duration = None  # still recorded, it only counts towards the size ratio
+        try:
+            bench = parse_benchmark(ffmpeg_command.stderr)
+            cpu_seconds = bench['utime'] + bench['stime'] if 'utime' in bench else None
+            self.history.record(EncodeSample(
+                profile=self.profile.Name,
+                source_format=os.path.splitext(input_file_path)[1].lstrip('.').lower(),
+                input_bytes=os.path.getsize(input_file_path),
+                output_bytes=os.path.getsize(output_file_path),
+                duration=duration,
+                wall_seconds=wall_seconds,
+                cpu_seconds=cpu_seconds,
+                maxrss_kib=bench.get('maxrss')))
         except OSError as e:
+            self.logger.warning(f"Failed to record encode history for {input_file_path}: {str(e)}")
+
+    def _global_args_list(self, ffmpeg_global_args: Optional[Dict[str, str]] = None) -> List[str]:
+        # add default global args
+        global_args: dict[str,str] = ProfileDataManager().load_arguments(FFMPEG_GLOBALARGS_PATH).get_arguments_as_dict()      
+
+        # add user global args
+        global_args.update(ffmpeg_global_args or {})                        
+        
+        return self._format_global_args(global_args)
+
+    def _finalize(self, input_file_path: str, output_file_path: str, output_path: Optional[str], delete_original: bool) -> None:
+        # check the stats
+        Stats(input_file_path, output_file_path).compare_file_sizes()
+
+        # Optionally delete the original file
+        if delete_original and input_file_path != output_path:
+            try:
+                os.remove(input_file_path)
+                self.logger.debug(f"Deleted original file: {input_file_path}")
+            except OSError as e:
+                self.logger.warning(f"Failed to delete original file {input_file_path}: {str(e)}")
+
+    def _encoding_error(self, input_file_path: str, e: Exception) -> EncodingError:
+        error_msg = str(e)
+        if isinstance(e, OSError):
             # Handle file system related errors
-            error_msg = str(e)
             self.logger.error(f"File system error during re-encoding of {input_file_path}: {error_msg}")
-            raise EncodingError(f"File system error re-encoding {input_file_path}: {error_msg}") from e
-        except Exception as e:
-            # Handle any other unexpected errors
-            error_msg = str(e)
-            self.logger.error(f"Unexpected error during re-encoding: {input_file_path}: {error_msg}")
-            raise EncodingError(f"Unexpected error re-encoding {input_file_path}: {error_msg}") from e
-
-        return output_file_path
+            return EncodingError(f"File system error re-encoding {input_file_path}: {error_msg}")
+        # Handle any other unexpected errors
+        self.logger.error(f"Unexpected error during re-encoding: {input_file_path}: {error_msg}")
+        return EncodingError(f"Unexpected error re-encoding {input_file_path}: {error_msg}")
     
     def _format_global_args(self, global_args:dict[str, str]) -> list[str]:         
         # Replace empty or null values 
         result = []
         for key, value in global_args.items():
+            if value is None:
+                # dropped by the caller, e.g. a default -timelimit
+                continue
             if key.startswith('-') and key.strip():  # Only include keys that start with '-'
                 result.append(key)
             if value is not None and str(value).strip():
                 result.append(str(value))
         return result
     
-    def _generate_unique_output_file_path(self, file_path, extension: str, rename='Encoded') -> str:
+    def _generate_unique_output_file_path(self, file_path, extension: str, rename='Encoded', reserved: Optional[Set[str]] = None) -> str:
         """
         Generate a unique output path that doesn't exist.
 
         Args:
             file_path: target output file 
             extension: File extension including the dot
+            reserved: Optional paths already claimed by jobs that have not written them yet
 
         Returns:
             A unique file path that doesn't exist
@@ -163,7 +886,7 @@ class Encoder:
                 path = f"{base_path}{extension}"
             else:
                 path = f"{base_path+'_'+rename}{'' if counter == 1 else f'-{counter-1}'}{extension}"
-            if not os.path.exists(path):
+            if not os.path.exists(path) and not (reserved and path in reserved):
                 return path
             counter += 1
 
@@ -171,6 +894,9 @@ class Encoder:
         """
         Get metadata of the file.
 
+        The container headers are read in process when possible (see native_probe),
+        then the probe cache is checked, ffprobe only runs for the remaining files.
+
         Args:
             file_path: Path to the file.
 
@@ -180,13 +906,67 @@ class Encoder:
         Raises:
             ffmpeg.Error: If metadata retrieval fails
         """
+        if self.native_probe:
+            metadata = probe_file(file_path)
+            if metadata is not None:
+                return metadata
+
+        probe_version = self._probe_version()
+        if probe_version is not None:
+            try:
+                metadata = self.probe_cache.get(file_path, probe_version)
+            except OSError:
+                metadata = None  # let ffprobe report it
+            if metadata is not None:
+                return metadata
+
         try:
-            return self.ffmpeg_cmd.probe(file_path, cmd=FFPROBE_PATH)
+            metadata = self.ffmpeg_cmd.probe(file_path, cmd=FFPROBE_PATH)
         except ffmpeg.Error as e:
             error_message = e.stderr.decode('utf-8')
             self.logger.error(f"Error retrieving metadata for {file_path}: {error_message}")
             raise
 
+        if probe_version is not None:
+            self.probe_cache.put(file_path, probe_version, metadata)
+        return metadata
+
+    def get_metadata_many(self, file_paths: Iterable[str], jobs: Optional[int] = None) -> Dict[str, Optional[dict]]:
+        """
+        Get metadata of many files in parallel, see get_metadata.
+
+        Args:
+            file_paths: Paths to the files
+            jobs: Maximum number of concurrent probes, defaults to the CPU count
+
+        Returns:
+            Metadata per file path, None for files that could not be probed (the error is logged)
+        """
+        file_paths = list(dict.fromkeys(file_paths))
+        if not file_paths:
+            return {}
+
+        def probe(file_path):
+            try:
+                return self.get_metadata(file_path)
+            except Exception as e:
+                self.logger.error(f"Error retrieving metadata for {file_path}: {str(e)}")
+                return None
+
+        # FFmpegCommand.probe keeps no state, it's safe to share between threads
+        with ThreadPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(file_paths))) as executor:
+            return dict(zip(file_paths, executor.map(probe, file_paths)))
+
+    def _probe_version(self) -> Optional[str]:
+        """Version of ffprobe used in probe cache keys, None when the probe cache is off or unavailable."""
+        if self.probe_cache is None:
+            return None
+        try:
+            return get_tool_version(FFPROBE_PATH)
+        except (OSError, subprocess.SubprocessError) as e:
+            self.logger.warning(f"Probe cache disabled: {str(e)}")
+            return None
+
 
 class Stats:
     def __init__(self, input_file, output_file, logger: logger = None): # type: ignore
@@ -239,23 +1019,138 @@ class Stats:
         logger.success(f"Size ratio (output/source): {size_ratio:.2f}")
 
 
+@dataclass
+class OutputSpec:
+    """
+    One output of a multi-output FFmpeg command.
+
+    Attributes:
+        output_file (str): Path of the output file
+        output_options (dict): Encoding options for this output only
+        metadata_options (dict): Metadata tags for this output only
+        stream_map (str): Optional -map specifier, e.g. '0:a:0' or '[s0]'
+    """
+    output_file: str
+    output_options: Dict[str, str] = field(default_factory=dict)
+    metadata_options: Dict[str, str] = field(default_factory=dict)
+    stream_map: Optional[str] = None
+
+class CommandTemplate:
+    """
+    Frozen argv of a single-output FFmpegCommand with slots for the input, the
+    output and the metadata tags.
+
+    The global and output options are flattened once, building the argv of a
+    job only copies them around the job's paths and tags. Instances are shared
+    between jobs and must not be modified.
+
+    Attributes:
+        ffmpeg_path (str): Path to the ffmpeg binary
+        global_options (tuple): Formatted global options, placed after the input
+        output_options (dict): Output options, e.g. {'acodec': 'flac'}
+    """
+    __slots__ = ('ffmpeg_path', 'global_options', 'output_options', '_output_argv')
+
+    def __init__(self, ffmpeg_path: str, global_options: Iterable[str], output_options: Dict[str, str]):
+        self.ffmpeg_path = ffmpeg_path
+        self.global_options = tuple(global_options)
+        self.output_options = dict(output_options)
+        output_argv = []
+        for key, value in self.output_options.items():
+            output_argv.extend([f"-{key}", value])
+        self._output_argv = tuple(output_argv)
+
+    def argv(
+        self,
+        input_file: str,
+        output_file: str,
+        metadata: Optional[Dict[str, str]] = None,
+        picture_file: Optional[str] = None
+    ) -> List[str]:
+        """Argv of a job, the same FFmpegCommand.compile builds for these paths, tags and cover art."""
+        if picture_file:
+            command = [self.ffmpeg_path, "-i", input_file, "-i", picture_file,
+                       *attached_picture_options(self.global_options)]
+        else:
+            command = [self.ffmpeg_path, "-i", input_file, *self.global_options]
+        if metadata:
+            for key, value in metadata.items():
+                command.extend(["-metadata", f"{key}={value}"])
+        command.extend(self._output_argv)
+        command.append(output_file)
+        return command
+
+    def command(
+        self,
+        input_file: str,
+        output_file: str,
+        metadata: Optional[Dict[str, str]] = None,
+        logger: logger = None # type: ignore
+    ) -> "FFmpegCommand":
+        """FFmpegCommand of a job, compiled from this template."""
+        return FFmpegCommand(self.ffmpeg_path, logger=logger).from_template(self, input_file, output_file, metadata)
+
+def attached_picture_options(global_options: Iterable[str]) -> List[str]:
+    """Global options of a command with a cover art input, -vn would drop the picture stream."""
+    return [option for option in global_options if option != '-vn'] + list(ATTACHED_PICTURE_OPTIONS)
+
 class FFmpegCommand:
     
     def __init__(self, ffmpeg_path="ffmpeg", logger: logger = None): # type: ignore
         """Initialize the FFmpeg command builder."""
         self.ffmpeg_path = ffmpeg_path
         self.input_file = None
+        self.input_options = []  # options placed before -i, e.g. the input format of a pipe
+        self.picture_file = None  # optional second input embedded as cover art, see attach_picture
         self.output_file = None  # optional
         self.metadata_options = {}
         self.output_options = {}
+        self.outputs: List[OutputSpec] = []  # multi-output mode, see add_output
+        self.filter_graph = None
         self.global_options = ["-y", "-hide_banner", "-loglevel", "info"]  # Default global options
+        self.stderr: Optional[str] = None  # stderr of the last run, only when captured
+        self.template: Optional[CommandTemplate] = None  # set by from_template, compile then only fills its slots
         self.logger = logger if logger is not None else get_logger(__name__)
 
+    def from_template(self, template: CommandTemplate, input_file, output_file, metadata_dict=None):
+        """Set up a single-output command from a CommandTemplate, replacing the current setup."""
+        self.ffmpeg_path = template.ffmpeg_path
+        self.input_file = input_file
+        self.input_options = []
+        self.picture_file = None
+        self.output_file = output_file
+        self.metadata_options = dict(metadata_dict) if metadata_dict else {}
+        # shared with the template until an option setter copies them, see _detach_template
+        self.output_options = template.output_options
+        self.global_options = template.global_options
+        self.outputs = []
+        self.filter_graph = None
+        self.template = template
+        return self  # Fluent API
+
+    def _detach_template(self):
+        """Take private copies of the template options before they are changed."""
+        if self.template is not None:
+            self.output_options = dict(self.output_options)
+            self.global_options = list(self.global_options)
+            self.template = None
+
     def input(self, input_file):
         """Set the input file."""
         self.input_file = input_file
         return self  # Fluent API
 
+    def input_args(self, input_list):
+        """Set input options, they apply to the input file only."""
+        self._detach_template()
+        self.input_options = list(input_list)
+        return self  # Fluent API
+
+    def attach_picture(self, picture_file):
+        """Embed an image as the cover art of a single output, as an attached picture stream."""
+        self.picture_file = picture_file
+        return self  # Fluent API
+
     def output(self, output_file):
         """Set the output file (optional)."""
         self.output_file = output_file
@@ -269,25 +1164,48 @@ class FFmpegCommand:
 
     def output_args(self, output_dict):
         """Set output encoding options."""
+        self._detach_template()
         self.output_options.update(output_dict)
         return self  # Fluent API
 
     def global_args(self, global_list):
         """Set global FFmpeg options."""
+        self._detach_template()
         self.global_options = global_list
         return self  # Fluent API
 
+    def add_output(self, output_file, output_dict=None, metadata_dict=None, stream_map=None):
+        """Add an output, switching the command to multi-output mode."""
+        self.outputs.append(OutputSpec(output_file, dict(output_dict or {}), dict(metadata_dict or {}), stream_map))
+        return self  # Fluent API
+
+    def filter_complex(self, filter_graph):
+        """Set a -filter_complex graph, its labelled outputs can be used as stream maps."""
+        self.filter_graph = filter_graph
+        return self  # Fluent API
+
     def compile(self):
         """Constructs the FFmpeg command."""
         if not self.input_file:
             raise ValueError("Input file must be set.")
 
+        if self.outputs:
+            return self._compile_outputs()
+
+        if self.template is not None and self.output_file:
+            return self.template.argv(self.input_file, self.output_file, self.metadata_options, self.picture_file)
+
         # Default output file if not set
         if not self.output_file:
             self.output_file = self.input_file
 
         # important the order
-        command = [self.ffmpeg_path] + ["-i", self.input_file] + self.global_options 
+        command = [self.ffmpeg_path] + self.input_options + ["-i", self.input_file]
+        if self.picture_file:
+            command.extend(["-i", self.picture_file])
+            command.extend(attached_picture_options(self.global_options))
+        else:
+            command.extend(self.global_options)
 
         # Add metadata
         for key, value in self.metadata_options.items():
@@ -302,9 +1220,42 @@ class FFmpegCommand:
 
         return command
 
-    def run(self, capture_stdout=False, capture_stderr=False):
-        """Run the FFmpeg command."""
+    def _compile_outputs(self):
+        """Constructs a single-decode FFmpeg command with one entry per OutputSpec."""
+        command = [self.ffmpeg_path] + self.input_options + ["-i", self.input_file]
+        if self.filter_graph:
+            command.extend(["-filter_complex", self.filter_graph])
+
+        for spec in self.outputs:
+            # Options before an output file only apply to that output, so the
+            # defaults (e.g. -map_metadata, -vn) are repeated for each one
+            command.extend(self.global_options)
+            if spec.stream_map:
+                command.extend(["-map", spec.stream_map])
+            for key, value in {**self.metadata_options, **spec.metadata_options}.items():
+                command.extend(["-metadata", f"{key}={value}"])
+            for key, value in {**self.output_options, **spec.output_options}.items():
+                command.extend([f"-{key}", value])
+            command.append(spec.output_file)
+
+        return command
+
+    def _output_files(self) -> str:
+        if self.outputs:
+            return ", ".join(spec.output_file for spec in self.outputs)
+        return self.output_file
+
+    def run(self, capture_stdout=False, capture_stderr=False, progress: Optional[Callable[[ProgressEvent], None]] = None):
+        """
+        Run the FFmpeg command.
+
+        With a progress callback, ffmpeg reports through `-progress pipe:1` and the
+        callback receives a ProgressEvent per block (about twice per second);
+        stdout is then used by the progress channel and not returned.
+        """
         command = self.compile()
+        if progress is not None:
+            return self._run_with_progress(command, progress)
         
         # Set subprocess options for capturing output
         stdout_option = subprocess.PIPE if capture_stdout else None
@@ -313,12 +1264,167 @@ class FFmpegCommand:
         try:
             self.logger.debug("Running FFmpeg command:", " ".join(command))
             process = subprocess.run(command, check=True, stdout=stdout_option, stderr=stderr_option, text=True)
-            self.logger.success(f"Executed: {self.output_file}")
+            self.stderr = process.stderr
+            self.logger.success(f"Executed: {self._output_files()}")
             return process.stdout
         except subprocess.CalledProcessError as e:
             logger.error(f"FFmpeg failed with error: {e.stderr}")
             raise
 
+    async def run_async(self, capture_stdout=False, capture_stderr=False, progress: Optional[Callable[[ProgressEvent], None]] = None):
+        """Run the FFmpeg command as an asyncio subprocess, killing it if the task is cancelled, see run."""
+        command = self.compile()
+        if progress is not None:
+            command = self._with_progress(command)
+            capture_stdout = capture_stderr = True
+
+        stdout_option = asyncio.subprocess.PIPE if capture_stdout else None
+        stderr_option = asyncio.subprocess.PIPE if capture_stderr else None
+
+        self.logger.debug("Running FFmpeg command:", " ".join(command))
+        process = await asyncio.create_subprocess_exec(*command, stdout=stdout_option, stderr=stderr_option)
+        try:
+            if progress is None:
+                stdout, stderr = await process.communicate()
+            else:
+                stdout = None
+                _, stderr = await asyncio.gather(self._read_progress_async(process.stdout, progress), process.stderr.read())
+                await process.wait()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+
+        stdout = stdout.decode("utf-8", errors="replace") if stdout is not None else None
+        stderr = stderr.decode("utf-8", errors="replace") if stderr is not None else None
+        self.stderr = stderr
+        if process.returncode != 0:
+            logger.error(f"FFmpeg failed with error: {stderr}")
+            raise subprocess.CalledProcessError(process.returncode, command, output=stdout, stderr=stderr)
+
+        self.logger.success(f"Executed: {self._output_files()}")
+        return stdout
+
+    def _with_progress(self, command: List[str]) -> List[str]:
+        return [command[0], "-progress", "pipe:1"] + command[1:]
+
+    def _run_with_progress(self, command: List[str], progress: Callable[[ProgressEvent], None]) -> None:
+        command = self._with_progress(command)
+        self.logger.debug("Running FFmpeg command:", " ".join(command))
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        # stderr is drained in the background so it never blocks the progress channel
+        stderr_tail = collections.deque(maxlen=STREAM_STDERR_LINES)
+        stderr_reader = threading.Thread(target=lambda: stderr_tail.extend(process.stderr), daemon=True)
+        stderr_reader.start()
+        try:
+            parser = ProgressParser()
+            for line in process.stdout:
+                event = parser.feed(line)
+                if event is not None:
+                    progress(event)
+            process.wait()
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            stderr_reader.join()
+            process.stdout.close()
+            process.stderr.close()
+
+        stderr = self.stderr = b''.join(stderr_tail).decode("utf-8", errors="replace")
+        if process.returncode != 0:
+            logger.error(f"FFmpeg failed with error: {stderr}")
+            raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
+        self.logger.success(f"Executed: {self._output_files()}")
+
+    @staticmethod
+    async def _read_progress_async(stream: asyncio.StreamReader, progress: Callable[[ProgressEvent], None]) -> None:
+        parser = ProgressParser()
+        async for line in stream:
+            event = parser.feed(line)
+            if event is not None:
+                progress(event)
+
+    def run_stream(self, source=None, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Run the FFmpeg command, feeding stdin and yielding stdout in chunks.
+
+        The input and output of the command should be pipe:0 and pipe:1. A writer
+        thread copies the source into stdin while the caller consumes the output,
+        both sides go through the OS pipe buffers, so memory stays bounded and a
+        slow consumer throttles ffmpeg (and ffmpeg throttles the source). Closing
+        the generator early kills the ffmpeg child.
+
+        Args:
+            source: Readable binary file object, iterable of bytes, or None when the input is not a pipe
+            chunk_size: Size of the chunks read from the source and from ffmpeg
+
+        Returns:
+            Iterator of encoded chunks
+
+        Raises:
+            subprocess.CalledProcessError: If ffmpeg exits with an error
+        """
+        command = self.compile()
+        self.logger.debug("Running FFmpeg command:", " ".join(command))
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if source is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+
+        # stderr is drained in the background so a chatty ffmpeg never blocks, only the tail is kept
+        stderr_tail = collections.deque(maxlen=STREAM_STDERR_LINES)
+        threads = [threading.Thread(target=lambda: stderr_tail.extend(process.stderr), daemon=True)]
+        writer_errors = []
+        if source is not None:
+            threads.append(threading.Thread(
+                target=self._feed, args=(process.stdin, source, chunk_size, writer_errors), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            for chunk in iter(lambda: process.stdout.read(chunk_size), b''):
+                yield chunk
+            process.wait()
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            for thread in threads:
+                thread.join()
+            process.stdout.close()
+            process.stderr.close()
+
+        stderr = b''.join(stderr_tail).decode("utf-8", errors="replace")
+        if process.returncode != 0:
+            logger.error(f"FFmpeg failed with error: {stderr}")
+            raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
+        if writer_errors:
+            raise writer_errors[0]
+        self.logger.success(f"Executed: {self._output_files()}")
+
+    @staticmethod
+    def _feed(stdin, source, chunk_size: int, errors: list) -> None:
+        """Copy the source into ffmpeg stdin, the writes block while the pipe is full."""
+        try:
+            chunks = iter(lambda: source.read(chunk_size), b'') if hasattr(source, 'read') else source
+            for chunk in chunks:
+                if chunk:
+                    stdin.write(chunk)
+        except BrokenPipeError:
+            # ffmpeg stopped reading (it failed or was killed), its exit status tells why
+            pass
+        except Exception as e:
+            errors.append(e)
+        finally:
+            try:
+                stdin.close()
+            except BrokenPipeError:
+                pass
+
     def probe(self, output_file, cmd:str=None):
         """Probe the output file to check media info."""
         if not output_file:
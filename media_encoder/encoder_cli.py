@@ -1,12 +1,27 @@
+import time
+# taken before the other imports, --timing reports how long they took
+IMPORT_STARTED = time.perf_counter()
 import argparse
 import os
 import sys
-from typing import Tuple
+from typing import Any, Dict, List, Tuple
 from models import ProfileConstants
-from config import FFMPEG_PATH, FFMPEG_PROFILES_PATH
+from config import FFMPEG_PATH, FFMPEG_PROFILES_PATH, ENCODE_CACHE_PATH, ENCODE_HISTORY_PATH
 from encoder import Encoder
+from batch_encoder import BatchEncoder
+from encode_cache import EncodeCache
+from encode_history import EncodeHistory
+from scheduler import DiskSpaceGuard
+from library_sync import LibrarySync
+from bulk_tagger import BulkTagger, TagJob
+from benchmark import Benchmark, CorpusSpec, MODES, compare_reports, format_comparison, format_results, load_report, save_report
 from data_manager import ProfileDataManager
-from utils import create_audio_profiles_table
+from utils import create_audio_profiles_table, create_measured_profiles_table
+import config
+IMPORT_FINISHED = time.perf_counter()
+
+# Third party modules kept off the start up path, imported on first use
+LAZY_MODULES = ["ffmpeg", "mutagen", "tabulate"]
 
 def check_ffmpeg() -> Tuple[bool, str]:
     """Check if ffmpeg is installed in the dist folder.
@@ -24,15 +39,36 @@ def show_profiles():
     data_manager = ProfileDataManager().load_profiles(profiles_path)
     print(create_audio_profiles_table(data_manager.profiles))
 
-def encode(input_file, output_file, profile, metadata):
+def encode(input_file, output_file, profile, metadata, use_cache=False, show_progress=False, record_history=False):
     try:                
         print(f"Encoding.. {input_file} -> {output_file} -p {profile}")                
-        Encoder(profile).encode(input_file, output_file, metadata_tags=kvp_as_dic(metadata))        
+        Encoder(profile, **cache_kwargs(use_cache), **history_kwargs(record_history)).encode(input_file, output_file, metadata_tags=kvp_as_dic(metadata), **progress_kwargs(show_progress))        
         print("Encoding complete!")
         
     except Exception as e:
         print(f"Error: {str(e)}")
  
+def encode_batch(input_dir, output_dir, profile, metadata, jobs=None, use_cache=False, show_progress=False, headroom=None, record_history=False):
+    try:
+        print(f"Encoding directory.. {input_dir} -> {output_dir} -p {profile} --jobs {jobs or os.cpu_count()}")
+        batch_encoder = BatchEncoder(profile, jobs=jobs, **cache_kwargs(use_cache), **admission_kwargs(headroom), **history_kwargs(record_history))
+        batch_jobs = batch_encoder.collect_jobs(input_dir, output_dir, metadata_tags=kvp_as_dic(metadata))
+        failed = 0
+        total = 0
+        for result in batch_encoder.encode(batch_jobs, **progress_kwargs(show_progress)):
+            total += 1
+            if result.success:
+                print(f"[ok] {result.input_path} -> {result.output_path} ({result.elapsed:.2f}s)")
+            else:
+                failed += 1
+                print(f"[failed] {result.input_path}: {result.error}")
+        print(f"Encoding complete! {total - failed}/{total} files encoded.")
+        return failed == 0
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return False
+
 def copy(input_file, output_file, metadata_str):
     try:                
         print(f"Copying metadata.. {input_file} -> {output_file} -m {metadata_str}")                
@@ -42,6 +78,199 @@ def copy(input_file, output_file, metadata_str):
     except Exception as e:
         print(f"Error: {str(e)}")
 
+def cache_kwargs(use_cache) -> Dict[str, Any]:
+    """Encoder/BatchEncoder keyword args enabling the default encode cache."""
+    return {'cache': EncodeCache()} if use_cache else {}
+
+def history_kwargs(record_history) -> Dict[str, Any]:
+    """Encoder/BatchEncoder/LibrarySync keyword args recording every encode into the default history."""
+    return {'history': EncodeHistory()} if record_history else {}
+
+def admission_kwargs(headroom) -> Dict[str, Any]:
+    """BatchEncoder/LibrarySync keyword args holding jobs back while their outputs would eat into the headroom."""
+    return {'admission': DiskSpaceGuard(headroom)} if headroom is not None else {}
+
+def progress_kwargs(show_progress) -> Dict[str, Any]:
+    """encode keyword args printing the progress of every running encode."""
+    return {'progress': print_progress} if show_progress else {}
+
+def print_progress(event):
+    """Print a ProgressEvent as a single line: position, completion, realtime factor and ETA."""
+    position = f"{event.out_time_us / 1e6:.1f}s"
+    percent = f" {event.fraction * 100:.0f}%" if event.fraction is not None else ""
+    speed = f" speed={event.speed:g}x" if event.speed else ""
+    eta = f" eta={event.eta:.0f}s" if event.eta is not None and not event.done else ""
+    state = "done" if event.done else "encoding"
+    print(f"[{state}] {event.output_file} {position}{percent}{speed}{eta} size={event.total_size}", flush=True)
+
+def parse_size(size_str) -> int:
+    """Parse a size in bytes with an optional K, M, G or T suffix (e.g. '512M')."""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    size_str = str(size_str).strip().upper().rstrip('B')
+    try:
+        if size_str and size_str[-1] in units:
+            return int(float(size_str[:-1]) * units[size_str[-1]])
+        return int(size_str)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid size: {size_str}")
+
+def cache_command(argv: List[str]) -> int:
+    """Handle `media-encoder cache stats|prune`."""
+    parser = argparse.ArgumentParser(prog="media-encoder cache", description="Inspect or prune the encode cache.")
+    parser.add_argument("action", choices=["stats", "prune"], help="stats: show cache usage, prune: evict least recently used entries.")
+    parser.add_argument("--cache-dir", default=ENCODE_CACHE_PATH, help="Cache directory.")
+    parser.add_argument("--max-size", type=parse_size, help="Size budget (e.g. 2G), prune defaults to the configured one, 0 empties the cache.")
+    args = parser.parse_args(argv)
+
+    cache_args = {'max_size_bytes': args.max_size} if args.max_size is not None else {}
+    cache = EncodeCache(args.cache_dir, **cache_args)
+    if args.action == "prune":
+        removed, freed = cache.prune()
+        print(f"Pruned {removed} entries, {freed} bytes freed.")
+    stats = cache.stats()
+    print(f"Cache: {stats.cache_dir}")
+    print(f"Entries: {stats.entries}")
+    print(f"Size: {stats.size_bytes} / {stats.max_size_bytes} bytes")
+    return 0
+
+def sync_command(argv: List[str]) -> int:
+    """Handle `media-encoder sync SRC_DIR DST_DIR -p PROFILE`."""
+    parser = argparse.ArgumentParser(prog="media-encoder sync", description="Mirror a source library into an encoded tree, only encoding new or changed files.")
+    parser.add_argument("source", help="Source library directory.")
+    parser.add_argument("output", help="Encoded library directory.")
+    parser.add_argument("-p", "--profile", required=True, help="Encoding profile, see more with -p.")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of parallel jobs, defaults to the CPU count.")
+    parser.add_argument("--cache", action="store_true", help="Serve unchanged encodes from the encode cache.")
+    parser.add_argument("--headroom", type=parse_size, help="Free space to keep on the output filesystem (e.g. 2G), jobs wait while their predicted outputs don't fit.")
+    parser.add_argument("--history", action="store_true", help="Record timings and sizes of every encode, see `media-encoder profiles --measured`.")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would change.")
+    args = parser.parse_args(argv)
+
+    try:
+        library_sync = LibrarySync(args.source, args.output, args.profile, jobs=args.jobs, **cache_kwargs(args.cache), **admission_kwargs(args.headroom), **history_kwargs(args.history))
+        report = library_sync.sync(dry_run=args.dry_run)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+    prefix = "Would encode" if args.dry_run else "Encoded"
+    for input_path in report.encoded:
+        print(f"[{'plan' if args.dry_run else 'ok'}] {input_path}")
+    for input_path, error in report.failed.items():
+        print(f"[failed] {input_path}: {error}")
+    for output_path in report.removed:
+        print(f"[removed] {output_path}")
+    print(f"Sync complete! {prefix} {len(report.encoded)}, removed {len(report.removed)}, "
+          f"unchanged {report.unchanged}, failed {len(report.failed)}.")
+    return 1 if report.failed else 0
+
+def profiles_command(argv: List[str]) -> int:
+    """Handle `media-encoder profiles [--measured]`."""
+    parser = argparse.ArgumentParser(prog="media-encoder profiles", description="Show the encoding profiles.")
+    parser.add_argument("--measured", action="store_true", help="Show the size and CPU factors measured from the encode history next to the static ones.")
+    parser.add_argument("--by-source", action="store_true", help="Split the measured figures per source format.")
+    parser.add_argument("--history-path", default=ENCODE_HISTORY_PATH, help="Encode history database.")
+    args = parser.parse_args(argv)
+
+    if not args.measured:
+        show_profiles()
+        return 0
+
+    profiles = ProfileDataManager().load_profiles(FFMPEG_PROFILES_PATH).profiles
+    estimates = EncodeHistory(args.history_path).estimates(by_source_format=args.by_source)
+    if not estimates:
+        print("No encodes recorded yet, encode with --history first.")
+        return 0
+    print(create_measured_profiles_table(profiles, estimates))
+    return 0
+
+def bench_command(argv: List[str]) -> int:
+    """Handle `media-encoder bench`."""
+    parser = argparse.ArgumentParser(prog="media-encoder bench", description="Measure encoder throughput over synthesized corpora.")
+    parser.add_argument("-p", "--profile", action="append", help="Profile to measure, repeatable, defaults to every profile.")
+    parser.add_argument("--duration", type=float, nargs="+", default=[30.0], help="Corpus durations in seconds.")
+    parser.add_argument("--sample-rate", type=int, nargs="+", default=[44100], help="Corpus sample rates in Hz.")
+    parser.add_argument("--bit-depth", type=int, nargs="+", default=[16], choices=[16, 24, 32], help="Corpus bit depths.")
+    parser.add_argument("--channels", type=int, default=2, help="Corpus channels.")
+    parser.add_argument("--mode", nargs="+", default=list(MODES), choices=MODES, help="encode: Encoder.encode to a file, null: pure encode into the null muxer.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per measurement, the fastest one is kept.")
+    parser.add_argument("--work-dir", help="Directory for the corpora, reused between runs, a temporary one by default.")
+    parser.add_argument("--report", help="Write the JSON report to this path.")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a baseline report, exits with 1 on regressions.")
+    parser.add_argument("--against", metavar="REPORT", help="With --compare, compare this existing report instead of running the benchmark.")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Realtime factor drop flagged as a regression (default 0.05).")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.against:
+            if not args.compare:
+                parser.error("--against requires --compare")
+            report = load_report(args.against)
+        else:
+            data_manager = ProfileDataManager().load_profiles(FFMPEG_PROFILES_PATH)
+            profiles = [data_manager.get_profile_by_name(name) for name in args.profile] if args.profile else data_manager.profiles
+            corpora = [CorpusSpec(duration, sample_rate, bit_depth, args.channels)
+                       for duration in args.duration for sample_rate in args.sample_rate for bit_depth in args.bit_depth]
+            report = Benchmark(profiles, corpora, modes=args.mode, repeat=args.repeat, work_dir=args.work_dir).run()
+            print(format_results(report))
+            if args.report:
+                save_report(report, args.report)
+                print(f"Report written to {args.report}")
+        if not args.compare:
+            return 0
+        rows = compare_reports(load_report(args.compare), report, tolerance=args.tolerance)
+    except (OSError, ValueError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+    print(format_comparison(rows))
+    return 1 if any(row['regression'] for row in rows) else 0
+
+def tag_command(argv: List[str]) -> int:
+    """Handle `media-encoder tag PATH [-m TAGS] [--manifest FILE]`."""
+    parser = argparse.ArgumentParser(prog="media-encoder tag", description="Write tags to many audio files in parallel, saving each file once.")
+    parser.add_argument("path", help="Audio file, or directory of audio files.")
+    parser.add_argument("-m", "--metadata", help="Tags in 'key1=value1, key2=value2' format, written to every file.")
+    parser.add_argument("--manifest", help="JSON object mapping file paths (relative to the directory) to their tags, instead of song.flac.json sidecar files.")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of parallel jobs, defaults to the CPU count.")
+    parser.add_argument("--threads", action="store_true", help="Use a thread pool instead of a process pool.")
+    args = parser.parse_args(argv)
+
+    try:
+        tags = kvp_as_dic(args.metadata)
+        if os.path.isdir(args.path):
+            jobs = BulkTagger.collect_jobs(args.path, args.manifest, tags)
+        elif not tags:
+            parser.error("tagging a single file requires -m")
+        else:
+            jobs = [TagJob(args.path, tags)]
+        failed = 0
+        total = 0
+        # imported here, so that the other commands don't load mutagen
+        from meta_updater import TagPadding
+        for result in BulkTagger(jobs=args.jobs, use_processes=not args.threads, padding=TagPadding()).tag(jobs):
+            total += 1
+            if result.success:
+                print(f"[ok] {result.file_path} ({result.tags} tags, {result.elapsed:.2f}s)")
+            else:
+                failed += 1
+                print(f"[failed] {result.file_path}: {result.error}")
+    except (OSError, ValueError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+    print(f"Tagging complete! {total - failed}/{total} files tagged.")
+    return 1 if failed else 0
+
+# Subcommands dispatched before the regular argument parsing
+SUBCOMMANDS = {
+    "cache": cache_command,
+    "sync": sync_command,
+    "profiles": profiles_command,
+    "bench": bench_command,
+    "tag": tag_command
+}
+
 def kvp_as_dic(metadata_str):
     """Dummy function to simulate copying with metadata."""
     metadata = {}
@@ -55,8 +284,35 @@ def kvp_as_dic(metadata_str):
             
     return metadata
 
+def format_timing(run_started: float) -> str:
+    """Start up report printed by --timing: import time, run time and what was set up lazily."""
+    finished = time.perf_counter()
+    loaded = [name for name in LAZY_MODULES if name in sys.modules]
+    return (
+        f"timing: imports {(IMPORT_FINISHED - IMPORT_STARTED) * 1000:.1f} ms, "
+        f"run {(finished - run_started) * 1000:.1f} ms, "
+        f"total {(finished - IMPORT_STARTED) * 1000:.1f} ms; "
+        f"lazy modules loaded: {', '.join(loaded) or 'none'}; "
+        f"log file sink: {'yes' if config.file_sink_configured() else 'no'}"
+    )
+
 def main():
-    
+    # --timing applies to every command, so it is taken out before they parse their arguments
+    timing = "--timing" in sys.argv[1:]
+    if timing:
+        sys.argv = [arg for arg in sys.argv if arg != "--timing"]
+    run_started = time.perf_counter()
+    try:
+        run()
+    finally:
+        if timing:
+            print(format_timing(run_started), file=sys.stderr)
+
+def run():
+
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        sys.exit(SUBCOMMANDS[sys.argv[1]](sys.argv[2:]))
+
     parser = argparse.ArgumentParser(description="Commnad line..")
 
     # Positional arguments (input and optional output)
@@ -67,6 +323,12 @@ def main():
     parser.add_argument("-o", "--operation", choices=["encode", "copy"], type=str, help="Operation [encode, copy], copy only for metadata copying.")
     parser.add_argument("-p", "--profile", nargs="?", const="default", help="Encoding profile, see more with -p.")
     parser.add_argument("-m", "--metadata", help="Metadata in 'key1=value1, key2=value2' format.")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of parallel jobs when the input is a directory, defaults to the CPU count.")
+    parser.add_argument("--cache", action="store_true", help="Serve unchanged encodes from the encode cache, see `media-encoder cache`.")
+    parser.add_argument("--progress", action="store_true", help="Print position, speed (realtime factor) and ETA of every running encode.")
+    parser.add_argument("--headroom", type=parse_size, help="Free space to keep on the output filesystem when the input is a directory (e.g. 2G), jobs wait while their predicted outputs don't fit.")
+    parser.add_argument("--history", action="store_true", help="Record timings and sizes of every encode, see `media-encoder profiles --measured`.")
+    parser.add_argument("--timing", action="store_true", help="Print import and start up time to stderr, works with every command.")
 
     args = parser.parse_args()
 
@@ -106,7 +368,11 @@ def main():
             print("Error: Profile is required for the 'encode' operation.", file=sys.stderr)
             sys.exit(1)
         output_file = args.output if args.output else args.input #set default output
-        encode(args.input, output_file, args.profile, args.metadata)
+        if os.path.isdir(args.input):
+            if not encode_batch(args.input, output_file, args.profile, args.metadata, args.jobs, args.cache, args.progress, args.headroom, args.history):
+                sys.exit(1)
+        else:
+            encode(args.input, output_file, args.profile, args.metadata, args.cache, args.progress, args.history)
 
     elif args.operation == "copy":
         if not args.metadata:
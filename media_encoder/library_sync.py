@@ -0,0 +1,309 @@
+"""
+Incremental library sync for the Media Encoder.
+
+Mirrors a source library into an encoded tree. A manifest stored in the
+output directory records, per source file, its size, mtime and the profile
+fingerprint it was encoded with, so a sync only encodes new or changed files
+and removes outputs whose sources are gone. A sync over an unchanged library
+only costs a directory walk and one stat per file.
+"""
+
+import hashlib
+import json
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+from loguru import logger
+from data_manager import ProfileDataManager, Profile
+from batch_encoder import BatchEncoder, BatchJob, SOURCE_EXTENSIONS
+from encode_cache import EncodeCache
+from encode_history import EncodeHistory
+from scheduler import AdmissionPolicy
+from config import get_logger
+
+if TYPE_CHECKING:
+    from meta_updater import TagPadding
+
+MANIFEST_FILE = ".media-encoder-manifest.json"
+MANIFEST_VERSION = 1
+PARTIAL_SUFFIX = ".partial"
+
+@dataclass(frozen=True)
+class SyncPlan:
+    """
+    Work needed to bring the output tree up to date.
+
+    Attributes:
+        encode (Dict[str, str]): Source path to target output path, new or changed files
+        remove (List[str]): Outputs whose sources are gone or now map elsewhere
+        unchanged (int): Number of up to date files
+    """
+    encode: Dict[str, str]
+    remove: List[str]
+    unchanged: int
+
+@dataclass
+class SyncReport:
+    """
+    Outcome of a sync.
+
+    Attributes:
+        encoded (List[str]): Sources encoded successfully
+        failed (Dict[str, str]): Sources that failed, with their error
+        removed (List[str]): Outputs deleted
+        unchanged (int): Number of up to date files
+    """
+    encoded: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+class LibrarySync:
+    """
+    Keep an encoded mirror of a source library up to date.
+    """
+    def __init__(
+        self,
+        source_dir: str,
+        output_dir: str,
+        profile,
+        jobs: Optional[int] = None,
+        cache: Optional[EncodeCache] = None,
+        logger: logger = None, # type: ignore
+        admission: Optional[Union[AdmissionPolicy, List[AdmissionPolicy]]] = None,
+        history: Optional[EncodeHistory] = None,
+        tag_padding: Optional["TagPadding"] = None
+    ):
+        """
+        Initialize the sync.
+
+        Args:
+            source_dir: Source library root
+            output_dir: Root of the encoded mirror, holds the manifest
+            profile: Profile name or Profile instance
+            jobs: Maximum number of concurrent encodes, defaults to the CPU count
+            cache: Optional EncodeCache used by the encodes
+            logger: Optional logger instance. If not provided, creates a new one.
+            admission: Optional admission policies of the encodes, see BatchEncoder
+            history: Optional EncodeHistory recording the measurements of the encodes
+            tag_padding: Optional TagPadding reserved in the outputs, so that retagging the mirror is in place
+
+        Raises:
+            ValueError: If source_dir is not a directory or the profile is unknown
+        """
+        if not os.path.isdir(source_dir):
+            raise ValueError(f"Directory does not exist: {source_dir}")
+        self.source_dir = os.path.abspath(source_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.logger = logger if logger is not None else get_logger(__name__)
+        self.batch_encoder = BatchEncoder(profile, jobs=jobs, logger=self.logger, cache=cache, admission=admission, history=history, tag_padding=tag_padding)
+        self.profile: Profile = self.batch_encoder.profile
+        self.manifest_path = os.path.join(self.output_dir, MANIFEST_FILE)
+
+    @staticmethod
+    def profile_fingerprint(profile: Profile) -> str:
+        """Fingerprint of the encoding settings, equivalent profiles share it."""
+        key = ProfileDataManager.get_equivalence_key(profile)
+        return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()[:16]
+
+    def load_manifest(self) -> Dict[str, Dict]:
+        """Load the manifest entries keyed by source path relative to source_dir."""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable manifest {self.manifest_path}: {str(e)}")
+            return {}
+        if data.get('version') != MANIFEST_VERSION:
+            return {}
+        return data.get('files', {})
+
+    def save_manifest(self, entries: Dict[str, Dict]) -> None:
+        """Write the manifest atomically."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        temp_path = self.manifest_path + PARTIAL_SUFFIX
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': entries}, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def plan(self, manifest: Optional[Dict[str, Dict]] = None) -> SyncPlan:
+        """
+        Compare the source tree against the manifest.
+
+        Args:
+            manifest: Optional manifest entries, loaded from disk when not provided
+
+        Returns:
+            The SyncPlan
+        """
+        manifest = self.load_manifest() if manifest is None else manifest
+        fingerprint = self.profile_fingerprint(self.profile)
+        targets = self._targets(manifest)
+
+        encode = {}
+        unchanged = 0
+        for rel_source, rel_target in list(targets.items()):
+            source_path = os.path.join(self.source_dir, rel_source)
+            target_path = os.path.join(self.output_dir, rel_target)
+            entry = manifest.get(rel_source)
+            try:
+                stat = os.stat(source_path)
+            except FileNotFoundError:
+                # deleted since the walk, handled like any source that is gone
+                self.logger.debug(f"Source disappeared during sync: {source_path}")
+                del targets[rel_source]
+                continue
+            if (entry
+                    and entry.get('size') == stat.st_size
+                    and entry.get('mtime_ns') == stat.st_mtime_ns
+                    and entry.get('fingerprint') == fingerprint
+                    and entry.get('output') == rel_target
+                    and os.path.exists(target_path)):
+                unchanged += 1
+            else:
+                encode[source_path] = target_path
+
+        remove = []
+        for rel_source, entry in manifest.items():
+            if targets.get(rel_source) != entry.get('output'):
+                remove.append(os.path.join(self.output_dir, entry['output']))
+
+        return SyncPlan(encode, remove, unchanged)
+
+    def sync(self, dry_run: bool = False) -> SyncReport:
+        """
+        Bring the output tree up to date.
+
+        Files are encoded next to their target and moved into place once
+        complete, so an interrupted sync never leaves truncated outputs. The
+        manifest is saved even if the sync is interrupted. Output directories
+        left empty by removed outputs are deleted.
+
+        Args:
+            dry_run: Only report what would change
+
+        Returns:
+            The SyncReport
+        """
+        manifest = self.load_manifest()
+        plan = self.plan(manifest)
+        report = SyncReport(unchanged=plan.unchanged)
+        if dry_run:
+            report.encoded = list(plan.encode)
+            report.removed = list(plan.remove)
+            return report
+
+        live_outputs = set(plan.encode.values())
+        for output_path in plan.remove:
+            self._forget(manifest, output_path)
+            # a changed source can keep its target, it's overwritten by the new encode
+            if output_path not in live_outputs and os.path.exists(output_path):
+                os.remove(output_path)
+                self.logger.info(f"Removed orphaned output: {output_path}")
+                self._remove_empty_dirs(os.path.dirname(output_path))
+            report.removed.append(output_path)
+
+        fingerprint = self.profile_fingerprint(self.profile)
+        targets = {}
+        jobs = []
+        for source_path, target_path in plan.encode.items():
+            temp_path = self._partial_path(target_path)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            targets[source_path] = (target_path, temp_path)
+            jobs.append(BatchJob(source_path, temp_path))
+
+        try:
+            for result in self.batch_encoder.encode(jobs):
+                target_path, temp_path = targets[result.input_path]
+                if not result.success:
+                    report.failed[result.input_path] = result.error
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    continue
+                os.replace(result.output_path, target_path)
+                stat = os.stat(result.input_path)
+                manifest[os.path.relpath(result.input_path, self.source_dir)] = {
+                    'size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'fingerprint': fingerprint,
+                    'output': os.path.relpath(target_path, self.output_dir)
+                }
+                report.encoded.append(result.input_path)
+        finally:
+            self.save_manifest(manifest)
+
+        return report
+
+    def _targets(self, manifest: Optional[Dict[str, Dict]] = None) -> Dict[str, str]:
+        """
+        Map every source (relative path) to its output (relative path), in a stable order.
+
+        Sources sharing a base name (song.flac, song.wav) are all suffixed with
+        their extension (song_flac.mp3, song_wav.mp3), whatever order they are
+        found in. A source keeps the output its manifest entry records while that
+        is still one of its names, so siblings added or removed later don't
+        rename outputs that are already there.
+        """
+        manifest = manifest or {}
+        extension = self.profile.Extension
+        output_dir = self.output_dir if self._is_nested_output() else None
+        sources = []
+        for job in BatchEncoder.collect_jobs(self.source_dir, extensions=SOURCE_EXTENSIONS):
+            if output_dir and os.path.commonpath([job.input_path, output_dir]) == output_dir:
+                continue
+            sources.append(os.path.relpath(job.input_path, self.source_dir))
+
+        def names(rel_source: str) -> Tuple[str, str]:
+            base, source_ext = os.path.splitext(rel_source)
+            return base + extension, f"{base}_{source_ext.lstrip('.').lower()}{extension}"
+
+        targets = {}
+        claimed = set()
+        for rel_source in sources:
+            recorded = manifest.get(rel_source, {}).get('output')
+            if recorded in names(rel_source) and recorded not in claimed:
+                targets[rel_source] = recorded
+                claimed.add(recorded)
+
+        new_sources = [rel_source for rel_source in sources if rel_source not in targets]
+        shared = Counter(names(rel_source)[0] for rel_source in new_sources)
+        for rel_source in new_sources:
+            plain, suffixed = names(rel_source)
+            rel_target = plain if shared[plain] == 1 and plain not in claimed else suffixed
+            counter = 2
+            while rel_target in claimed:
+                # song_flac.mp3 is also the plain name of song_flac.wav
+                rel_target = f"{os.path.splitext(suffixed)[0]}_{counter}{extension}"
+                counter += 1
+            claimed.add(rel_target)
+            targets[rel_source] = rel_target
+        return {rel_source: targets[rel_source] for rel_source in sources}
+
+    def _is_nested_output(self) -> bool:
+        return os.path.commonpath([self.source_dir, self.output_dir]) == self.source_dir
+
+    def _partial_path(self, target_path: str) -> str:
+        directory, file_name = os.path.split(target_path)
+        base, extension = os.path.splitext(file_name)
+        # keep the real extension last, ffmpeg picks the muxer from it
+        return os.path.join(directory, f".{base}{PARTIAL_SUFFIX}{extension}")
+
+    def _remove_empty_dirs(self, directory: str) -> None:
+        """Delete directory and its parents while they are empty, up to output_dir."""
+        while directory != self.output_dir and os.path.commonpath([directory, self.output_dir]) == self.output_dir:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                # not empty, or already gone
+                return
+            self.logger.debug(f"Removed empty output directory: {directory}")
+            directory = os.path.dirname(directory)
+
+    def _forget(self, manifest: Dict[str, Dict], output_path: str) -> None:
+        rel_output = os.path.relpath(output_path, self.output_dir)
+        for rel_source in [key for key, entry in manifest.items() if entry.get('output') == rel_output]:
+            del manifest[rel_source]
@@ -1,14 +1,21 @@
 import os
 import json
-from typing import Tuple, List, Dict, Any
+import struct
+import importlib
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, Tuple, List, Dict, Any, Callable, Optional
+from mutagen import PaddingInfo
 from mutagen.flac import FLAC, Picture
 from mutagen.mp3 import MP3
-from mutagen.id3 import APIC, USLT, ID3
-from mutagen.mp4 import MP4, MP4Cover
+from mutagen.id3 import USLT, ID3, Frames
+from mutagen.mp4 import MP4, MP4Tags
 from mutagen.wave import WAVE
 from mutagen.aac import AAC
-from deepdiff import DeepDiff
-from config import MUTAGEN_AUDIO_TAGS
+from config import MUTAGEN_AUDIO_TAGS, TAG_PADDING_BYTES, TAG_PADDING_GROWTH
+from cover_art import COVER_ART_CACHE, CoverArtCache, CoverArtError, CoverImage
+from tag_diff import diff_tags, tags_equal
 
 class AudioFormatError(Exception):
     """Custom exception for audio format related errors."""
@@ -18,6 +25,402 @@ class MetadataError(Exception):
     """Custom exception for metadata related errors."""
     pass
 
+# ID3 frames a header-only updater doesn't parse: pictures, lyrics and embedded objects,
+# their bytes are still read with the rest of the tag
+HEADER_ONLY_SKIPPED_FRAMES = ('APIC', 'USLT', 'SYLT', 'GEOB')
+# Vorbis comments and MP4 atoms a header-only updater drops once loaded, mutagen reads
+# the whole ilst atom at once so MP4 payloads can't be skipped
+HEADER_ONLY_SKIPPED_COMMENTS = ('metadata_block_picture', 'lyrics', 'unsyncedlyrics')
+HEADER_ONLY_SKIPPED_ATOMS = ('\xa9lyr', 'covr')
+# Frames an ID3 tag is parsed with in header-only mode
+HEADER_ONLY_FRAMES = {name: frame for name, frame in Frames.items() if name not in HEADER_ONLY_SKIPPED_FRAMES}
+
+# Extensions whose mutagen save takes a padding policy
+PADDED_FORMATS = ('.flac', '.mp3', '.mp4', '.m4a', '.wav')
+
+# Prefix of the MP4 freeform atoms, used for tags without a mapping
+MP4_FREEFORM_PREFIX = '----:com.apple.iTunes:'
+
+# ID3 text frames the ffmpeg MP3 muxer writes as-is when given their id as metadata key,
+# other keys become TXXX frames
+FFMPEG_ID3_FRAMES = frozenset((
+    'TALB', 'TBPM', 'TCOM', 'TCON', 'TCOP', 'TDEN', 'TDLY', 'TDOR', 'TDRC', 'TDRL', 'TDTG',
+    'TENC', 'TEXT', 'TFLT', 'TIPL', 'TIT1', 'TIT2', 'TIT3', 'TKEY', 'TLAN', 'TLEN', 'TMCL',
+    'TMED', 'TMOO', 'TOAL', 'TOFN', 'TOLY', 'TOPE', 'TOWN', 'TPE1', 'TPE2', 'TPE3', 'TPE4',
+    'TPOS', 'TPRO', 'TPUB', 'TRCK', 'TRSN', 'TRSO', 'TSOA', 'TSOP', 'TSOT', 'TSRC', 'TSST'
+))
+# MP4 atoms the ffmpeg MP4 muxers write, by the metadata key they are read from
+FFMPEG_MP4_KEYS = {
+    '\xa9nam': 'title',
+    '\xa9ART': 'artist',
+    'aART': 'album_artist',
+    '\xa9alb': 'album',
+    '\xa9wrt': 'composer',
+    '\xa9day': 'date',
+    '\xa9gen': 'genre',
+    '\xa9cmt': 'comment',
+    '\xa9lyr': 'lyrics',
+    'cprt': 'copyright',
+    'trkn': 'track',
+    'disk': 'disc',
+    'tmpo': 'tmpo'
+}
+# Vorbis comment keys ffmpeg renames on write, e.g. comment -> DESCRIPTION
+FFMPEG_RENAMED_COMMENTS = ('comment', 'track', 'disc', 'album_artist')
+# Extensions whose ffmpeg muxer embeds an attached picture stream as cover art
+FFMPEG_COVER_FORMATS = ('.mp3', '.flac', '.mp4', '.m4a')
+# Extensions whose ffmpeg muxer writes Vorbis comments
+FFMPEG_COMMENT_FORMATS = ('.flac', '.ogg', '.opus')
+
+def _mp4_text(value: Any) -> Any:
+    return value
+
+def _mp4_freeform(value: Any) -> List[bytes]:
+    values = value if isinstance(value, list) else [value]
+    return [item.encode('utf-8') if isinstance(item, str) else item for item in values]
+
+def _mp4_number_pair(value: Any) -> List[Tuple[int, int]]:
+    """'2', '2/3', 2 or (2, 3) to the [(number, total)] of the trkn and disk atoms."""
+    if isinstance(value, (tuple, list)) and len(value) == 2:
+        return [(int(value[0]), int(value[1]))]
+    if isinstance(value, (int, float)):
+        return [(int(value), 0)]
+    if isinstance(value, str):
+        number, _, total = value.partition('/')
+        return [(int(number), int(total) if total else 0)]
+    raise ValueError(f"Invalid number format: {value}")
+
+def _mp4_integer(value: Any) -> List[int]:
+    return [int(value)]
+
+class TagSchema:
+    """
+    Tag mappings compiled into per-format dispatch tables.
+
+    ID3 frame classes are resolved and MP4 atom names decoded once, so writing
+    a tag is a dictionary lookup. Schemas are cached per process by path and
+    modification time and shared by every AudioMetaUpdater, see load.
+
+    Attributes:
+        mp3_tags (dict): Raw MP3 mappings of the tags file
+        mp4_tags (dict): Raw MP4 mappings of the tags file
+        id3_frames (dict): Tag key to a frame factory taking (value, encoding, lang)
+        mp4_atoms (dict): Tag key to (atom name, value converter)
+    """
+
+    # Converters of the MP4 atoms that don't take plain text
+    MP4_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+        'disk': _mp4_number_pair,
+        'trkn': _mp4_number_pair,
+        'tmpo': _mp4_integer
+    }
+
+    _cache: Dict[str, Tuple[Tuple[int, int], 'TagSchema']] = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, mp3_tags: Dict[str, Any], mp4_tags: Dict[str, Any]):
+        """
+        Compile validated tag mappings.
+
+        Raises:
+            MetadataError: If a frame class of the MP3 mappings can't be resolved
+        """
+        self.mp3_tags = mp3_tags
+        self.mp4_tags = mp4_tags
+        self.id3_frames = {key: self._frame_factory(key, self._frame_class(key, mapping['mutagen_frame']))
+                           for key, mapping in mp3_tags.items()}
+        self.mp4_atoms = {key: self._atom(mapping['mutagen_key']) for key, mapping in mp4_tags.items()}
+        # tag key to the ffmpeg metadata key writing the same frame or atom
+        self.ffmpeg_id3_keys = {key: mapping['mutagen_frame'].rpartition('.')[2] for key, mapping in mp3_tags.items()
+                                if mapping['mutagen_frame'].rpartition('.')[2] in FFMPEG_ID3_FRAMES}
+        self.ffmpeg_mp4_keys = {key: FFMPEG_MP4_KEYS[atom] for key, (atom, _) in self.mp4_atoms.items()
+                                if atom in FFMPEG_MP4_KEYS}
+
+    @classmethod
+    def load(cls, tags_path: str) -> 'TagSchema':
+        """
+        Return the schema of a tags file, compiling it only when the file changed.
+
+        Raises:
+            MetadataError: If mappings can't be loaded or are invalid
+        """
+        stat = os.stat(tags_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        path = os.path.abspath(tags_path)
+        with cls._cache_lock:
+            cached = cls._cache.get(path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            schema = cls(*AudioMetaUpdater.read_tag_mappings(tags_path))
+            cls._cache[path] = (version, schema)
+            return schema
+
+    def id3_frame(self, key: str, value: str, encoding: int, lang: str) -> Any:
+        """Build the ID3 frame of a tag, tags without a mapping become a USLT frame described by their key."""
+        factory = self.id3_frames.get(key)
+        if factory is None:
+            return USLT(encoding=encoding, lang=lang, desc=key, text=value)
+        return factory(value, encoding, lang)
+
+    def mp4_atom(self, key: str, value: Any) -> Tuple[str, Any]:
+        """Return the atom name and converted value of a tag, tags without a mapping become freeform atoms."""
+        atom, convert = self.mp4_atoms.get(key) or (MP4_FREEFORM_PREFIX + key, _mp4_freeform)
+        return atom, convert(value)
+
+    def ffmpeg_metadata(self, extension: str, key: str, value: Any) -> Optional[Tuple[str, str]]:
+        """
+        Translate a tag to the ffmpeg -metadata pair that writes the same frame, atom or comment.
+
+        Args:
+            extension: Output extension, it selects the muxer
+            key: The metadata key
+            value: The value to set for the key
+
+        Returns:
+            Tuple of (ffmpeg key, value), None if ffmpeg can't write the tag the way AudioMetaUpdater does
+        """
+        if not isinstance(value, (str, bool, int, float)):
+            return None
+        key, value = key.lower(), str(value).strip()
+        # empty values delete the tag, which only AudioMetaUpdater does
+        if not value or '=' in key:
+            return None
+        if extension == '.mp3':
+            frame = self.ffmpeg_id3_keys.get(key)
+            return (frame, value) if frame is not None else None
+        if extension in ('.mp4', '.m4a'):
+            ffmpeg_key = self.ffmpeg_mp4_keys.get(key)
+            if ffmpeg_key is None:
+                return None
+            atom, convert = self.mp4_atoms[key]
+            try:
+                converted = convert(value)
+            except ValueError:
+                return None  # left to AudioMetaUpdater, which reports the invalid value
+            if convert is _mp4_number_pair:
+                number, total = converted[0]
+                value = f"{number}/{total}" if total else str(number)
+            elif convert is _mp4_integer:
+                value = str(converted[0])
+            return ffmpeg_key, value
+        if extension in FFMPEG_COMMENT_FORMATS and key not in FFMPEG_RENAMED_COMMENTS:
+            return key, value
+        return None
+
+    @staticmethod
+    def _frame_class(key: str, frame_path: str) -> type:
+        module_name, _, class_name = frame_path.rpartition('.')
+        try:
+            return getattr(importlib.import_module(module_name or 'mutagen.id3'), class_name)
+        except (ImportError, AttributeError) as e:
+            raise MetadataError(f"Failed to load frame class for tag '{key}': {str(e)}")
+
+    @classmethod
+    def _frame_factory(cls, key: str, frame_class: type) -> Callable[[str, int, str], Any]:
+        if issubclass(frame_class, USLT):
+            # lyrics keep an empty description, other USLT tags are told apart by their key
+            desc = '' if key == 'lyrics' else key
+            return lambda value, encoding, lang: frame_class(encoding=encoding, lang=lang, desc=desc, text=value)
+        return lambda value, encoding, lang: frame_class(encoding=encoding, text=value)
+
+    @classmethod
+    def _atom(cls, mutagen_key: str) -> Tuple[str, Callable[[Any], Any]]:
+        # the tags file writes non-ASCII atom names as escapes, e.g. "\\xa9nam" for "\xa9nam"
+        if '\\' in mutagen_key:
+            mutagen_key = mutagen_key.encode('latin-1').decode('unicode_escape')
+        if mutagen_key.startswith('----:'):
+            return mutagen_key, _mp4_freeform
+        return mutagen_key, cls.MP4_CONVERTERS.get(mutagen_key, _mp4_text)
+
+class TagPadding:
+    """
+    Padding policy of tag saves.
+
+    A save that fits in the space the tags already take keeps that space, the
+    tags are rewritten in place. Once the padding is exhausted the file is
+    rewritten with room for the tags to grow by a factor of growth, and at
+    least reserve bytes of padding, so files whose tags keep growing are
+    rewritten a logarithmic number of times. Pictures don't count towards the
+    size of the tags, an album cover isn't expected to grow.
+    """
+
+    def __init__(self, reserve: int = TAG_PADDING_BYTES, growth: float = TAG_PADDING_GROWTH):
+        """
+        Initialize the policy.
+
+        Args:
+            reserve: Minimum padding in bytes of a rewritten file
+            growth: Factor the tags may grow by after a rewrite before the next one
+
+        Raises:
+            ValueError: If reserve is negative or growth is lower than 1
+        """
+        if reserve < 0:
+            raise ValueError("Padding reserve must not be negative")
+        if growth < 1:
+            raise ValueError("Padding growth must be at least 1")
+        self.reserve = reserve
+        self.growth = growth
+
+    def padding(self, info: PaddingInfo, tags_size: int = 0, top_up: bool = False) -> int:
+        """
+        Padding of a save, the mutagen padding callback.
+
+        Args:
+            info: Padding left after the save as computed by mutagen, negative if the tags don't fit
+            tags_size: Size of the saved tags without pictures in bytes, 0 if unknown
+            top_up: Also grow padding that is left but smaller than the reserve
+
+        Returns:
+            Padding in bytes, info.padding when the tags are rewritten in place
+        """
+        if info.padding >= 0 and (not top_up or info.padding >= self.reserve):
+            return info.padding
+        return max(self.reserve, int(tags_size * (self.growth - 1)))
+
+@dataclass
+class SaveReport:
+    """
+    How a save wrote the file.
+
+    Attributes:
+        in_place (bool): Whether the tags were rewritten in the space they had, without moving the audio data
+        padding (int): Padding left after the save, in bytes
+    """
+    in_place: bool
+    padding: int
+
+def _flac_metadata_size(file_path: str) -> int:
+    """Bytes of the metadata blocks of a FLAC file, padding included, 0 if they can't be walked."""
+    with open(file_path, 'rb') as f:
+        if f.read(4) != b'fLaC':
+            return 0
+        last = False
+        while not last:
+            header = f.read(4)
+            if len(header) < 4:
+                return 0
+            last = bool(header[0] & 0x80)
+            f.seek(int.from_bytes(header[1:], 'big'), os.SEEK_CUR)
+        return f.tell() - 4
+
+@dataclass
+class FFmpegTagPlan:
+    """
+    A tag set split between an ffmpeg encode and the tags written to its output afterwards.
+
+    Attributes:
+        metadata (dict): ffmpeg -metadata pairs
+        cover_path (str): Image embedded by ffmpeg as an attached picture, None if there's none
+        cover (CoverImage): The cover image of the tag set, None if there's none
+        remaining (list): (key, value) tags ffmpeg can't write, applied to the output with a single save
+    """
+    metadata: Dict[str, str] = field(default_factory=dict)
+    cover_path: Optional[str] = None
+    cover: Optional[CoverImage] = None
+    remaining: List[Tuple[str, Any]] = field(default_factory=list)
+
+    def fingerprint(self) -> Dict[str, str]:
+        """The tags the ffmpeg metadata doesn't carry, as strings to key the encode cache with."""
+        fingerprint = {}
+        # prefixed, they are merged with the ffmpeg metadata
+        if self.cover is not None:
+            fingerprint['tag_plan:cover_art'] = self.cover.digest
+        if self.remaining:
+            fingerprint['tag_plan:tags'] = json.dumps(self.remaining, default=str)
+        return fingerprint
+
+def plan_ffmpeg_tags(
+    extension: str,
+    tags: List[Tuple[str, Any]],
+    schema: TagSchema = None,
+    cover_cache: CoverArtCache = None
+) -> FFmpegTagPlan:
+    """
+    Split a tag set between ffmpeg -metadata pairs, an attached picture and the tags left to AudioMetaUpdater.
+
+    Tags are translated through the tag mappings, so ffmpeg writes the same
+    frames and atoms AudioMetaUpdater would. A key given more than once keeps
+    its last value, as it does with update_metadata_list.
+
+    Args:
+        extension: Output extension, it selects the muxer
+        tags: (key, value) pairs as taken by AudioMetaUpdater.update_metadata_list
+        schema: Optional compiled tag mappings, defaults to the shared schema of the default tags file
+        cover_cache: Optional cover art cache, defaults to the one shared by the process
+
+    Returns:
+        FFmpegTagPlan of the tags
+
+    Raises:
+        FileNotFoundError: If the cover art file doesn't exist
+        MetadataError: If the cover art can't be read or isn't a JPEG or PNG image
+        AudioFormatError: If tags are left to AudioMetaUpdater and it doesn't support the extension
+    """
+    extension = extension.lower()
+    schema = schema if schema is not None else TagSchema.load(MUTAGEN_AUDIO_TAGS)
+    cover_cache = cover_cache if cover_cache is not None else COVER_ART_CACHE
+
+    latest: Dict[Any, Tuple[Any, Any]] = {}
+    for key, value in tags:
+        # re-inserted, a tag takes the position of its last value
+        normalized = key.lower() if isinstance(key, str) else key
+        latest.pop(normalized, None)
+        latest[normalized] = (key, value)
+
+    plan = FFmpegTagPlan()
+    for normalized, (key, value) in latest.items():
+        if normalized == 'cover_art' and isinstance(value, str):
+            plan.cover = load_cover_image(value, cover_cache)
+            if extension in FFMPEG_COVER_FORMATS:
+                plan.cover_path = value
+                continue
+        elif isinstance(key, str) and key:
+            pair = schema.ffmpeg_metadata(extension, key, value)
+            if pair is not None:
+                plan.metadata[pair[0]] = pair[1]
+                continue
+        plan.remaining.append((key, value))
+
+    if plan.remaining and extension not in AudioMetaUpdater.SUPPORTED_FORMATS:
+        keys = ', '.join(str(key) for key, _ in plan.remaining)
+        raise AudioFormatError(f"Tags can't be written to {extension} files: {keys}")
+    return plan
+
+def load_cover_image(image_path: str, cover_cache: CoverArtCache = None) -> CoverImage:
+    """
+    Get a cover image from a cover art cache, reading the file only on a cache miss.
+
+    Raises:
+        FileNotFoundError: If the image file doesn't exist
+        MetadataError: If the image can't be read or isn't a JPEG or PNG image
+    """
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"Cover art file not found: {image_path}")
+    try:
+        return (cover_cache if cover_cache is not None else COVER_ART_CACHE).load(image_path)
+    except CoverArtError as e:
+        raise MetadataError(str(e))
+    except IOError as e:
+        raise MetadataError(f"Failed to read cover art file: {str(e)}")
+
+class _PictureHeader(Picture):
+    """FLAC picture block read without its image data, the payload is skipped with a seek."""
+
+    def load(self, data):
+        self.type, length = struct.unpack('>2I', data.read(8))
+        self.mime = data.read(length).decode('UTF-8', 'replace')
+        length, = struct.unpack('>I', data.read(4))
+        self.desc = data.read(length).decode('UTF-8', 'replace')
+        (self.width, self.height, self.depth,
+         self.colors, self.size) = struct.unpack('>5I', data.read(20))
+        data.seek(self.size, 1)
+        self.data = b''
+
+class _HeaderOnlyFLAC(FLAC):
+    """FLAC that doesn't read the image data of its pictures."""
+    METADATA_BLOCKS = [_PictureHeader if block is Picture else block for block in FLAC.METADATA_BLOCKS]
+
 class AudioMetaUpdater:
     """Class for updating metadata in various audio file formats."""
 
@@ -31,19 +434,36 @@ class AudioMetaUpdater:
         '.aac': (AAC, 'AAC audio')
     }
 
-    # Common MIME types
-    MIME_TYPES = {
-        'jpeg': 'image/jpeg',
-        'png': 'image/png'
-    }
-
-    def __init__(self, file_path: str, tags_path: str= MUTAGEN_AUDIO_TAGS):
+    def __init__(
+        self,
+        file_path: str,
+        tags_path: str= MUTAGEN_AUDIO_TAGS,
+        schema: TagSchema = None,
+        cover_cache: CoverArtCache = None,
+        header_only: bool = False,
+        padding: TagPadding = None
+    ):
         """
         Initialize the AudioMetadataUpdater with the file path.
 
+        The file is opened on first access to audio, not here. Use the updater as
+        a context manager to drop the mutagen object as soon as it's done with.
+
+        Example:
+            with AudioMetaUpdater(path, header_only=True) as updater:
+                tags = updater.get_current_tags()
+
         Args:
             file_path: Path to the audio file
             tags_path: Path to the tags mapping file
+            schema: Optional compiled tag mappings, defaults to the schema of tags_path
+                shared by every updater of the process
+            cover_cache: Optional cover art cache, defaults to the one shared by the process
+            header_only: Open the file read-only, without keeping picture and lyrics payloads. Only FLAC
+                skips the image data while reading; MP3, WAV and M4A tags are read as a whole block,
+                so the payloads are never parsed (ID3) or dropped once loaded (MP4). That saves memory, not I/O.
+            padding: Optional padding policy of the saves, mutagen's default padding when not provided.
+                Bulk and sync callers opt in with a TagPadding so that later tag edits are in place
 
         Raises:
             FileNotFoundError: If either file doesn't exist
@@ -57,12 +477,48 @@ class AudioMetaUpdater:
 
         self.file_path = file_path
         self.tags_path = tags_path
+        self.cover_cache = cover_cache if cover_cache is not None else COVER_ART_CACHE
+        self.header_only = header_only
+        self.padding = padding
+        self.last_save: SaveReport = None  # how the last save wrote the file, None before one or if unknown
+        self._audio = None  # opened on first access to audio
+        self._batch_depth = 0  # open batch() blocks, saves are deferred while above 0
+        self._dirty = False  # changes made inside the current batch
+        self._top_up = False  # the next save grows the padding to the reserve, see reserve_padding
         
         try:
-            self.mp3_tags, self.mp4_tags = self._load_tag_mappings(tags_path)
-            self.audio = self._load_audio_file()
+            self.schema = schema if schema is not None else TagSchema.load(tags_path)
         except (json.JSONDecodeError, KeyError) as e:
             raise MetadataError(f"Failed to load tag mappings: {str(e)}")
+        self._get_file_format()
+
+    def __enter__(self) -> "AudioMetaUpdater":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def audio(self) -> Any:
+        """The mutagen object of the file, loaded on first access."""
+        if self._audio is None:
+            self._audio = self._load_audio_file()
+        return self._audio
+
+    @audio.setter
+    def audio(self, audio: Any) -> None:
+        self._audio = audio
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the mutagen object is currently in memory."""
+        return self._audio is not None
+
+    def close(self) -> None:
+        """Drop the mutagen object and its unsaved changes, the file is loaded again on next access."""
+        self._audio = None
+        self._dirty = False
+        self._top_up = False
 
     def _get_file_format(self) -> Tuple[str, Any]:
         """
@@ -98,24 +554,26 @@ class AudioMetaUpdater:
                     f"Unsupported audio format: {ext}. Supported formats: {', '.join(self.SUPPORTED_FORMATS.keys())}"
                 )
             
+            id3_options = {'known_frames': HEADER_ONLY_FRAMES} if self.header_only else {}
             if ext == '.mp3':
-                audio = MP3(self.file_path, ID3=ID3)
+                audio = MP3(self.file_path, ID3=ID3, **id3_options)
                 if audio.tags is None:
                     audio.add_tags()
-                return audio
             elif ext in ['.mp4', '.m4a']:
-                return MP4(self.file_path)
+                audio = MP4(self.file_path)
             elif ext == '.flac':
-                return FLAC(self.file_path)
+                audio = _HeaderOnlyFLAC(self.file_path) if self.header_only else FLAC(self.file_path)
             elif ext == '.wav':
-                return WAVE(self.file_path)
+                audio = WAVE(self.file_path, **id3_options)
             elif ext == '.aac':
                 audio = AAC(self.file_path)
                 if audio.tags is None:
                     audio.add_tags()
-                return audio
             else:
                 raise AudioFormatError(f"Unsupported audio format: {ext}")
+            if self.header_only:
+                self._drop_payloads(audio)
+            return audio
                 
         except Exception as e:
             if isinstance(e, AudioFormatError):
@@ -124,15 +582,23 @@ class AudioMetaUpdater:
                 raise
             raise AudioFormatError(f"Failed to load audio file: {str(e)}")
 
-    def _load_tag_mappings(self, tags_path: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    def _drop_payloads(self, audio: Any) -> None:
+        """Remove the picture and lyrics payloads a header-only load still parsed."""
+        tags = getattr(audio, 'tags', None)
+        if tags is None:
+            return
+        if isinstance(tags, ID3):
+            # frames left out of known_frames are kept as raw bytes
+            tags.unknown_frames = []
+            return
+        for key in HEADER_ONLY_SKIPPED_ATOMS if isinstance(tags, MP4Tags) else HEADER_ONLY_SKIPPED_COMMENTS:
+            if key in tags:
+                del tags[key]
+
+    @staticmethod
+    def read_tag_mappings(tags_path: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         """
-        Load tag mappings from a JSON file.
-
-        Args:
-            tags_path: Path to the JSON file containing tag mappings
-
-        Returns:
-            Tuple containing tag mappings for MP3 and MP4 files
+        Read and validate the tag mappings of a JSON file, see TagSchema.load for the cached version.
 
         Raises:
             MetadataError: If mappings can't be loaded or are invalid
@@ -153,11 +619,7 @@ class AudioMetaUpdater:
                     if section == 'mp4_tags' and 'mutagen_key' not in mapping:
                         raise MetadataError(f"Missing mutagen_key for MP4 tag: {tag}")
 
-            # Cache the mappings
-            self._mp3_tag_cache = data['mp3_tags']
-            self._mp4_tag_cache = data['mp4_tags']
-
-            return self._mp3_tag_cache, self._mp4_tag_cache
+            return data['mp3_tags'], data['mp4_tags']
 
         except json.JSONDecodeError as e:
             raise MetadataError(f"Invalid JSON in tag mappings file: {str(e)}")
@@ -166,6 +628,128 @@ class AudioMetaUpdater:
         except Exception as e:
             raise MetadataError(f"Failed to load tag mappings: {str(e)}")
 
+    @contextmanager
+    def batch(self) -> Iterator["AudioMetaUpdater"]:
+        """
+        Apply the updates made inside the block in memory and save the file once on exit.
+
+        Nested blocks join the outermost one. If the block raises, nothing is
+        written and the in-memory tags are reloaded from the unchanged file.
+
+        Example:
+            with updater.batch():
+                updater.update_or_add_metadata('title', 'Song')
+                updater.update_or_add_metadata('artist', 'Band')
+
+        Raises:
+            MetadataError: If the final save fails
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            if self._batch_depth == 1:
+                self._rollback()
+            raise
+        finally:
+            self._batch_depth -= 1
+
+        if self._batch_depth == 0 and self._dirty:
+            try:
+                self._write()
+            except Exception as e:
+                self._rollback()
+                raise MetadataError(f"Failed to save metadata: {str(e)}")
+            self._dirty = False
+
+    def _save(self) -> None:
+        """Save the changes now, or at the end of the open batch."""
+        if self._batch_depth:
+            self._dirty = True
+        else:
+            self._write()
+
+    def _write(self) -> None:
+        """Save the mutagen object with the padding policy and record whether the file was rewritten."""
+        top_up, self._top_up = self._top_up, False
+        if os.path.splitext(self.file_path)[1].lower() not in PADDED_FORMATS:
+            self.audio.save()
+            self.last_save = None
+            return
+
+        policy = self.padding
+        if policy is None and top_up:
+            policy = TagPadding()
+        # the space the tags take now, less what the save leaves, is the size of the saved tags
+        available = self._tag_space() if policy is not None else 0
+        pictures = self._picture_bytes() if policy is not None else 0
+        reports = []
+
+        def padding(info: PaddingInfo) -> int:
+            if policy is None:
+                size = info.get_default_padding()
+            else:
+                tags_size = max(available - info.padding - pictures, 0) if available else 0
+                size = policy.padding(info, tags_size, top_up)
+            reports.append(SaveReport(size == info.padding, size))
+            return size
+
+        self.audio.save(padding=padding)
+        # mutagen skips the callback for saves without tags to lay out
+        self.last_save = reports[-1] if reports else None
+
+    def _tag_space(self) -> int:
+        """Bytes the tags and their padding take in the file, 0 if unknown."""
+        if os.path.splitext(self.file_path)[1].lower() == '.flac':
+            try:
+                return _flac_metadata_size(self.file_path)
+            except OSError:
+                return 0
+        # ID3 tags know the size they were read with, MP4 tags don't
+        size = getattr(getattr(self.audio, 'tags', None), 'size', 0)
+        return size if isinstance(size, int) else 0
+
+    def _picture_bytes(self) -> int:
+        """Bytes of the pictures embedded in the tags."""
+        if os.path.splitext(self.file_path)[1].lower() == '.flac':
+            return sum(len(picture.data) for picture in self.audio.pictures)
+        tags = getattr(self.audio, 'tags', None)
+        if isinstance(tags, ID3):
+            return sum(len(frame.data) for frame in tags.getall('APIC'))
+        if isinstance(tags, MP4Tags):
+            return sum(len(cover) for cover in tags.get('covr', []))
+        return 0
+
+    def reserve_padding(self) -> None:
+        """
+        Save the tags with at least the reserve of the padding policy.
+
+        Files with less padding are rewritten once, so that later tag edits are
+        in place. Inside a batch the save happens at the end of the block.
+        Without a padding policy the default TagPadding is reserved.
+
+        Raises:
+            MetadataError: If the file is opened header-only or the save fails
+        """
+        if self.header_only:
+            raise MetadataError(f"Audio file opened header-only, tags can't be written: {self.file_path}")
+        # files without tags get an empty tag holding the padding
+        if getattr(self.audio, 'tags', None) is None and hasattr(self.audio, 'add_tags'):
+            self.audio.add_tags()
+        self._top_up = True
+        if self._batch_depth:
+            self._dirty = True
+            return
+        try:
+            self._write()
+        except Exception as e:
+            self._rollback()
+            raise MetadataError(f"Failed to save metadata: {str(e)}")
+
+    def _rollback(self) -> None:
+        """Drop the unsaved changes of a batch, the tags are reloaded from the file on next access."""
+        self.close()
+
     def update_metadata_list(self, metadata_list: List[Tuple[str, Any]], encoding: int = 3, lang: str = 'eng') -> None:
         """
         Update or add a list of metadata to the audio file.
@@ -203,8 +787,10 @@ class AudioMetaUpdater:
         if not lang.islower():
             lang = lang.lower()
 
-        for key, value in metadata_list:
-            self.update_or_add_metadata(key, value, encoding, lang)
+        # all updates are applied in memory and written with a single save
+        with self.batch():
+            for key, value in metadata_list:
+                self.update_or_add_metadata(key, value, encoding, lang)
 
     def update_or_add_metadata(self, key: str, value: Any, encoding: int = 3, lang: str = 'eng') -> None:
         """
@@ -238,20 +824,20 @@ class AudioMetaUpdater:
         if not isinstance(value, (str, list, bool, int, float)):
             raise ValueError(f"Invalid value type: {type(value)}. Must be string, list, boolean, integer, or float.")
 
+        if self.header_only:
+            raise MetadataError(f"Audio file opened header-only, tags can't be written: {self.file_path}")
+
         # Handle string values
         if isinstance(value, str):
             value = value.strip()
             if not value:
-                # Load audio file if not already loaded
-                if self.audio is None:
-                    self.audio = self._load_audio_file()
                 # Remove the tag if it exists
                 try:
                     if hasattr(self.audio, 'tags') and self.audio.tags and key in self.audio.tags:
                         del self.audio.tags[key]
                     elif hasattr(self.audio, 'keys') and key in self.audio:
                         del self.audio[key]
-                    self.audio.save()
+                    self._save()
                 except Exception:
                     pass
                 return
@@ -260,10 +846,6 @@ class AudioMetaUpdater:
         key = key.lower()
 
         try:
-            # Load audio file if not already loaded
-            if self.audio is None:
-                self.audio = self._load_audio_file()
-
             # Get file extension to determine audio type
             ext = os.path.splitext(self.file_path)[1].lower()
             
@@ -282,7 +864,7 @@ class AudioMetaUpdater:
                 raise AudioFormatError(f"Unsupported audio format: {ext}")
 
             # Save changes
-            self.audio.save()
+            self._save()
 
         except (ValueError, FileNotFoundError, AudioFormatError) as e:
             raise
@@ -305,27 +887,7 @@ class AudioMetaUpdater:
             ValueError: If value type is invalid
         """
         if key == 'cover_art':
-            image_path = cover_path or value
-            if not os.path.exists(image_path):
-                raise FileNotFoundError(f"Cover art file not found: {image_path}")
-            
-            try:
-                picture = Picture()
-                with open(image_path, 'rb') as f:
-                    picture.data = f.read()
-                
-                # Try to determine MIME type from file extension
-                ext = os.path.splitext(image_path)[1].lower()
-                if ext in ['.jpg', '.jpeg']:
-                    picture.mime = self.MIME_TYPES['jpeg']
-                elif ext == '.png':
-                    picture.mime = self.MIME_TYPES['png']
-                else:
-                    raise MetadataError(f"Unsupported image format: {ext}")
-                    
-                self.audio.add_picture(picture)
-            except IOError as e:
-                raise MetadataError(f"Failed to read cover art file: {str(e)}")
+            self.audio.add_picture(self._cover_image(cover_path or value).flac_picture())
         else:
             # Validate value type for FLAC metadata
             if not isinstance(value, (str, list, bool, int, float)):
@@ -375,10 +937,7 @@ class AudioMetaUpdater:
                 elif not isinstance(value, str):
                     raise ValueError(f"Invalid value type for MP3 metadata: {type(value)}")
 
-                if key in self._mp3_tag_cache:
-                    self._add_standard_mp3_tag(key, value, encoding, lang)
-                else:
-                    self._add_custom_mp3_tag(key, value, encoding, lang)
+                self._add_mp3_tag(key, value, encoding, lang)
 
         except Exception as e:
             if isinstance(e, (ValueError, FileNotFoundError)):
@@ -387,55 +946,24 @@ class AudioMetaUpdater:
 
     def _handle_cover_art(self, value: str, cover_path: str = None, encoding: int = 3) -> None:
         """Handle cover art updates for audio files."""
-        image_path = cover_path or value
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Cover art file not found: {image_path}")
+        self.audio.tags.add(self._cover_image(cover_path or value).apic(encoding))
 
-        try:
-            with open(image_path, 'rb') as f:
-                image_data = f.read()
-
-            ext = os.path.splitext(image_path)[1].lower()
-            if ext in ['.jpg', '.jpeg']:
-                mime = self.MIME_TYPES['jpeg']
-            elif ext == '.png':
-                mime = self.MIME_TYPES['png']
-            else:
-                raise MetadataError(f"Unsupported image format: {ext}")
-
-            self.audio.tags.add(APIC(
-                encoding=encoding,
-                mime=mime,
-                type=3,  # Cover (front)
-                desc='Cover',
-                data=image_data
-            ))
-        except IOError as e:
-            raise MetadataError(f"Failed to read cover art file: {str(e)}")
-
-    def _add_standard_mp3_tag(self, key: str, value: str, encoding: int, lang: str) -> None:
-        """Add a standard MP3 tag using the tag mapping."""
-        try:
-            module_name, class_name = self._mp3_tag_cache[key]['mutagen_frame'].rsplit('.', 1)
-            module = __import__(module_name, fromlist=[class_name])
-            frame_class = getattr(module, class_name)
-
-            if not frame_class:
-                raise ValueError(f"Invalid frame class for tag: {key}")
+    def _cover_image(self, image_path: str) -> CoverImage:
+        """
+        Get a cover image from the updater's cache, reading the file only on a cache miss.
 
-            if key == 'lyrics':
-                self.audio.tags.add(frame_class(encoding=encoding, lang=lang, desc='', text=value))
-            else:
-                self.audio.tags.add(frame_class(encoding=encoding, text=value))
-        except (ImportError, AttributeError) as e:
-            raise MetadataError(f"Failed to load frame class for tag '{key}': {str(e)}")
+        Raises:
+            FileNotFoundError: If the image file doesn't exist
+            MetadataError: If the image can't be read or isn't a JPEG or PNG image
+        """
+        return load_cover_image(image_path, self.cover_cache)
 
-    def _add_custom_mp3_tag(self, key: str, value: str, encoding: int, lang: str) -> None:
-        """Add a custom MP3 tag using USLT frame."""
+    def _add_mp3_tag(self, key: str, value: str, encoding: int, lang: str) -> None:
+        """Add an ID3 frame built by the tag schema, custom tags become USLT frames."""
         try:
-            self.audio.tags.add(USLT(encoding=encoding, lang=lang, desc=key, text=value))
+            self.audio.tags.add(self.schema.id3_frame(key, value, encoding, lang))
         except Exception as e:
-            raise MetadataError(f"Failed to add custom MP3 tag '{key}': {str(e)}")
+            raise MetadataError(f"Failed to add MP3 tag '{key}': {str(e)}")
 
     def _update_mp4_metadata(self, key: str, value: Any, cover_path: str = None) -> None:
         """
@@ -453,26 +981,7 @@ class AudioMetaUpdater:
         """
         try:
             if key == 'cover_art':
-                image_path = cover_path or value
-                if not os.path.exists(image_path):
-                    raise FileNotFoundError(f"Cover art file not found: {image_path}")
-
-                try:
-                    with open(image_path, 'rb') as f:
-                        image_data = f.read()
-
-                    # Determine image format from file extension
-                    ext = os.path.splitext(image_path)[1].lower()
-                    if ext in ['.jpg', '.jpeg']:
-                        image_format = MP4Cover.FORMAT_JPEG
-                    elif ext == '.png':
-                        image_format = MP4Cover.FORMAT_PNG
-                    else:
-                        raise MetadataError(f"Unsupported image format: {ext}")
-
-                    self.audio['covr'] = [MP4Cover(image_data, imageformat=image_format)]
-                except IOError as e:
-                    raise MetadataError(f"Failed to read cover art file: {str(e)}")
+                self.audio['covr'] = [self._cover_image(cover_path or value).mp4_cover()]
             else:
                 # Convert value to appropriate type for MP4
                 if isinstance(value, (bool, int, float)):
@@ -480,40 +989,11 @@ class AudioMetaUpdater:
                 elif not isinstance(value, (str, list)):
                     raise ValueError(f"Invalid value type for MP4 metadata: {type(value)}")
 
-                if key in self._mp4_tag_cache:
-                    mutagen_key = self._mp4_tag_cache[key]['mutagen_key']
-                    try:
-                        # Handle special case for ISRC and other iTunes-specific tags
-                        if mutagen_key.startswith('----:'):
-                            if isinstance(value, str):
-                                value = value.encode('utf-8')
-                            self.audio[mutagen_key] = [value]
-                        # Handle special case for disc number
-                        elif mutagen_key == 'disk':
-                            if isinstance(value, str):
-                                disc_num = int(value)
-                                total_discs = 0  # Default to 0 if not specified
-                                if '/' in value:
-                                    disc_num, total_discs = map(int, value.split('/'))
-                            elif isinstance(value, (int, float)):
-                                disc_num = int(value)
-                                total_discs = 0
-                            else:
-                                raise ValueError(f"Invalid disc number format: {value}")
-                            self.audio[mutagen_key] = [(disc_num, total_discs)]
-                        else:
-                            self.audio[mutagen_key] = value
-                    except Exception as e:
-                        raise MetadataError(f"Failed to set MP4 tag '{key}' with key '{mutagen_key}': {str(e)}")
-                else:
-                    # Dynamically add a new tag for unsupported keys
-                    try:
-                        if isinstance(value, str):
-                            value = [value.encode('utf-8')]
-                        self.audio[f'----:com.apple.iTunes:{key}'] = value
-                    except Exception as e:
-                        raise MetadataError(f"Failed to add custom MP4 tag '{key}': {str(e)}")
-
+                try:
+                    atom, atom_value = self.schema.mp4_atom(key, value)
+                    self.audio[atom] = atom_value
+                except Exception as e:
+                    raise MetadataError(f"Failed to set MP4 tag '{key}': {str(e)}")
         except Exception as e:
             raise MetadataError(f"Failed to update MP4 metadata '{key}': {str(e)}")
 
@@ -549,10 +1029,7 @@ class AudioMetaUpdater:
                     raise ValueError(f"Invalid value type for WAV metadata: {type(value)}")
 
                 # Use ID3 frames for WAV metadata
-                if key in self._mp3_tag_cache:
-                    self._add_standard_mp3_tag(key, value, encoding, lang)
-                else:
-                    self._add_custom_mp3_tag(key, value, encoding, lang)
+                self._add_mp3_tag(key, value, encoding, lang)
 
         except Exception as e:
             raise MetadataError(f"Failed to update WAV metadata '{key}': {str(e)}")
@@ -576,26 +1053,7 @@ class AudioMetaUpdater:
                 self.audio.add_tags()
 
             if key == 'cover_art':
-                image_path = cover_path or value
-                if not os.path.exists(image_path):
-                    raise FileNotFoundError(f"Cover art file not found: {image_path}")
-
-                try:
-                    with open(image_path, 'rb') as f:
-                        image_data = f.read()
-
-                    # Determine image format from file extension
-                    ext = os.path.splitext(image_path)[1].lower()
-                    if ext in ['.jpg', '.jpeg']:
-                        image_format = MP4Cover.FORMAT_JPEG
-                    elif ext == '.png':
-                        image_format = MP4Cover.FORMAT_PNG
-                    else:
-                        raise MetadataError(f"Unsupported image format: {ext}")
-
-                    self.audio.tags['covr'] = [MP4Cover(image_data, imageformat=image_format)]
-                except IOError as e:
-                    raise MetadataError(f"Failed to read cover art file: {str(e)}")
+                self.audio.tags['covr'] = [self._cover_image(cover_path or value).mp4_cover()]
             else:
                 # Convert value to appropriate type
                 if isinstance(value, (bool, int, float)):
@@ -641,20 +1099,25 @@ class AudioMetaUpdater:
         """
         Get the difference between original and updated tags.
 
+        Keys and values are compared ignoring case and value order, binary
+        frames (cover art) by their content hash.
+
         :param original_tags: The original tags.
         :param updated_tags: The updated tags.
-        :return: A string representation of the differences.
-        """
-        diff = DeepDiff(
-            original_tags,
-            updated_tags, 
-            ignore_order=True, 
-            ignore_string_case=True, 
-            verbose_level=2,
-            cutoff_intersection_for_pairs=0.8,
-            exclude_regex_paths=[r".*APIC.*"]            
-        )
-        return diff.pretty()
+        :return: A string representation of the differences, empty if there are none.
+        """
+        return "\n".join(diff_tags(original_tags, updated_tags))
+
+    @staticmethod
+    def tags_equal(original_tags: Dict[str, Any], updated_tags: Dict[str, Any]) -> bool:
+        """
+        Check whether the original and updated tags hold the same values.
+
+        :param original_tags: The original tags.
+        :param updated_tags: The updated tags.
+        :return: True if get_metadata_diff would report no difference.
+        """
+        return tags_equal(original_tags, updated_tags)
 
     def get_current_tags(self) -> Dict[str, Any]:
         """
@@ -662,9 +1125,6 @@ class AudioMetaUpdater:
 
         :return: A dictionary containing the current tags.
         """
-        if self.audio is None:
-            return {}
-        
         try:
             if hasattr(self.audio, 'tags') and self.audio.tags:
                 return dict(self.audio.tags)
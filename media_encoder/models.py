@@ -72,4 +72,7 @@ class ProfileConstants:
     APPLE_MUSIC_HIRES_LOSSLESS = "Apple Music (Hi-Res Lossless)"
     AMAZON_MUSIC_ULTRA_HD = "Amazon Music Ultra HD (Hi-Res Lossless)"
     QOBUZ_SUBLIME = "Qobuz Sublime (Hi-Res)"
-    TIDAL_MASTER_MQA = "Tidal Master (MQA)"
\ No newline at end of file
+    TIDAL_MASTER_MQA = "Tidal Master (MQA)"
+
+# Profile measured CpuFactors are relative to, its CpuFactor is 1.0
+BASELINE_PROFILE = ProfileConstants.MP3_STANDARD_320KBPS
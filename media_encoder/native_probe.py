@@ -0,0 +1,308 @@
+"""
+In-process probing for the Media Encoder.
+
+Reads duration, sample rate, bit depth, channels, codec and tags from the
+container headers with mutagen and returns them in the ffprobe JSON shape
+used by ``Encoder.get_metadata`` consumers (``format`` and the audio entry of
+``streams``). Tag names follow ffmpeg's conversion tables, so e.g. an ID3
+TPE2 frame shows up as ``album_artist`` like it does in ffprobe.
+
+``probe_file`` returns None when a field can't be read natively, callers then
+fall back to ffprobe.
+"""
+
+import os
+import struct
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from mutagen.flac import FLAC
+    from mutagen.mp3 import MP3
+    from mutagen.mp4 import MP4
+    from mutagen.wave import WAVE
+
+# ffprobe format_name per mutagen file type
+FORMAT_NAMES = {
+    'FLAC': 'flac',
+    'MP3': 'mp3',
+    'MP4': 'mov,mp4,m4a,3gp,3g2,mj2',
+    'WAVE': 'wav',
+    'OggOpus': 'ogg',
+    'OggVorbis': 'ogg',
+}
+
+# Vorbis comment names ffmpeg converts, the other names are kept as stored
+VORBIS_TAGS = {
+    'ALBUMARTIST': 'album_artist',
+    'TRACKNUMBER': 'track',
+    'DISCNUMBER': 'disc',
+    'DESCRIPTION': 'comment',
+}
+
+# ID3v2 names ffmpeg converts, applied to text frame ids and TXXX descriptions,
+# other names are kept as they are
+ID3_TAGS = {
+    'TALB': 'album',
+    'TCOM': 'composer',
+    'TCON': 'genre',
+    'TCOP': 'copyright',
+    'TENC': 'encoded_by',
+    'TIT2': 'title',
+    'TLAN': 'language',
+    'TPE1': 'artist',
+    'TPE2': 'album_artist',
+    'TPE3': 'performer',
+    'TPOS': 'disc',
+    'TPUB': 'publisher',
+    'TRCK': 'track',
+    'TSSE': 'encoder',
+    'TDRC': 'date',
+    'TDRL': 'date',
+    'TYER': 'date',
+    'TDEN': 'creation_time',
+    'TCMP': 'compilation',
+    'TSOA': 'album-sort',
+    'TSOP': 'artist-sort',
+    'TSOT': 'title-sort',
+    'TIT1': 'grouping',
+    'USLT': 'lyrics',
+}
+
+# MP4 atoms ffmpeg exposes as tags
+MP4_TAGS = {
+    '\xa9nam': 'title',
+    '\xa9ART': 'artist',
+    'aART': 'album_artist',
+    '\xa9alb': 'album',
+    '\xa9cmt': 'comment',
+    '\xa9day': 'date',
+    '\xa9gen': 'genre',
+    '\xa9wrt': 'composer',
+    '\xa9too': 'encoder',
+    '\xa9grp': 'grouping',
+    '\xa9lyr': 'lyrics',
+    'cprt': 'copyright',
+    'desc': 'description',
+}
+MP4_FREEFORM_PREFIX = '----:com.apple.iTunes:'
+
+# RIFF INFO chunks ffmpeg exposes as tags
+RIFF_INFO_TAGS = {
+    'IART': 'artist',
+    'ICMT': 'comment',
+    'ICOP': 'copyright',
+    'ICRD': 'date',
+    'IGNR': 'genre',
+    'ILNG': 'language',
+    'INAM': 'title',
+    'IPRD': 'album',
+    'IPRT': 'track',
+    'ITRK': 'track',
+    'ISFT': 'encoder',
+    'ISMP': 'timecode',
+    'ITCH': 'encoded_by',
+}
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def probe_file(file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Probe an audio file without spawning ffprobe.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Metadata in the ffprobe JSON shape, None if the file can't be fully probed natively
+    """
+    # imported here, mutagen is a large part of the start up time of a CLI run
+    import mutagen
+
+    try:
+        audio = mutagen.File(file_path)
+    except (mutagen.MutagenError, OSError):
+        return None
+    file_type = type(audio).__name__
+    format_name = FORMAT_NAMES.get(file_type)
+    if format_name is None:
+        return None
+
+    try:
+        if file_type == 'FLAC':
+            probed = _probe_flac(audio)
+        elif file_type == 'MP3':
+            probed = _probe_mp3(audio)
+        elif file_type == 'MP4':
+            probed = _probe_mp4(audio, file_path)
+        elif file_type == 'WAVE':
+            probed = _probe_wave(audio, file_path)
+        else:
+            probed = _probe_ogg(audio)
+    except (OSError, struct.error, ValueError):
+        return None
+    if probed is None:
+        return None
+    stream, format_tags = probed
+
+    size = os.path.getsize(file_path)
+    duration = audio.info.length
+    stream.update({'index': 0, 'codec_type': 'audio', 'duration': f"{duration:.6f}"})
+    file_format = {
+        'filename': file_path,
+        'nb_streams': 1,
+        'format_name': format_name,
+        'duration': f"{duration:.6f}",
+        'size': str(size),
+        'tags': format_tags,
+    }
+    if duration > 0:
+        file_format['bit_rate'] = str(int(size * 8 / duration))
+    return {'streams': [stream], 'format': file_format}
+
+def _audio_stream(
+    codec_name: str,
+    info,
+    bits: Optional[int] = None,
+    bits_key: str = 'bits_per_raw_sample',
+    sample_rate: Optional[int] = None
+) -> Dict[str, Any]:
+    stream = {
+        'codec_name': codec_name,
+        'sample_rate': str(sample_rate or info.sample_rate),
+        'channels': info.channels,
+    }
+    if getattr(info, 'bitrate', 0):
+        stream['bit_rate'] = str(info.bitrate)
+    if bits:
+        stream[bits_key] = str(bits) if bits_key == 'bits_per_raw_sample' else bits
+    return stream
+
+def _vorbis_tags(comments) -> Dict[str, str]:
+    tags: Dict[str, List[str]] = {}
+    for key, value in comments or []:
+        tags.setdefault(VORBIS_TAGS.get(key.upper(), key), []).append(value)
+    # ffmpeg joins repeated comments with ';'
+    return {key: ';'.join(values) for key, values in tags.items()}
+
+def _id3_tags(id3) -> Dict[str, str]:
+    tags = {}
+    for frame in (id3.values() if id3 is not None else []):
+        frame_id = frame.FrameID
+        if frame_id == 'COMM':
+            tags[frame.desc or 'comment'] = str(frame.text[0]) if frame.text else ''
+        elif frame_id == 'USLT' and not frame.desc:
+            tags[f"lyrics-{frame.lang}"] = frame.text
+        elif frame_id.startswith('T') and hasattr(frame, 'text'):
+            key = frame.desc if frame_id == 'TXXX' else frame_id
+            # ffmpeg only reads the first value of multi-valued frames
+            tags[ID3_TAGS.get(key, key)] = str(frame.text[0]) if frame.text else ''
+    return tags
+
+def _probe_flac(audio: 'FLAC') -> Tuple[Dict[str, Any], Dict[str, str]]:
+    return _audio_stream('flac', audio.info, audio.info.bits_per_sample), _vorbis_tags(audio.tags)
+
+def _probe_mp3(audio: 'MP3') -> Tuple[Dict[str, Any], Dict[str, str]]:
+    return _audio_stream('mp3', audio.info), _id3_tags(audio.tags)
+
+def _probe_ogg(audio) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    if type(audio).__name__ == 'OggOpus':
+        # opus always decodes at 48 kHz, the header only stores the original rate
+        stream = _audio_stream('opus', audio.info, sample_rate=48000)
+    else:
+        stream = _audio_stream('vorbis', audio.info)
+    # ogg comments belong to the stream, not to the container
+    stream['tags'] = _vorbis_tags(audio.tags)
+    return stream, {}
+
+def _probe_mp4(audio: 'MP4', file_path: str) -> Optional[Tuple[Dict[str, Any], Dict[str, str]]]:
+    codec = audio.info.codec or ''
+    if codec == 'alac':
+        stream = _audio_stream('alac', audio.info, audio.info.bits_per_sample)
+    elif codec.startswith('mp4a.40.'):
+        stream = _audio_stream('aac', audio.info)
+    else:
+        return None
+
+    tags = _mp4_brand_tags(file_path)
+    for key, values in (audio.tags or {}).items():
+        if key in ('trkn', 'disk'):
+            number, total = values[0]
+            tags['track' if key == 'trkn' else 'disc'] = f"{number}/{total}" if total else str(number)
+        elif key in MP4_TAGS:
+            tags[MP4_TAGS[key]] = str(values[0])
+        elif key.startswith(MP4_FREEFORM_PREFIX):
+            value = values[0]
+            tags[key[len(MP4_FREEFORM_PREFIX):]] = value.decode('utf-8', errors='replace') if isinstance(value, bytes) else str(value)
+    return stream, tags
+
+def _mp4_brand_tags(file_path: str) -> Dict[str, str]:
+    """major_brand, minor_version and compatible_brands, as ffprobe reports them from the ftyp box."""
+    with open(file_path, 'rb') as f:
+        size, box_type = struct.unpack('>I4s', f.read(8))
+        if box_type != b'ftyp' or size < 16:
+            return {}
+        data = f.read(size - 8)
+    brands = data[8:]
+    return {
+        'major_brand': data[:4].decode('latin-1'),
+        'minor_version': str(struct.unpack('>I', data[4:8])[0]),
+        'compatible_brands': ''.join(brands[i:i + 4].decode('latin-1') for i in range(0, len(brands) - 3, 4)),
+    }
+
+def _probe_wave(audio: 'WAVE', file_path: str) -> Optional[Tuple[Dict[str, Any], Dict[str, str]]]:
+    fmt, info_tags = _read_riff(file_path)
+    if fmt is None or len(fmt) < 16:
+        return None
+    format_tag, _, _, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        # the real format is the first two bytes of the sub format GUID
+        format_tag = struct.unpack('<H', fmt[24:26])[0]
+
+    if format_tag == WAVE_FORMAT_PCM:
+        codec_name = 'pcm_u8' if bits == 8 else f"pcm_s{bits}le"
+    elif format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        codec_name = f"pcm_f{bits}le"
+    else:
+        return None
+
+    tags = dict(info_tags)
+    tags.update(_id3_tags(audio.tags))
+    return _audio_stream(codec_name, audio.info, bits, bits_key='bits_per_sample'), tags
+
+def _read_riff(file_path: str) -> Tuple[Optional[bytes], Dict[str, str]]:
+    """Read the fmt chunk and the LIST/INFO tags of a RIFF/WAVE file."""
+    fmt = None
+    tags = {}
+    with open(file_path, 'rb') as f:
+        riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            return None, {}
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            padded_size = chunk_size + (chunk_size & 1)
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                f.seek(padded_size - chunk_size, os.SEEK_CUR)
+            elif chunk_id == b'LIST' and chunk_size >= 4:
+                data = f.read(padded_size)
+                if data[:4] == b'INFO':
+                    tags.update(_riff_info_tags(data[4:chunk_size]))
+            else:
+                f.seek(padded_size, os.SEEK_CUR)
+    return fmt, tags
+
+def _riff_info_tags(data: bytes) -> Dict[str, str]:
+    tags = {}
+    offset = 0
+    while offset + 8 <= len(data):
+        chunk_id, chunk_size = struct.unpack('<4sI', data[offset:offset + 8])
+        value = data[offset + 8:offset + 8 + chunk_size].split(b'\x00', 1)[0]
+        key = chunk_id.decode('latin-1')
+        tags[RIFF_INFO_TAGS.get(key, key)] = value.decode('utf-8', errors='replace')
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return tags
@@ -0,0 +1,134 @@
+"""
+Persistent probe cache for the Media Encoder.
+
+Stores ffprobe results in SQLite, keyed by (realpath, size, mtime_ns, ffprobe
+version), with a process-local LRU in front of it. Planners that probe the
+same files over and over (to pick profiles, check durations, verify outputs)
+then only spawn ffprobe for files that actually changed.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+from config import PROBE_CACHE_PATH, get_logger
+from sqlite_store import SQLiteStore
+
+class ProbeCache(SQLiteStore):
+    """
+    SQLite backed cache of probe results with an in-memory LRU.
+
+    Safe to share between threads, the LRU is guarded by a lock.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS probes (
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            tool TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (path, size, mtime_ns, tool)
+        )
+    """
+
+    def __init__(
+        self,
+        db_path: str = PROBE_CACHE_PATH,
+        lru_size: int = 4096,
+        logger: logger = None # type: ignore
+    ):
+        """
+        Initialize the cache, the database is created on first use.
+
+        Args:
+            db_path: Path of the SQLite database
+            lru_size: Number of probe results kept in memory
+            logger: Optional logger instance. If not provided, creates a new one.
+        """
+        self.db_path = db_path
+        self.lru_size = lru_size
+        self.logger = logger if logger is not None else get_logger(__name__)
+        self._init_local()
+
+    TRANSIENT = SQLiteStore.TRANSIENT + ('_lock', '_lru')
+
+    def _init_local(self) -> None:
+        super()._init_local()
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(file_path: str, tool_version: str) -> Tuple[str, int, int, str]:
+        """
+        Build the key of a file, it changes whenever the file is modified.
+
+        Raises:
+            OSError: If the file can't be accessed
+        """
+        stat = os.stat(file_path)
+        return (os.path.realpath(file_path), stat.st_size, stat.st_mtime_ns, tool_version)
+
+    def get(self, file_path: str, tool_version: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached probe result of a file, None on a miss.
+
+        Raises:
+            OSError: If the file can't be accessed
+        """
+        key = self.make_key(file_path, tool_version)
+        with self._lock:
+            data = self._lru.get(key)
+            if data is not None:
+                self._lru.move_to_end(key)
+                return copy.deepcopy(data)
+
+        try:
+            row = self._connection().execute(
+                "SELECT data FROM probes WHERE path=? AND size=? AND mtime_ns=? AND tool=?", key).fetchone()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Probe cache read failed for {file_path}: {str(e)}")
+            return None
+        if row is None:
+            return None
+
+        data = json.loads(row[0])
+        self._remember(key, data)
+        return copy.deepcopy(data)
+
+    def put(self, file_path: str, tool_version: str, data: Dict[str, Any]) -> None:
+        """
+        Store the probe result of a file, replacing results of older versions of it.
+
+        Raises:
+            OSError: If the file can't be accessed
+        """
+        key = self.make_key(file_path, tool_version)
+        self._remember(key, copy.deepcopy(data))
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute("DELETE FROM probes WHERE path=?", key[:1])
+                connection.execute("INSERT INTO probes VALUES (?, ?, ?, ?, ?)", key + (json.dumps(data),))
+        except sqlite3.Error as e:
+            # a failed store only costs a future probe
+            self.logger.warning(f"Probe cache write failed for {file_path}: {str(e)}")
+
+    def clear(self) -> None:
+        """Drop every cached probe result."""
+        with self._lock:
+            self._lru.clear()
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM probes")
+
+    def _remember(self, key: Tuple, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._lru[key] = data
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
@@ -0,0 +1,281 @@
+"""
+Admission control for batch encodes.
+
+``BatchEncoder`` accepts admission policies deciding, job by job, when a job
+may start. Policies see every job up front together with its probe result, so
+they can order the batch and budget resources the encodes will use.
+
+``CpuScheduler`` estimates the cost of each job as the source duration times
+the ``CpuFactor`` of its profiles and starts the most expensive jobs first.
+Jobs are admitted against a core budget instead of a fixed job count, every
+distinct encode of a job counting for the cores one ffmpeg encode keeps busy.
+
+``DiskSpaceGuard`` predicts the output size of each job from the source
+size and the ``SizeFactor`` of its profiles, and only starts a job when
+its reservation leaves the configured headroom free on the target filesystem.
+"""
+
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from data_manager import ProfileDataManager, Profile
+from config import DISK_HEADROOM_BYTES, get_logger
+
+# Bytes per second of CD quality PCM, used to estimate the duration of sources that can't be probed
+FALLBACK_BYTES_PER_SECOND = 44100 * 2 * 2
+
+@dataclass(frozen=True)
+class ScheduledJob:
+    """
+    A batch job as seen by the admission policies.
+
+    Attributes:
+        job (BatchJob): The job to run
+        profiles (List[Profile]): Profiles the job encodes with
+        metadata (dict): Probe result of the source, None if it could not be probed
+    """
+    job: Any
+    profiles: List[Profile]
+    metadata: Optional[Dict[str, Any]] = None
+
+    def duration(self) -> float:
+        """Source duration in seconds, estimated from the file size when the source couldn't be probed."""
+        try:
+            return float(self.metadata['format']['duration'])
+        except (KeyError, TypeError, ValueError):
+            pass
+        try:
+            return os.path.getsize(self.job.input_path) / FALLBACK_BYTES_PER_SECOND
+        except OSError:
+            return 0.0
+
+class AdmissionPolicy:
+    """
+    Base class of the BatchEncoder admission hooks, it admits everything.
+
+    BatchEncoder calls ``order`` once with every job of the batch, then, from
+    the dispatching thread, ``fits`` before starting a job, ``acquire`` when
+    it starts and ``release`` once it finished. A job only starts when every
+    policy admits it; a job that doesn't fit while nothing else runs fails
+    with the reasons given by the policies.
+    """
+
+    def order(self, jobs: List[ScheduledJob]) -> List[ScheduledJob]:
+        """Return the jobs in the order they should be started."""
+        return jobs
+
+    def fits(self, job: ScheduledJob) -> Optional[str]:
+        """Return None if the job may start now, otherwise the reason it has to wait."""
+        return None
+
+    def acquire(self, job: ScheduledJob) -> None:
+        """Account for a job that is starting."""
+
+    def release(self, job: ScheduledJob, result) -> None:
+        """Account for a finished job, result is its EncodeResult."""
+
+class CpuScheduler(AdmissionPolicy):
+    """
+    Order jobs by their CpuFactor cost and pack them against a core budget.
+
+    CpuFactor tells how much CPU time a profile needs per source second, not
+    how many cores its encode uses: an audio ffmpeg encode keeps about one
+    core busy whatever the profile. So the CpuFactor only orders the jobs,
+    longest first, and shorter ones fill the cores left over, so long Hi-Res
+    encodes no longer end up alone at the tail of a batch. For admission a
+    job occupies one core per distinct encode (equivalent profiles are encoded
+    once), or the measured cores of its profiles, capped at the whole budget
+    so that every job can eventually run.
+    """
+
+    def __init__(
+        self,
+        cores: Optional[float] = None,
+        profile_caps: Optional[Dict[str, int]] = None,
+        profile_cores: Optional[Dict[str, float]] = None,
+        logger: logger = None # type: ignore
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            cores: Core budget, defaults to the CPU count
+            profile_caps: Maximum number of concurrent jobs per profile name
+            profile_cores: Cores an encode of a profile keeps busy per profile name, e.g. the
+                cores measured by EncodeHistory.estimates, one core for the profiles left out
+            logger: Optional logger instance. If not provided, creates a new one.
+
+        Raises:
+            ValueError: If cores is not positive, a cap is lower than 1 or a profile's cores not positive
+        """
+        self.cores = float(cores if cores is not None else (os.cpu_count() or 1))
+        if self.cores <= 0:
+            raise ValueError("Core budget must be positive")
+        self.profile_caps = dict(profile_caps or {})
+        if any(cap < 1 for cap in self.profile_caps.values()):
+            raise ValueError("Profile caps must be positive integers")
+        self.profile_cores = dict(profile_cores or {})
+        if any(value <= 0 for value in self.profile_cores.values()):
+            raise ValueError("Profile cores must be positive")
+        self.logger = logger if logger is not None else get_logger(__name__)
+        self.cores_in_use = 0.0
+        self.running: Dict[str, int] = {}
+
+    def weight(self, job: ScheduledJob) -> float:
+        """Number of cores the job keeps busy."""
+        cores = {}
+        for profile in job.profiles:
+            cores[ProfileDataManager.get_equivalence_key(profile)] = self.profile_cores.get(profile.Name, 1.0)
+        return min(sum(cores.values()), self.cores)
+
+    def cost(self, job: ScheduledJob) -> float:
+        """Estimated CPU cost of the job, source seconds times the CpuFactor of its distinct encodes."""
+        factors = {}
+        for profile in job.profiles:
+            factors[ProfileDataManager.get_equivalence_key(profile)] = profile.CpuFactor
+        return job.duration() * sum(factors.values())
+
+    def order(self, jobs: List[ScheduledJob]) -> List[ScheduledJob]:
+        ordered = sorted(jobs, key=self.cost, reverse=True)
+        if ordered:
+            total = sum(self.cost(job) for job in ordered)
+            self.logger.debug(f"Scheduled {len(ordered)} jobs, {total:.0f} baseline CPU-seconds on {self.cores:g} cores")
+        return ordered
+
+    def fits(self, job: ScheduledJob) -> Optional[str]:
+        for profile in job.profiles:
+            cap = self.profile_caps.get(profile.Name)
+            if cap is not None and self.running.get(profile.Name, 0) >= cap:
+                return f"{cap} {profile.Name} jobs already running"
+        weight = self.weight(job)
+        # tolerate float rounding when measured cores add up to the budget exactly
+        if self.cores_in_use + weight > self.cores + 1e-9:
+            return f"needs {weight:g} cores, {self.cores - self.cores_in_use:g} free"
+        return None
+
+    def acquire(self, job: ScheduledJob) -> None:
+        self.cores_in_use += self.weight(job)
+        for profile in job.profiles:
+            self.running[profile.Name] = self.running.get(profile.Name, 0) + 1
+
+    def release(self, job: ScheduledJob, result) -> None:
+        self.cores_in_use = max(self.cores_in_use - self.weight(job), 0.0)
+        for profile in job.profiles:
+            self.running[profile.Name] -= 1
+
+class DiskSpaceGuard(AdmissionPolicy):
+    """
+    Reserve the predicted output size of every job on its target filesystem.
+
+    A job starts only if the free space, minus what running jobs still have to
+    write, minus its own prediction, stays above the headroom. Jobs that can't
+    fit even with nothing else running are never started, so a batch fails
+    those files instead of filling the volume and leaving truncated outputs.
+    Predictions are scaled up when finished jobs turn out larger than predicted.
+    """
+
+    def __init__(
+        self,
+        headroom_bytes: int = DISK_HEADROOM_BYTES,
+        logger: logger = None # type: ignore
+    ):
+        """
+        Initialize the guard.
+
+        Args:
+            headroom_bytes: Space to keep free on every target filesystem
+            logger: Optional logger instance. If not provided, creates a new one.
+
+        Raises:
+            ValueError: If headroom_bytes is negative
+        """
+        if headroom_bytes < 0:
+            raise ValueError("Headroom must not be negative")
+        self.headroom_bytes = headroom_bytes
+        self.logger = logger if logger is not None else get_logger(__name__)
+        self.predicted_bytes = 0
+        self.actual_bytes = 0
+        # reservations of the running jobs: (device, output path, reserved bytes, uncorrected prediction)
+        self._reservations: Dict[int, List[Tuple[int, str, int, int]]] = {}
+
+    @property
+    def correction(self) -> float:
+        """Factor applied to predictions, above 1.0 once outputs turned out larger than predicted."""
+        if not self.predicted_bytes:
+            return 1.0
+        return max(1.0, self.actual_bytes / self.predicted_bytes)
+
+    def predict(self, job: ScheduledJob) -> Dict[str, int]:
+        """Predicted size in bytes of every output of the job."""
+        return {output_path: int(size * self.correction) for output_path, size in self._predict_raw(job).items()}
+
+    def _predict_raw(self, job: ScheduledJob) -> Dict[str, int]:
+        outputs = job.job.output_paths or {job.profiles[0].Name: job.job.output_path}
+        # SizeFactor is relative to the source file
+        source_bytes = self._file_size(job.job.input_path)
+        factors = {profile.Name: profile.SizeFactor for profile in job.profiles}
+        return {
+            output_path: int(source_bytes * factors.get(name, 1.0))
+            for name, output_path in outputs.items() if output_path
+        }
+
+    def fits(self, job: ScheduledJob) -> Optional[str]:
+        needed: Dict[int, Tuple[str, int]] = {}
+        for output_path, size in self.predict(job).items():
+            directory = self._existing_dir(output_path)
+            device = os.stat(directory).st_dev
+            needed[device] = (directory, needed.get(device, (directory, 0))[1] + size)
+
+        for device, (directory, size) in needed.items():
+            available = self._free_bytes(directory) - self._outstanding(device) - self.headroom_bytes
+            if size > available:
+                return f"needs {size} bytes on {directory}, {max(available, 0)} available above the headroom"
+        return None
+
+    def acquire(self, job: ScheduledJob) -> None:
+        reservations = []
+        for output_path, raw_size in self._predict_raw(job).items():
+            device = os.stat(self._existing_dir(output_path)).st_dev
+            reservations.append((device, output_path, int(raw_size * self.correction), raw_size))
+        self._reservations[id(job)] = reservations
+
+    def release(self, job: ScheduledJob, result) -> None:
+        reservations = self._reservations.pop(id(job), [])
+        if result is None or not result.success:
+            return
+        reserved = sum(size for _, _, size, _ in reservations)
+        actual = sum(self._file_size(output_path) for output_path in result.outputs.values())
+        # compare against uncorrected predictions so the correction doesn't feed on itself
+        self.predicted_bytes += sum(raw_size for _, _, _, raw_size in reservations)
+        self.actual_bytes += actual
+        self.logger.debug(f"Disk reservation released for {result.input_path}: reserved {reserved} bytes, wrote {actual}")
+
+    def _outstanding(self, device: int) -> int:
+        """Bytes running jobs on a filesystem are still expected to write."""
+        outstanding = 0
+        for reservations in self._reservations.values():
+            for reserved_device, output_path, size, _ in reservations:
+                if reserved_device == device:
+                    outstanding += max(size - self._file_size(output_path), 0)
+        return outstanding
+
+    @staticmethod
+    def _free_bytes(directory: str) -> int:
+        return shutil.disk_usage(directory).free
+
+    @staticmethod
+    def _file_size(file_path: Optional[str]) -> int:
+        try:
+            return os.path.getsize(file_path) if file_path else 0
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _existing_dir(output_path: str) -> str:
+        """Closest existing directory of an output path, output dirs are only created when the job starts."""
+        directory = os.path.dirname(os.path.abspath(output_path))
+        while not os.path.isdir(directory) and os.path.dirname(directory) != directory:
+            directory = os.path.dirname(directory)
+        return directory
@@ -0,0 +1,51 @@
+"""
+SQLite storage shared by the Media Encoder's local databases.
+
+``SQLiteStore`` gives the probe cache and the encode history one thread-local
+connection handling: every thread opens its own connection on first use, the
+database runs in WAL mode so concurrent processes can read while another one
+writes, and instances can be pickled to process pools.
+"""
+
+import os
+import sqlite3
+import threading
+from config import get_logger
+
+class SQLiteStore:
+    """
+    Base class of the SQLite backed stores.
+
+    Subclasses set SCHEMA and db_path, and call _init_local from their
+    constructor. Safe to share between threads; each thread gets its own connection.
+    """
+
+    SCHEMA = ""
+
+    # attributes that can't cross process boundaries, rebuilt on unpickle by _init_local
+    TRANSIENT = ('_local', 'logger')
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self.TRANSIENT:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.logger = get_logger(type(self).__module__)
+        self._init_local()
+
+    def _init_local(self) -> None:
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(self.SCHEMA)
+            self._local.connection = connection
+        return connection
@@ -0,0 +1,128 @@
+"""
+Tag comparison for the Media Encoder.
+
+Tags of every format are normalized to ``{key: values}`` with the values a
+tuple of strings: ID3 frames by their text or URL, Vorbis comments as they
+are, MP4 atoms with their numbers, pairs and free form text converted to
+strings. Binary payloads (cover art, private and object frames) are compared
+as a whole and reported by their size and SHA-1, so a changed picture shows
+up as a single line. Keys and values are compared
+ignoring case and value order.
+"""
+
+import hashlib
+from typing import Any, Dict, List, Mapping, Tuple
+
+# MP4 free form atom data type of UTF-8 text
+MP4_UTF8 = 1
+
+# Normalized tags: folded key -> (key as written, values)
+NormalizedTags = Dict[str, Tuple[str, Tuple[Any, ...]]]
+
+def _binary(data: bytes) -> str:
+    return f"<{len(data)} bytes sha1:{hashlib.sha1(data).hexdigest()[:12]}>"
+
+def _text_or_bytes(data: bytes) -> Any:
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data
+    return text if text.isprintable() else data
+
+def _item_values(item: Any) -> List[Any]:
+    if hasattr(item, 'imageformat'):
+        # MP4Cover
+        return [bytes(item)]
+    if hasattr(item, 'dataformat'):
+        # MP4FreeForm, text unless flagged otherwise
+        if item.dataformat == MP4_UTF8:
+            return [bytes(item).decode('utf-8', errors='replace')]
+        return [bytes(item)]
+    if isinstance(item, (bytes, bytearray)):
+        # free form values set on an open file are plain bytes until it's reloaded
+        return [_text_or_bytes(bytes(item))]
+    if isinstance(item, tuple):
+        # MP4 track/disc number pairs
+        return ['/'.join(str(part) for part in item)]
+    if hasattr(item, 'FrameID'):
+        # ID3 frame
+        if hasattr(item, 'data') and isinstance(item.data, bytes):
+            return [item.data]
+        if hasattr(item, 'text'):
+            text = item.text
+            return [str(part) for part in text] if isinstance(text, list) else [str(text)]
+        if hasattr(item, 'url'):
+            return [item.url]
+    if hasattr(item, 'data') and isinstance(item.data, bytes):
+        # FLAC Picture
+        return [item.data]
+    return [str(item)]
+
+def normalize_value(value: Any) -> Tuple[Any, ...]:
+    """
+    Normalize a tag value of any format to a tuple of strings, bytes for binary payloads.
+    """
+    items = value if isinstance(value, list) else [value]
+    return tuple(part for item in items for part in _item_values(item))
+
+def normalize_tags(tags: Mapping[str, Any]) -> NormalizedTags:
+    """
+    Normalize tags as returned by AudioMetaUpdater.get_current_tags.
+
+    Returns:
+        Dict of the case folded key to the key as written and its normalized values
+    """
+    return {str(key).casefold(): (str(key), normalize_value(value)) for key, value in tags.items()}
+
+def _comparable(values: Tuple[Any, ...]) -> List[Any]:
+    folded = [value.casefold() if isinstance(value, str) else value for value in values]
+    # bytes sort after text, never compared to it
+    return sorted(folded, key=lambda value: (isinstance(value, bytes), value))
+
+def _values_equal(original: Tuple[Any, ...], updated: Tuple[Any, ...]) -> bool:
+    return original == updated or (len(original) == len(updated) and _comparable(original) == _comparable(updated))
+
+def tags_equal(original_tags: Mapping[str, Any], updated_tags: Mapping[str, Any]) -> bool:
+    """
+    Check whether two sets of tags hold the same values, ignoring case and value order.
+
+    Stops at the first difference, binary payloads are compared without hashing.
+    """
+    if len(original_tags) != len(updated_tags):
+        return False
+    updated = {str(key).casefold(): value for key, value in updated_tags.items()}
+    for key, value in original_tags.items():
+        folded = str(key).casefold()
+        if folded not in updated:
+            return False
+        if not _values_equal(normalize_value(value), normalize_value(updated[folded])):
+            return False
+    return True
+
+def _format(values: Tuple[Any, ...]) -> str:
+    shown = [_binary(value) if isinstance(value, bytes) else value for value in values]
+    return shown[0] if len(shown) == 1 else str(shown)
+
+def diff_tags(original_tags: Mapping[str, Any], updated_tags: Mapping[str, Any]) -> List[str]:
+    """
+    Describe the differences between two sets of tags, one line per changed key.
+
+    Lines follow the updated tags order: added and changed keys, then the removed ones.
+
+    Returns:
+        List of report lines, empty if the tags are equal
+    """
+    original = normalize_tags(original_tags)
+    updated = normalize_tags(updated_tags)
+    lines = []
+    for folded, (key, values) in updated.items():
+        if folded not in original:
+            lines.append(f"Item root['{key}'] ({_format(values)}) added to dictionary.")
+            continue
+        old_values = original[folded][1]
+        if not _values_equal(old_values, values):
+            lines.append(f'Value of root[\'{key}\'] changed from "{_format(old_values)}" to "{_format(values)}".')
+    for folded, (key, values) in original.items():
+        if folded not in updated:
+            lines.append(f"Item root['{key}'] ({_format(values)}) removed from dictionary.")
+    return lines
@@ -1,7 +1,36 @@
+import importlib
 import json
+import os
+import shutil
+import subprocess
+from functools import lru_cache
+from types import ModuleType
+from typing import Any, Dict, List, Tuple, Union
 from config import get_logger, logger
 from models import Profile
-from tabulate import tabulate
+
+# Tags of a file: (key, value) pairs, a {key: value} dict or update_metadata_from_json
+# style [{"tag_key": key, "value": value}] items
+Tags = Union[List[Tuple[str, Any]], Dict[str, Any], List[Dict[str, Any]]]
+
+class LazyModule(ModuleType):
+    """
+    Stand-in for a module that is only imported on first attribute access.
+
+    Heavy third party modules are bound at module level through this proxy,
+    so the name stays patchable while invocations that never use the module
+    don't pay for importing it.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attribute: str):
+        module = self.__dict__['_module']
+        if module is None:
+            module = self.__dict__['_module'] = importlib.import_module(self.__name__)
+        return getattr(module, attribute)
 
 class JsonLoader:
 
@@ -36,7 +65,83 @@ class JsonLoader:
         except Exception as e:
             logger.error(f"An error occurred: {e}")        
 
+# ioctl request to clone a file's extents on Linux (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+def _reflink(source_path: str, target_path: str) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(source_path, 'rb') as source, open(target_path, 'wb') as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        return True
+    except OSError:
+        if os.path.exists(target_path):
+            os.remove(target_path)
+        return False
+
+def materialize_file(source_path: str, target_path: str, allow_hardlink: bool = True) -> str:
+    """
+    Create target_path with the content of source_path as cheaply as possible.
+
+    Tries a reflink (copy-on-write clone), then a hardlink, then a plain copy.
+    Hardlinks share the inode, so they must be disabled when the target will
+    be modified afterwards (e.g. retagged).
+
+    Returns:
+        The method used: 'reflink', 'hardlink' or 'copy'
+    """
+    if _reflink(source_path, target_path):
+        return 'reflink'
+    if allow_hardlink:
+        try:
+            os.link(source_path, target_path)
+            return 'hardlink'
+        except OSError:
+            pass
+    shutil.copyfile(source_path, target_path)
+    return 'copy'
+
+@lru_cache(maxsize=None)
+def get_tool_version(tool_path: str) -> str:
+    """
+    Return the first line of `<tool> -version`, e.g. the ffmpeg build banner.
+
+    The result is cached per path for the life of the process.
+
+    Raises:
+        OSError: If the tool can't be executed
+    """
+    result = subprocess.run([tool_path, '-version'], capture_output=True, text=True, check=True)
+    return result.stdout.splitlines()[0].strip() if result.stdout else ''
+
+def as_tag_list(tags: Tags) -> List[Tuple[str, Any]]:
+    """
+    Normalize the accepted tag formats to a list of (key, value) pairs.
+
+    Raises:
+        ValueError: If the tags are in none of the accepted formats
+    """
+    if isinstance(tags, dict):
+        return list(tags.items())
+    if not isinstance(tags, (list, tuple)):
+        raise ValueError("Tags must be a list of (key, value) pairs, a dict or a list of tag_key/value items")
+    tag_list = []
+    for item in tags:
+        if isinstance(item, dict):
+            if 'tag_key' not in item or 'value' not in item:
+                raise ValueError("Each metadata item must have 'tag_key' and 'value' fields")
+            tag_list.append((item['tag_key'], item['value']))
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            tag_list.append((item[0], item[1]))
+        else:
+            raise ValueError(f"Invalid tag item: {item}")
+    return tag_list
+
 def create_audio_profiles_table(profiles:list[Profile]) -> str:
+    from tabulate import tabulate
     headers = ["Profile", "Codec", "Extension", "FFmpeg Setup", "Size Factor", "CPU Factor", "Description"]
     rows = []
     for profile in profiles:
@@ -49,4 +154,30 @@ def create_audio_profiles_table(profiles:list[Profile]) -> str:
             profile.CpuFactor,
             profile.Description
         ])
+    return tabulate(rows, headers, tablefmt="github")
+
+def create_measured_profiles_table(profiles: list[Profile], estimates: dict) -> str:
+    """Table of the static profile factors next to the ones measured from the encode history."""
+    from tabulate import tabulate
+
+    def figure(value, digits=2):
+        return round(value, digits) if value is not None else "-"
+
+    headers = ["Profile", "Source", "Samples", "Size Factor", "Measured", "CPU Factor", "Measured", "Cores", "Realtime x", "Peak RSS (MiB)"]
+    static = {profile.Name: profile for profile in profiles}
+    rows = []
+    for (name, source_format), estimate in sorted(estimates.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+        profile = static.get(name)
+        rows.append([
+            name,
+            source_format or "all",
+            estimate.samples,
+            profile.SizeFactor if profile else "-",
+            figure(estimate.size_factor),
+            profile.CpuFactor if profile else "-",
+            figure(estimate.cpu_factor),
+            figure(estimate.cores),
+            figure(estimate.realtime_factor, 1),
+            figure(estimate.maxrss_kib / 1024 if estimate.maxrss_kib is not None else None, 1)
+        ])
     return tabulate(rows, headers, tablefmt="github")            
\ No newline at end of file
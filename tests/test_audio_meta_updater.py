@@ -92,6 +92,61 @@ class TestAudioMetaUpdaterRegression(unittest.TestCase):
         with open(os.path.join(self.output_dir, self.test_files['m4a'])+".json", "w") as json_file:
             json_file.write(diff)
 
+    def test_update_m4a_number_atoms(self):
+        """Track, disc and tempo tags are converted to the values of their MP4 atoms."""
+        file_path = os.path.join(self.output_dir, self.test_files['m4a_notags'])
+        AudioMetaUpdater(file_path, self.tags_path).update_metadata_list(
+            [('title', 'Atoms'), ('tracknumber', '4/12'), ('discnumber', '2/3'), ('bpm', '120')])
+
+        tags = AudioMetaUpdater(file_path, self.tags_path).get_current_tags()
+        self.assertEqual(tags['\xa9nam'], ['Atoms'])
+        self.assertEqual(tags['trkn'], [(4, 12)])
+        self.assertEqual(tags['disk'], [(2, 3)])
+        self.assertEqual(tags['tmpo'], [120])
+
+    def test_update_mp3_id3_frame_keys(self):
+        """Comments and lyrics keep the unlabelled frames players show, custom tags are labelled by their key."""
+        file_path = os.path.join(self.output_dir, self.test_files['mp3_notags'])
+        AudioMetaUpdater(file_path, self.tags_path).update_metadata_list(
+            [('comment', 'A comment'), ('lyrics', 'La la'), ('custom_tag', 'Custom')], lang='spa')
+
+        tags = AudioMetaUpdater(file_path, self.tags_path).get_current_tags()
+        self.assertEqual(tags['COMM::XXX'].text, ['A comment'])
+        self.assertEqual(tags['USLT::spa'].text, 'La la')
+        self.assertEqual(tags['USLT:custom_tag:spa'].text, 'Custom')
+
+    def test_file_opened_on_first_access(self):
+        """The audio file is loaded lazily and dropped when the context manager exits."""
+        file_path = os.path.join(self.output_dir, self.test_files['flac'])
+        with AudioMetaUpdater(file_path, self.tags_path) as updater:
+            self.assertFalse(updater.loaded)
+            self.assertIn('title', updater.get_current_tags())
+            self.assertTrue(updater.loaded)
+        self.assertFalse(updater.loaded)
+
+    def test_header_only_skips_payloads(self):
+        """Header-only updaters read text tags without picture and lyrics payloads and refuse writes."""
+        for name in ('flac', 'mp3', 'm4a'):
+            with self.subTest(format=name):
+                file_path = os.path.join(self.output_dir, self.test_files[name])
+                AudioMetaUpdater(file_path, self.tags_path).update_metadata_list(
+                    [('title', 'Header'), ('lyrics', 'Long lyrics'), ('cover_art', self.cover_path)])
+
+                with AudioMetaUpdater(file_path, self.tags_path, header_only=True) as updater:
+                    tags = updater.get_current_tags()
+                    self.assertNotIn('covr', tags)
+                    self.assertFalse([key for key in tags if key.startswith(('APIC', 'USLT'))])
+                    self.assertNotIn('lyrics', tags)
+                    self.assertNotIn('\xa9lyr', tags)
+                    if name == 'flac':
+                        self.assertEqual(tags['title'], ['Header'])
+                        picture = updater.audio.pictures[-1]
+                        self.assertEqual((picture.mime, picture.data), ('image/jpeg', b''))
+                        self.assertEqual(picture.size, os.path.getsize(self.cover_path))
+                    with self.assertRaises(MetadataError) as context:
+                        updater.update_or_add_metadata('title', 'Never Written')
+                    self.assertIn("header-only", str(context.exception))
+
     def test_invalid_encoding_value(self):
         """Test validation of encoding parameter."""
         updater = AudioMetaUpdater(os.path.join(self.output_dir, self.test_files['flac']), self.tags_path)
@@ -284,4 +339,68 @@ class TestAudioMetaUpdaterRegression(unittest.TestCase):
         diff = updater.get_metadata_diff(original_tags, updated_tags)
         self.assertNotEqual(diff, {})
         with open(os.path.join(self.output_dir, self.test_files['wav_notags'])+".json", "w") as json_file:
-            json_file.write(diff)
\ No newline at end of file
+            json_file.write(diff)
+
+    def test_update_metadata_list_saves_once(self):
+        """All tags of a list are written with a single save."""
+        from unittest.mock import patch
+        from mutagen.flac import FLAC
+        file_path = os.path.join(self.output_dir, self.test_files['flac'])
+        updater = AudioMetaUpdater(file_path, self.tags_path)
+
+        with patch.object(FLAC, 'save', autospec=True, side_effect=FLAC.save) as mock_save:
+            updater.update_metadata_list([('title', 'Batched'), ('album', 'Batched Album'), ('artist', 'Batched Artist')])
+
+        self.assertEqual(mock_save.call_count, 1)
+        tags = AudioMetaUpdater(file_path, self.tags_path).get_current_tags()
+        self.assertEqual(tags['title'], ['Batched'])
+        self.assertEqual(tags['artist'], ['Batched Artist'])
+
+    def test_padding_keeps_later_saves_in_place(self):
+        """Saves within the padding are in place, exhausted padding grows with the tags."""
+        from meta_updater import TagPadding
+        padding = TagPadding(reserve=4096, growth=2.0)
+        for name in ('flac', 'mp3', 'wav'):
+            file_path = os.path.join(self.output_dir, self.test_files[name])
+            updater = AudioMetaUpdater(file_path, self.tags_path, padding=padding)
+            updater.reserve_padding()
+            self.assertGreaterEqual(updater.last_save.padding, 4096, name)
+
+            updater = AudioMetaUpdater(file_path, self.tags_path, padding=padding)
+            updater.update_metadata_list([('lyrics', 'x' * 1000)])
+            self.assertTrue(updater.last_save.in_place, name)
+            size = os.path.getsize(file_path)
+
+            updater = AudioMetaUpdater(file_path, self.tags_path, padding=padding)
+            updater.update_metadata_list([('lyrics', 'x' * 20000)])
+            self.assertFalse(updater.last_save.in_place, name)
+            # room for the tags to double
+            self.assertGreater(updater.last_save.padding, 20000, name)
+            self.assertGreater(os.path.getsize(file_path), size + 20000, name)
+
+    def test_default_padding_is_mutagens(self):
+        """Without a padding policy grown tags get mutagen's default padding, not room to double."""
+        for name in ('flac', 'mp3', 'wav'):
+            file_path = os.path.join(self.output_dir, self.test_files[name])
+            updater = AudioMetaUpdater(file_path, self.tags_path)
+            self.assertIsNone(updater.padding)
+            updater.update_metadata_list([('lyrics', 'x' * 20000)])
+            self.assertFalse(updater.last_save.in_place, name)
+            self.assertLess(updater.last_save.padding, 20000, name)
+
+    def test_batch_rolls_back_on_error(self):
+        """A failing batch leaves the file and the in-memory tags unchanged."""
+        file_path = os.path.join(self.output_dir, self.test_files['mp3'])
+        updater = AudioMetaUpdater(file_path, self.tags_path)
+        original_tags = {key: str(value) for key, value in updater.get_current_tags().items()}
+        with open(file_path, 'rb') as f:
+            original_bytes = f.read()
+
+        with self.assertRaises(FileNotFoundError):
+            with updater.batch():
+                updater.update_or_add_metadata('title', 'Never Saved')
+                updater.update_or_add_metadata('cover_art', 'nonexistent.jpg')
+
+        with open(file_path, 'rb') as f:
+            self.assertEqual(f.read(), original_bytes)
+        self.assertEqual({key: str(value) for key, value in updater.get_current_tags().items()}, original_tags)
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+from models import Profile
+from batch_encoder import BatchEncoder, BatchJob, EncodeResult
+
+@pytest.fixture
+def profile():
+    return Profile(
+        Name="Test Profile",
+        Codec="MP3",
+        Extension=".mp3",
+        FFmpegSetup="acodec=libmp3lame, b:a=320k",
+        SizeFactor=1.0,
+        CpuFactor=1.0,
+        Description="Test profile description"
+    )
+
+@pytest.fixture
+def source_tree(tmp_path):
+    (tmp_path / "album").mkdir()
+    for name in ["a.flac", "b.wav", "album/c.mp3", "notes.txt"]:
+        (tmp_path / name).write_bytes(b"data")
+    return tmp_path
+
+def test_collect_jobs_filters_and_mirrors_tree(source_tree, tmp_path):
+    output_dir = os.path.join(str(tmp_path), "out")
+    jobs = list(BatchEncoder.collect_jobs(str(source_tree), output_dir, metadata_tags={"album": "A"}))
+
+    inputs = [os.path.relpath(job.input_path, str(source_tree)) for job in jobs]
+    assert inputs == ["a.flac", "b.wav", os.path.join("album", "c.mp3")]
+    assert jobs[2].output_path == os.path.join(output_dir, "album", "c.mp3")
+    assert all(job.metadata_tags == {"album": "A"} for job in jobs)
+
+def test_collect_jobs_invalid_directory():
+    with pytest.raises(ValueError):
+        list(BatchEncoder.collect_jobs("does/not/exist"))
+
+def test_invalid_jobs(profile):
+    with pytest.raises(ValueError):
+        BatchEncoder(profile, jobs=0)
+
+@patch("batch_encoder.Encoder.encode")
+def test_encode_yields_a_result_per_input(mock_encode, profile):
+    mock_encode.side_effect = lambda path, *args, **kwargs: path + ".mp3"
+    inputs = [f"track{i}.wav" for i in range(10)]
+
+    results = BatchEncoder(profile, jobs=3).encode_all(inputs, metadata_tags={"artist": "X"})
+
+    assert sorted(result.input_path for result in results) == sorted(inputs)
+    assert all(result.success and result.output_path == result.input_path + ".mp3" for result in results)
+    assert mock_encode.call_count == 10
+    _, kwargs = mock_encode.call_args
+    assert kwargs["metadata_tags"] == {"artist": "X"}
+
+@patch("batch_encoder.Encoder.encode")
+def test_encode_reports_failures(mock_encode, profile):
+    def fake_encode(path, *args, **kwargs):
+        if path == "bad.wav":
+            raise ValueError("broken input")
+        return "ok.mp3"
+    mock_encode.side_effect = fake_encode
+
+    results = {result.input_path: result for result in BatchEncoder(profile, jobs=2).encode(["good.wav", "bad.wav"])}
+
+    assert results["good.wav"].success
+    assert not results["bad.wav"].success
+    assert results["bad.wav"].output_path is None
+    assert "broken input" in results["bad.wav"].error
+
+@patch("batch_encoder.Encoder.encode")
+def test_encode_accepts_jobs(mock_encode, profile, tmp_path):
+    output_path = os.path.join(str(tmp_path), "nested", "out.mp3")
+    mock_encode.return_value = output_path
+
+    results = list(BatchEncoder(profile, jobs=1).encode([BatchJob("in.wav", output_path, {"title": "T"})]))
+
+    assert results == [EncodeResult("in.wav", output_path, True, elapsed=results[0].elapsed, outputs={"Test Profile": output_path})]
+    assert os.path.isdir(os.path.dirname(output_path))
+    args, kwargs = mock_encode.call_args
+    assert args == ("in.wav", output_path)
+    assert kwargs["metadata_tags"] == {"title": "T"}
+
+@patch("batch_encoder.Encoder.encode")
+def test_encode_reserves_distinct_outputs(mock_encode, profile, tmp_path):
+    mock_encode.side_effect = lambda path, output_path, **kwargs: output_path
+    inputs = [os.path.join(str(tmp_path), name) for name in ["song.flac", "song.wav", "song.m4a"]]
+
+    outputs = sorted(result.output_path for result in BatchEncoder(profile, jobs=3).encode(inputs))
+
+    assert outputs == sorted(os.path.join(str(tmp_path), name) for name in ["song.mp3", "song_Encoded.mp3", "song_Encoded-1.mp3"])
+
+def test_encode_async_respects_concurrency_limit(profile):
+    running = 0
+    peak = 0
+
+    async def fake_encode_async(path, output_path, **kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if path == "bad.wav":
+            raise ValueError("broken input")
+        return output_path
+
+    async def collect():
+        return [result async for result in BatchEncoder(profile, jobs=3).encode_async(inputs)]
+
+    inputs = [f"track{i}.wav" for i in range(9)] + ["bad.wav"]
+    with patch("batch_encoder.Encoder.encode_async", side_effect=fake_encode_async):
+        results = asyncio.run(collect())
+
+    assert peak == 3
+    assert len(results) == 10
+    assert [result.input_path for result in results if not result.success] == ["bad.wav"]
+
+def test_progress_with_process_pool(profile):
+    events = []
+
+    async def fake_encode_async(path, output_path, progress=None, **kwargs):
+        progress(path)
+        return output_path
+
+    async def collect():
+        return [result async for result in encoder.encode_async(["a.wav"], progress=events.append)]
+
+    encoder = BatchEncoder(profile, use_processes=True)
+    # the async jobs run on the event loop, the pool isn't involved
+    with patch("batch_encoder.Encoder.encode_async", side_effect=fake_encode_async):
+        assert asyncio.run(collect())[0].success
+    assert events == ["a.wav"]
+    with pytest.raises(ValueError):
+        list(encoder.encode(["a.wav"], progress=events.append))
+
+def test_encode_async_close_cancels_pending(profile):
+    cancelled = []
+
+    async def slow_encode_async(path, output_path, **kwargs):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.append(path)
+            raise
+
+    async def first_result_only():
+        iterator = BatchEncoder(profile, jobs=2).encode_async(["a.wav", "b.wav"])
+        await asyncio.wait_for(iterator.__anext__(), timeout=0.1)
+
+    with patch("batch_encoder.Encoder.encode_async", side_effect=slow_encode_async):
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(first_result_only())
+
+    assert sorted(cancelled) == ["a.wav", "b.wav"]
+
+@patch("batch_encoder.Encoder.encode_many")
+def test_encode_multiple_profiles(mock_encode_many, profile, tmp_path):
+    other = Profile(Name="Other", Codec="FLAC", Extension=".flac", FFmpegSetup="acodec=flac",
+                    SizeFactor=1.0, CpuFactor=1.0, Description="")
+    mock_encode_many.side_effect = lambda path, profiles, **kwargs: kwargs["output_paths"]
+    inputs = [os.path.join(str(tmp_path), name) for name in ["song.flac", "song.wav"]]
+
+    results = BatchEncoder([profile, other, profile], jobs=2).encode_all(inputs, profile_metadata={"Other": {"a": "b"}})
+
+    planned = [path for result in results for path in result.outputs.values()]
+    assert len(planned) == 4 and len(set(planned)) == 4
+    assert all(result.success and result.output_path is None for result in results)
+    _, kwargs = mock_encode_many.call_args
+    assert kwargs["profile_metadata"] == {"Other": {"a": "b"}}
+
+def test_output_args_require_single_profile(profile):
+    other = Profile(Name="Other", Codec="FLAC", Extension=".flac", FFmpegSetup="acodec=flac",
+                    SizeFactor=1.0, CpuFactor=1.0, Description="")
+    with pytest.raises(ValueError):
+        BatchEncoder([profile, other]).encode_all(["a.wav"], ffmpeg_output_args={"b:a": "128k"})
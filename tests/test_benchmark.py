@@ -0,0 +1,121 @@
+import json
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from models import Profile
+from encoder import Encoder, FFmpegCommand
+from encoder_cli import main
+from benchmark import Benchmark, CorpusSpec, compare_reports, generate_corpus, load_report, save_report
+
+BENCH_STDERR = "bench: utime=0.300s stime=0.100s rtime=0.500s\nbench: maxrss=2048KiB\n"
+
+@pytest.fixture
+def profile():
+    return Profile(Name="MP3", Codec="MP3", Extension=".mp3", FFmpegSetup="acodec=libmp3lame, b:a=320k",
+                   SizeFactor=1.0, CpuFactor=1.0, Description="")
+
+def fake_generate(command, **kwargs):
+    # subprocess.run is patched globally, leave other commands (e.g. ffmpeg -version) alone
+    if command[-1].startswith("-"):
+        return MagicMock(stdout="")
+    with open(command[-1], "wb") as f:
+        f.write(b"\0" * 1000)
+
+def fake_corpus(spec, directory, ffmpeg_path=None):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"corpus_{spec.name}.wav")
+    fake_generate([path])
+    return path
+
+def test_generate_corpus(tmp_path):
+    spec = CorpusSpec(duration=5, sample_rate=96000, bit_depth=24)
+    with patch("benchmark.subprocess.run", side_effect=fake_generate) as mock_run:
+        path = generate_corpus(spec, str(tmp_path), ffmpeg_path="ffmpeg")
+        assert generate_corpus(spec, str(tmp_path), ffmpeg_path="ffmpeg") == path
+
+    assert mock_run.call_count == 1
+    command = mock_run.call_args.args[0]
+    assert "pcm_s24le" in command and "sample_rate=96000" in command[command.index("-filter_complex") + 1]
+    assert os.path.basename(path) == "corpus_96000Hz_24bit_2ch_5s.wav"
+
+def test_generate_corpus_rejects_bit_depth(tmp_path):
+    with pytest.raises(ValueError):
+        generate_corpus(CorpusSpec(bit_depth=12), str(tmp_path))
+
+def test_benchmark_measures_both_modes(profile, tmp_path):
+    commands = []
+
+    def fake_run(command, **kwargs):
+        commands.append(command.compile())
+        if command.output_file != "-":
+            with open(command.output_file, "wb") as f:
+                f.write(b"\0" * 250)
+        command.stderr = BENCH_STDERR
+
+    with patch("benchmark.generate_corpus", side_effect=fake_corpus), \
+         patch("benchmark.Benchmark._ffmpeg_version", return_value=None), \
+         patch("benchmark.probe_file", return_value={'format': {'duration': "2.0"}}), \
+         patch("encoder.Stats"), \
+         patch.object(FFmpegCommand, "run", autospec=True, side_effect=fake_run):
+        report = Benchmark([profile], [CorpusSpec(duration=2)], repeat=2, work_dir=str(tmp_path), logger=MagicMock()).run()
+
+    encode, null = report['results']
+    assert (encode['mode'], null['mode']) == ("encode", "null")
+    assert encode['cpu_seconds'] == pytest.approx(0.4) and encode['maxrss_kib'] == 2048
+    assert encode['size_ratio'] == 0.25 and null['size_ratio'] is None
+    assert encode['realtime_factor'] > 0
+    assert commands[-1][-3:] == ["-f", "null", "-"]
+    assert all("-timelimit" not in command for command in commands)
+    assert len(commands) == 4
+    # the corpora are kept in the work dir, the outputs are not
+    assert os.listdir(str(tmp_path)) == ["corpora"]
+
+def test_benchmark_records_failures(profile, tmp_path):
+    with patch("benchmark.generate_corpus", side_effect=fake_corpus), \
+         patch("benchmark.Benchmark._ffmpeg_version", return_value=None), \
+         patch.object(Encoder, "encode", side_effect=ValueError("boom")):
+        report = Benchmark([profile], [CorpusSpec(duration=1)], modes=["encode"], work_dir=str(tmp_path), logger=MagicMock()).run()
+
+    assert report['results'][0]['error'] == "boom"
+
+def test_benchmark_invalid_settings(profile):
+    with pytest.raises(ValueError):
+        Benchmark([profile], [CorpusSpec()], modes=["decode"])
+    with pytest.raises(ValueError):
+        Benchmark([profile], [CorpusSpec()], repeat=0)
+
+def _report(realtime, cpu=1.0):
+    return {'version': 1, 'results': [
+        {'profile': "MP3", 'corpus': "c", 'mode': "encode", 'realtime_factor': realtime, 'cpu_seconds': cpu},
+        {'profile': "FLAC", 'corpus': "c", 'mode': "encode", 'realtime_factor': None, 'cpu_seconds': None, 'error': "boom"},
+    ]}
+
+def test_compare_reports():
+    [row] = compare_reports(_report(40.0), _report(30.0, cpu=1.5), tolerance=0.1)
+
+    assert row['realtime_change'] == pytest.approx(-0.25)
+    assert row['cpu_change'] == pytest.approx(0.5)
+    assert row['regression']
+    assert not compare_reports(_report(40.0), _report(39.0), tolerance=0.1)[0]['regression']
+
+def test_report_roundtrip(tmp_path):
+    path = str(tmp_path / "reports" / "r.json")
+    save_report(_report(40.0), path)
+    assert load_report(path) == _report(40.0)
+
+    with open(path, "w") as f:
+        json.dump({'version': 99}, f)
+    with pytest.raises(ValueError):
+        load_report(path)
+
+def test_main_bench_compare(tmp_path, capsys):
+    baseline, current = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+    save_report(_report(40.0), baseline)
+    save_report(_report(20.0), current)
+
+    with patch('sys.argv', ['program.py', 'bench', '--compare', baseline, '--against', current]):
+        with pytest.raises(SystemExit) as pytest_wrapped_e:
+            main()
+
+    assert pytest_wrapped_e.value.code == 1
+    assert "REGRESSION" in capsys.readouterr().out
@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+import pytest
+from bulk_tagger import BulkTagger, TagJob
+from meta_updater import AudioMetaUpdater
+
+RESOURCES = os.path.join(os.path.dirname(__file__), "resources", "audio")
+
+@pytest.fixture
+def library(tmp_path):
+    (tmp_path / "disc1").mkdir()
+    shutil.copyfile(os.path.join(RESOURCES, "test.flac"), str(tmp_path / "disc1" / "a.flac"))
+    shutil.copyfile(os.path.join(RESOURCES, "test.mp3"), str(tmp_path / "b.mp3"))
+    (tmp_path / "notes.txt").write_text("not audio")
+    return tmp_path
+
+def test_tag_mapping_of_files(library):
+    flac, mp3 = str(library / "disc1" / "a.flac"), str(library / "b.mp3")
+
+    results = BulkTagger(jobs=2, use_processes=False).tag_all({flac: {"title": "Bulk", "album": "Batch"}, mp3: [("title", "Bulk")]})
+
+    assert sorted((result.file_path, result.success, result.tags) for result in results) == [(mp3, True, 1), (flac, True, 2)]
+    assert AudioMetaUpdater(flac).get_current_tags()["title"] == ["Bulk"]
+
+def test_padding_is_reserved_when_asked(library):
+    from mutagen.flac import FLAC, Padding
+    from meta_updater import TagPadding
+    flac = str(library / "disc1" / "a.flac")
+
+    # outgrows the padding of the file, rewritten with room for the tags to double
+    results = BulkTagger(jobs=2, padding=TagPadding(growth=2.0)).tag_all({flac: {"lyrics": "x" * 20000}})
+
+    assert results[0].success
+    assert sum(block.length for block in FLAC(flac).metadata_blocks if isinstance(block, Padding)) > 20000
+
+def test_failures_are_reported_per_file(library):
+    flac, mp3, missing = str(library / "disc1" / "a.flac"), str(library / "b.mp3"), str(library / "missing.flac")
+
+    results = {result.file_path: result for result in BulkTagger(jobs=2, use_processes=False).tag(
+        [TagJob(flac, {"title": "Ok"}), TagJob(missing, {"title": "X"}), TagJob(mp3, "bad")])}
+
+    assert results[flac].success
+    assert not results[missing].success and "not found" in results[missing].error
+    assert not results[mp3].success and "Tags must be" in results[mp3].error
+
+def test_collect_jobs_from_sidecars(library):
+    (library / "disc1" / "a.flac.json").write_text(json.dumps([{"tag_key": "title", "value": "Side"}]))
+
+    jobs = list(BulkTagger.collect_jobs(str(library), tags={"album": "All"}))
+
+    assert [(os.path.relpath(job.file_path, str(library)), job.tags) for job in jobs] == [
+        ("b.mp3", [("album", "All")]),
+        (os.path.join("disc1", "a.flac"), [("album", "All"), ("title", "Side")]),
+    ]
+
+def test_bad_sidecar_fails_only_its_file(library):
+    # b.mp3 is collected first, the files after it are still tagged
+    (library / "b.mp3.json").write_text("{not json")
+    (library / "disc1" / "a.flac.json").write_text(json.dumps({"title": "Good"}))
+
+    results = {result.file_path: result for result in BulkTagger(jobs=2, use_processes=False).tag(
+        BulkTagger.collect_jobs(str(library)))}
+
+    flac, mp3 = str(library / "disc1" / "a.flac"), str(library / "b.mp3")
+    assert not results[mp3].success and "Invalid tags" in results[mp3].error
+    assert results[flac].success
+    assert AudioMetaUpdater(flac).get_current_tags()["title"] == ["Good"]
+
+def test_collect_jobs_from_manifest_in_process_pool(library, tmp_path):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps({"disc1/a.flac": {"title": "Manifest"}}))
+
+    jobs = list(BulkTagger.collect_jobs(str(library), str(manifest)))
+    results = BulkTagger(jobs=2).tag_all(jobs)
+
+    assert [(result.file_path, result.success) for result in results] == [(str(library / "disc1" / "a.flac"), True)]
+    assert AudioMetaUpdater(str(library / "disc1" / "a.flac")).get_current_tags()["title"] == ["Manifest"]
@@ -0,0 +1,86 @@
+import os
+import shutil
+import struct
+import zlib
+import pytest
+from cover_art import CoverArtCache, CoverArtError, probe_image
+from meta_updater import AudioMetaUpdater
+
+RESOURCES = os.path.join(os.path.dirname(__file__), "resources", "audio")
+COVER = os.path.join(RESOURCES, "cover.jpg")
+
+def png_bytes(width, height):
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    chunk = struct.pack('>I', len(ihdr)) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr))
+    return b'\x89PNG\r\n\x1a\n' + chunk
+
+def test_probe_image_reads_headers():
+    mime, width, height, depth = probe_image(open(COVER, 'rb').read())
+    assert mime == 'image/jpeg'
+    assert width > 0 and height > 0 and depth == 24
+    assert probe_image(png_bytes(640, 480)) == ('image/png', 640, 480, 32)
+    assert probe_image(b'BM\x00\x00') is None
+
+def test_mime_comes_from_content_not_extension(tmp_path):
+    misnamed = tmp_path / "cover.jpg"
+    misnamed.write_bytes(png_bytes(10, 20))
+    image = CoverArtCache().load(str(misnamed))
+    assert image.mime == 'image/png'
+    assert image.mp4_cover().imageformat == image.mp4_cover().FORMAT_PNG
+    assert (image.flac_picture().width, image.flac_picture().height) == (10, 20)
+
+    bogus = tmp_path / "cover.png"
+    bogus.write_bytes(b'GIF89a')
+    with pytest.raises(CoverArtError, match=r"Unsupported image format: \.png"):
+        CoverArtCache().load(str(bogus))
+
+def test_same_content_is_read_and_prepared_once(tmp_path):
+    copy = tmp_path / "copy.jpg"
+    shutil.copyfile(COVER, str(copy))
+    cache = CoverArtCache()
+
+    first = cache.load(COVER)
+    assert cache.load(str(copy)) is first
+    assert len(cache) == 1
+    assert first.apic(3) is cache.load(COVER).apic(3)
+    assert first.apic(1) is not first.apic(3)
+
+def test_changed_file_is_read_again(tmp_path):
+    path = tmp_path / "cover.png"
+    path.write_bytes(png_bytes(1, 1))
+    cache = CoverArtCache()
+    assert cache.load(str(path)).width == 1
+
+    path.write_bytes(png_bytes(2, 2) + b'\x00')
+    assert cache.load(str(path)).width == 2
+
+def test_cache_is_size_bounded(tmp_path):
+    images = []
+    for size in range(1, 4):
+        path = tmp_path / f"{size}.png"
+        path.write_bytes(png_bytes(size, size))
+        images.append(str(path))
+    cache = CoverArtCache(max_bytes=2 * len(png_bytes(1, 1)))
+
+    first = cache.load(images[0])
+    cache.load(images[1])
+    cache.load(images[2])
+    assert len(cache) == 2
+    assert cache.size_bytes <= cache.max_bytes
+    assert cache.load(images[0]) is not first
+
+    with pytest.raises(ValueError):
+        CoverArtCache(max_bytes=-1)
+
+def test_updaters_share_cover_payload(tmp_path):
+    cache = CoverArtCache()
+    for name in ("a.flac", "b.flac"):
+        shutil.copyfile(os.path.join(RESOURCES, "test.flac"), str(tmp_path / name))
+    updaters = [AudioMetaUpdater(str(tmp_path / name), cover_cache=cache) for name in ("a.flac", "b.flac")]
+    for updater in updaters:
+        updater.update_or_add_metadata('cover_art', COVER)
+
+    pictures = [AudioMetaUpdater(str(tmp_path / name)).audio.pictures[-1] for name in ("a.flac", "b.flac")]
+    assert len(cache) == 1
+    assert all(picture.mime == 'image/jpeg' and picture.width > 0 for picture in pictures)
+    assert pictures[0].data == open(COVER, 'rb').read()
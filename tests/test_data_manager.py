@@ -0,0 +1,106 @@
+import pytest
+from config import FFMPEG_PROFILES_PATH
+from data_manager import ProfileDataManager
+from models import Profile, ProfileConstants
+
+def _profile(name, extension, setup):
+    return Profile(Name=name, Codec="X", Extension=extension, FFmpegSetup=setup, SizeFactor=1.0, CpuFactor=1.0, Description="")
+
+def test_equivalence_key_normalizes_setup():
+    a = _profile("A", ".flac", "acodec=flac, compression_level=8, ar=44100")
+    b = _profile("B", ".FLAC", "ar=44100,c:a=flac,  compression_level=8")
+    c = _profile("C", ".flac", "acodec=flac, compression_level=12, ar=44100")
+    d = _profile("D", ".m4a", "acodec=flac, compression_level=8, ar=44100")
+
+    assert ProfileDataManager.get_equivalence_key(a) == ProfileDataManager.get_equivalence_key(b)
+    assert ProfileDataManager.get_equivalence_key(a) != ProfileDataManager.get_equivalence_key(c)
+    assert ProfileDataManager.get_equivalence_key(a) != ProfileDataManager.get_equivalence_key(d)
+
+def test_group_equivalent_profiles_from_config():
+    profiles = ProfileDataManager().load_profiles(FFMPEG_PROFILES_PATH).profiles
+    groups = ProfileDataManager.group_equivalent_profiles(profiles)
+
+    cd_flac = [group for group in groups.values() if len(group) == 6]
+    assert len(cd_flac) == 1
+    assert [profile.Name for profile in cd_flac[0]] == [
+        ProfileConstants.SPOTIFY_HIFI_LOSSLESS,
+        ProfileConstants.TIDAL_HIFI,
+        ProfileConstants.AMAZON_MUSIC_HD,
+        ProfileConstants.QOBUZ_STUDIO,
+        ProfileConstants.DEEZER_HIFI,
+        ProfileConstants.NAPSTER_HIFI
+    ]
+    assert sum(len(group) for group in groups.values()) == len(profiles)
+
+def test_apply_measurements(tmp_path):
+    from encode_history import EncodeHistory, EncodeSample
+    history = EncodeHistory(str(tmp_path / "history.sqlite3"))
+    for _ in range(3):
+        history.record(EncodeSample(ProfileConstants.MP3_STANDARD_320KBPS, "flac", 400000, 200000, 2.0, 0.5, 0.4))
+        # one core busy as well, but three times slower
+        history.record(EncodeSample(ProfileConstants.QOBUZ_SUBLIME, "flac", 400000, 1000000, 2.0, 1.5, 1.2))
+    history.record(EncodeSample(ProfileConstants.WAV_24BIT_44_1KHZ, "flac", 400000, 200000, 2.0, 0.5, 0.4))
+
+    data_manager = ProfileDataManager().load_profiles(FFMPEG_PROFILES_PATH).apply_measurements(history)
+
+    mp3 = data_manager.get_profile_by_name(ProfileConstants.MP3_STANDARD_320KBPS)
+    assert (mp3.SizeFactor, mp3.CpuFactor) == (0.5, 1.0)
+    hires = data_manager.get_profile_by_name(ProfileConstants.QOBUZ_SUBLIME)
+    assert (hires.SizeFactor, hires.CpuFactor) == (2.5, 3.0)
+    # a single sample is not trusted yet
+    static = ProfileDataManager().load_profiles(FFMPEG_PROFILES_PATH).get_profile_by_name(ProfileConstants.WAV_24BIT_44_1KHZ)
+    assert data_manager.get_profile_by_name(ProfileConstants.WAV_24BIT_44_1KHZ) == static
+
+def test_lookups_use_the_index():
+    data_manager = ProfileDataManager().load_profiles(FFMPEG_PROFILES_PATH)
+
+    assert data_manager.get_profile_by_name(ProfileConstants.TIDAL_HIFI.upper()).Name == ProfileConstants.TIDAL_HIFI
+    assert data_manager.get_profiles_by_extension(".FLAC") == [p for p in data_manager.profiles if p.Extension.lower() == ".flac"]
+    assert data_manager.get_profiles_by_codec("flac") == [p for p in data_manager.profiles if p.Codec.lower() == "flac"]
+    with pytest.raises(ValueError):
+        data_manager.get_profile_by_name("missing")
+
+    # the index follows profiles replaced after loading
+    data_manager.profiles = [_profile("Only", ".mp3", "acodec=libmp3lame")]
+    assert data_manager.get_profile_by_name("only").Name == "Only"
+    # including a profile replaced in place
+    data_manager.profiles[0] = _profile("Other", ".flac", "acodec=flac")
+    assert data_manager.get_profiles_by_extension(".flac")[0].Name == "Other"
+    with pytest.raises(ValueError):
+        data_manager.get_profile_by_name("only")
+
+def test_registry_reloads_on_change(tmp_path):
+    import json, os
+    from data_manager import ProfileRegistry
+    profiles_path = tmp_path / "profiles.json"
+    entry = {"Name": "A", "Codec": "MP3", "Extension": ".mp3", "FFmpegSetup": "acodec=libmp3lame, b:a=320k",
+             "SizeFactor": 1, "CpuFactor": 1, "Description": ""}
+    profiles_path.write_text(json.dumps({"Profiles": [entry]}))
+    registry = ProfileRegistry()
+
+    first = registry.profiles(str(profiles_path))
+    assert registry.profiles(str(profiles_path)) is first
+    assert ProfileDataManager.get_FFmpegSetup_as_dict(first.profiles[0]) == {"acodec": "libmp3lame", "b:a": "320k"}
+
+    profiles_path.write_text(json.dumps({"Profiles": [entry, dict(entry, Name="B")]}))
+    os.utime(str(profiles_path), ns=(0, os.stat(str(profiles_path)).st_mtime_ns + 10 ** 9))
+    reloaded = ProfileDataManager(registry).load_profiles(str(profiles_path))
+    assert [profile.Name for profile in reloaded.profiles] == ["A", "B"]
+
+def test_arguments_are_cached(tmp_path):
+    import json
+    from data_manager import ProfileRegistry
+    arguments_path = tmp_path / "arguments.json"
+    arguments_path.write_text(json.dumps([{"Name": "loglevel", "Default": "info", "Description": ""}]))
+    registry = ProfileRegistry()
+
+    arguments = ProfileDataManager(registry).load_arguments(str(arguments_path)).get_arguments_as_dict()
+    arguments["y"] = ""
+
+    assert ProfileDataManager(registry).load_arguments(str(arguments_path)).get_arguments_as_dict() == {"loglevel": "info"}
+
+    # an argument replaced in place isn't served from the cached dict
+    from models import Argument
+    data_manager = ProfileDataManager(registry).load_arguments(str(arguments_path))
+    data_manager.arguments[0] = Argument("loglevel", "error", "")
+    assert data_manager.get_arguments_as_dict() == {"loglevel": "error"}
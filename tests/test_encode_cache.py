@@ -0,0 +1,75 @@
+import os
+import time
+import pytest
+from encode_cache import EncodeCache
+
+@pytest.fixture
+def cache(tmp_path):
+    return EncodeCache(str(tmp_path / "cache"), max_size_bytes=1024)
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "song.flac"
+    path.write_bytes(b"source audio")
+    return str(path)
+
+def make_key(cache, source, **overrides):
+    args = dict(extension=".mp3", output_args={"acodec": "libmp3lame", "b:a": "320k"},
+                global_args=["-y"], metadata_tags={"title": "T"}, ffmpeg_version="ffmpeg version 6.0")
+    args.update(overrides)
+    return cache.make_key(source, **args)
+
+def test_key_is_stable_and_order_independent(cache, source):
+    key = make_key(cache, source)
+    assert key == make_key(cache, source, output_args={"b:a": "320k", "acodec": "libmp3lame"})
+    assert key != make_key(cache, source, output_args={"acodec": "libmp3lame", "b:a": "128k"})
+    assert key != make_key(cache, source, metadata_tags={"title": "Other"})
+    assert key != make_key(cache, source, ffmpeg_version="ffmpeg version 7.0")
+
+def test_key_follows_input_content(cache, source):
+    key = make_key(cache, source)
+    with open(source, "wb") as f:
+        f.write(b"changed audio")
+    os.utime(source, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+    assert make_key(cache, source) != key
+
+def test_put_and_get(cache, source, tmp_path):
+    key = make_key(cache, source)
+    target = str(tmp_path / "out.mp3")
+    assert cache.get(key, ".mp3", target) is None
+
+    encoded = tmp_path / "encoded.mp3"
+    encoded.write_bytes(b"encoded audio")
+    cache.put(key, ".mp3", str(encoded))
+
+    assert cache.get(key, ".mp3", target) in ("reflink", "copy")
+    with open(target, "rb") as f:
+        assert f.read() == b"encoded audio"
+    assert cache.stats().entries == 1
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    cache = EncodeCache(str(tmp_path / "cache"), max_size_bytes=4096)
+    encoded = tmp_path / "encoded.mp3"
+    encoded.write_bytes(b"x" * 400)
+    for i, key in enumerate(["aa1", "bb2", "cc3"]):
+        cache.put(key, ".mp3", str(encoded))
+        os.utime(cache._object_path(key, ".mp3"), (1000 + i, 1000 + i))
+    # a hit refreshes the oldest entry
+    cache.get("aa1", ".mp3", str(tmp_path / "hit.mp3"))
+
+    removed, freed = cache.prune(max_size_bytes=800)
+
+    assert (removed, freed) == (1, 400)
+    assert not os.path.exists(cache._object_path("bb2", ".mp3"))
+    assert cache.stats().size_bytes == 800
+
+def test_put_keeps_cache_under_budget(cache, tmp_path):
+    encoded = tmp_path / "encoded.mp3"
+    encoded.write_bytes(b"x" * 600)
+    cache.put("aa1", ".mp3", str(encoded))
+    cache.put("bb2", ".mp3", str(encoded))
+    assert cache.stats().entries == 1
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        EncodeCache("cache", max_size_bytes=-1)
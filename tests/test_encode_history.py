@@ -0,0 +1,79 @@
+import pickle
+import pytest
+from encode_history import EncodeHistory, EncodeSample, parse_benchmark
+from models import BASELINE_PROFILE
+
+STDERR = """size=      81KiB time=00:00:02.00 bitrate= 330.4kbits/s speed=70.5x
+bench: utime=0.024s stime=0.004s rtime=0.029s
+bench: maxrss=29044KiB
+"""
+
+@pytest.fixture
+def history(tmp_path):
+    return EncodeHistory(str(tmp_path / "history.sqlite3"))
+
+def sample(profile="MP3", source_format="flac", duration=10.0, wall=1.0, cpu=0.5, output_bytes=None):
+    output_bytes = output_bytes if output_bytes is not None else int((duration or 10) * 40000)
+    return EncodeSample(profile, source_format, 4 * output_bytes, output_bytes, duration, wall, cpu, 2048.0)
+
+def test_parse_benchmark():
+    assert parse_benchmark(STDERR) == {'utime': 0.024, 'stime': 0.004, 'rtime': 0.029, 'maxrss': 29044.0}
+    assert parse_benchmark("no bench lines") == {}
+    assert parse_benchmark(None) == {}
+
+def test_record_and_read_samples(history):
+    history.record(sample())
+    history.record(sample(profile="FLAC"))
+
+    samples = history.samples("MP3")
+    assert len(samples) == 1
+    assert samples[0].profile == "MP3" and samples[0].timestamp > 0
+    assert len(history.samples()) == 2
+
+def test_estimates_are_ratios_of_sums(history):
+    history.record(sample(duration=10, wall=1, cpu=1))
+    history.record(sample(duration=30, wall=3, cpu=6, output_bytes=30 * 40000 * 3))
+    history.record(sample(source_format="wav", duration=None, wall=1, cpu=None))
+
+    estimate = history.estimates()[("MP3", None)]
+
+    assert estimate.samples == 3
+    # output bytes per input byte, every sample counts, known duration or not
+    assert estimate.size_factor == pytest.approx(0.25)
+    assert estimate.cpu_per_second == pytest.approx(7 / 40)
+    assert estimate.cores == pytest.approx(7 / 4)
+    # relative to the baseline profile, which wasn't measured
+    assert estimate.cpu_factor is None
+    assert estimate.realtime_factor == pytest.approx(10)
+    assert estimate.maxrss_kib == 2048.0
+
+def test_estimates_by_source_format(history):
+    history.record(sample(source_format="flac"))
+    history.record(sample(source_format="wav", cpu=0.25))
+
+    estimates = history.estimates(by_source_format=True)
+
+    assert set(estimates) == {("MP3", "flac"), ("MP3", "wav")}
+    assert estimates[("MP3", "wav")].cores == pytest.approx(0.25)
+
+def test_cpu_factor_is_relative_to_the_baseline(history):
+    # both profiles keep one core busy, the Hi-Res one needs 4x the CPU time per source second
+    for _ in range(2):
+        history.record(sample(profile=BASELINE_PROFILE, duration=60, wall=0.8, cpu=0.8))
+        history.record(sample(profile="Hi-Res", duration=60, wall=3.2, cpu=3.2))
+
+    estimates = history.estimates()
+
+    assert estimates[(BASELINE_PROFILE, None)].cpu_factor == pytest.approx(1.0)
+    assert estimates[("Hi-Res", None)].cpu_factor == pytest.approx(4.0)
+    assert estimates[("Hi-Res", None)].cores == pytest.approx(1.0)
+
+def test_clear(history):
+    history.record(sample())
+    history.clear()
+    assert history.estimates() == {}
+
+def test_history_pickles_for_process_pools(history):
+    history.record(sample())
+    clone = pickle.loads(pickle.dumps(history))
+    assert len(clone.samples()) == 1
@@ -1,7 +1,11 @@
+import asyncio
+import os
+import time
 import pytest
 import subprocess
-from unittest.mock import patch, MagicMock
-from encoder import Encoder, EncodingError
+from unittest.mock import patch, MagicMock, AsyncMock
+from encoder import Encoder, EncodingError, FFmpegCommand
+from models import Profile
 
 @pytest.fixture
 def encoder():
@@ -70,3 +74,430 @@ def test_get_metadata_failure(encoder):
             encoder.get_metadata("test.wav")
         assert isinstance(exc_info.value, error.__class__)
         encoder.logger.error.assert_called()
+
+def test_encode_async_success(encoder):
+    with patch("encoder.os.path.isfile", return_value=True), \
+         patch("encoder.os.path.exists", return_value=False), \
+         patch("encoder.Stats") as mock_stats, \
+         patch("encoder.FFmpegCommand.run_async", new_callable=AsyncMock) as mock_run_async:
+        result = asyncio.run(encoder.encode_async("test.wav", output_path="test.mp3"))
+        assert result == "test.mp3"
+        mock_run_async.assert_awaited_once()
+        mock_stats.return_value.compare_file_sizes.assert_called_once()
+
+def test_copy_async_forces_stream_copy(encoder):
+    with patch.object(encoder, "encode_async", new_callable=AsyncMock, return_value="out.mp3") as mock_encode_async:
+        assert asyncio.run(encoder.copy_async("in.mp3", "out.mp3", metadata_tags={"a": "b"})) == "out.mp3"
+        args, _ = mock_encode_async.call_args
+        assert args[4] == {"c": "copy"}
+
+def test_encode_async_failure(encoder):
+    error = subprocess.CalledProcessError(1, "ffmpeg", stderr="FFmpeg error")
+    with patch("encoder.os.path.isfile", return_value=True), \
+         patch("encoder.os.path.exists", return_value=False), \
+         patch("encoder.FFmpegCommand.run_async", new_callable=AsyncMock, side_effect=error):
+        with pytest.raises(EncodingError):
+            asyncio.run(encoder.encode_async("test.wav", output_path="test.mp3"))
+        encoder.logger.error.assert_called()
+
+@pytest.mark.skipif(os.name == "nt", reason="uses a POSIX shell script as a fake ffmpeg")
+def test_run_async_cancel_kills_process(tmp_path):
+    fake_ffmpeg = tmp_path / "ffmpeg"
+    fake_ffmpeg.write_text("#!/bin/sh\nexec sleep 30\n")
+    fake_ffmpeg.chmod(0o755)
+    command = FFmpegCommand(str(fake_ffmpeg), logger=MagicMock()).input("in.wav").output("out.mp3")
+
+    async def run_and_cancel():
+        task = asyncio.ensure_future(command.run_async(capture_stdout=True, capture_stderr=True))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        await task
+
+    start = time.monotonic()
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run_and_cancel())
+    assert time.monotonic() - start < 10
+
+def _profile(name, extension, setup):
+    return Profile(Name=name, Codec="X", Extension=extension, FFmpegSetup=setup, SizeFactor=1.0, CpuFactor=1.0, Description="")
+
+def test_compile_multiple_outputs():
+    command = FFmpegCommand("ffmpeg", logger=MagicMock()).input("in.flac").global_args(["-y", "-vn"])
+    command.filter_complex("[0:a]asplit=2[s0][s1]")
+    command.add_output("a.flac", {"acodec": "flac"}, {"artist": "A"}, "[s0]")
+    command.add_output("b.mp3", {"acodec": "libmp3lame"}, None, "0:a:0")
+
+    assert command.compile() == [
+        "ffmpeg", "-i", "in.flac", "-filter_complex", "[0:a]asplit=2[s0][s1]",
+        "-y", "-vn", "-map", "[s0]", "-metadata", "artist=A", "-acodec", "flac", "a.flac",
+        "-y", "-vn", "-map", "0:a:0", "-acodec", "libmp3lame", "b.mp3"
+    ]
+
+def test_plan_shared_filters(encoder):
+    profiles = [
+        _profile("FLAC CD", ".flac", "acodec=flac, ar=44100, sample_fmt=s16"),
+        _profile("ALAC CD", ".m4a", "acodec=alac, ar=44100, sample_fmt=s16"),
+        _profile("FLAC HR", ".flac", "acodec=flac, ar=192000, sample_fmt=s32"),
+        _profile("MP3", ".mp3", "acodec=libmp3lame, b:a=320k")
+    ]
+    graph, stream_maps = encoder._plan_shared_filters(profiles)
+
+    assert graph == "[0:a]aresample=44100,aformat=sample_fmts=s16,asplit=2[s0][s1]"
+    assert stream_maps == {"FLAC CD": "[s0]", "ALAC CD": "[s1]"}
+
+def test_plan_shared_filters_splits_input_for_several_groups(encoder):
+    profiles = [
+        _profile("A", ".flac", "acodec=flac, ar=44100"),
+        _profile("B", ".m4a", "acodec=alac, ar=44100"),
+        _profile("C", ".flac", "acodec=flac, ar=96000"),
+        _profile("D", ".wav", "acodec=pcm_s24le, ar=96000")
+    ]
+    graph, stream_maps = encoder._plan_shared_filters(profiles)
+
+    assert graph == ("[0:a]asplit=2[in0][in1];"
+                     "[in0]aresample=44100,asplit=2[s0][s1];"
+                     "[in1]aresample=96000,asplit=2[s2][s3]")
+    assert stream_maps == {"A": "[s0]", "B": "[s1]", "C": "[s2]", "D": "[s3]"}
+
+def test_encode_many_single_run(encoder, tmp_path):
+    input_file = tmp_path / "master.flac"
+    input_file.write_bytes(b"data")
+    profiles = [
+        _profile("FLAC CD", ".flac", "acodec=flac, ar=44100, sample_fmt=s16"),
+        _profile("ALAC CD", ".m4a", "acodec=alac, ar=44100, sample_fmt=s16"),
+        _profile("MP3 320", ".mp3", "acodec=libmp3lame, b:a=320k")
+    ]
+    with patch("encoder.FFmpegCommand.run", autospec=True) as mock_run, patch("encoder.Stats"):
+        outputs = encoder.encode_many(str(input_file), profiles + profiles[:1], metadata_tags={"album": "Z"})
+        mock_run.assert_called_once()
+        command = mock_run.call_args[0][0]
+
+    assert outputs == {
+        "FLAC CD": str(tmp_path / "master_FLAC_CD.flac"),
+        "ALAC CD": str(tmp_path / "master_ALAC_CD.m4a"),
+        "MP3 320": str(tmp_path / "master_MP3_320.mp3")
+    }
+    assert [spec.stream_map for spec in command.outputs] == ["[s0]", "[s1]", "0:a:0"]
+    assert command.outputs[0].output_options == {"acodec": "flac"}
+    assert all(spec.metadata_options == {"album": "Z"} for spec in command.outputs)
+
+def test_encode_many_requires_profiles(encoder, tmp_path):
+    input_file = tmp_path / "master.flac"
+    input_file.write_bytes(b"data")
+    with pytest.raises(ValueError):
+        encoder.encode_many(str(input_file), [])
+
+def test_encode_many_encodes_equivalent_profiles_once(encoder, tmp_path):
+    input_file = tmp_path / "master.flac"
+    input_file.write_bytes(b"data")
+    profiles = [
+        _profile("Tidal", ".flac", "acodec=flac, compression_level=8"),
+        _profile("Deezer", ".flac", "compression_level=8, acodec=flac"),
+        _profile("MP3 320", ".mp3", "acodec=libmp3lame, b:a=320k")
+    ]
+
+    def fake_run(command, **kwargs):
+        for spec in command.outputs:
+            with open(spec.output_file, "wb") as f:
+                f.write(spec.output_file.encode())
+
+    with patch("encoder.FFmpegCommand.run", autospec=True, side_effect=fake_run) as mock_run, \
+         patch("encoder.Stats"), \
+         patch("meta_updater.AudioMetaUpdater") as mock_updater:
+        outputs = encoder.encode_many(str(input_file), profiles, profile_metadata={"Deezer": {"comment": "deezer"}})
+        command = mock_run.call_args[0][0]
+
+    assert [spec.output_file for spec in command.outputs] == [outputs["Tidal"], outputs["MP3 320"]]
+    with open(outputs["Deezer"], "rb") as f:
+        assert f.read() == outputs["Tidal"].encode()
+    assert os.stat(outputs["Deezer"]).st_nlink == 1
+    mock_updater.assert_called_once_with(outputs["Deezer"])
+    mock_updater.return_value.update_metadata_list.assert_called_once_with([("comment", "deezer")])
+
+def test_encode_served_from_cache(tmp_path):
+    from encode_cache import EncodeCache
+    source = tmp_path / "song.wav"
+    source.write_bytes(b"source audio")
+    cache = EncodeCache(str(tmp_path / "cache"))
+    encoder = Encoder(_profile("MP3", ".mp3", "acodec=libmp3lame, b:a=320k"), logger=MagicMock(), cache=cache)
+
+    def fake_run(command, **kwargs):
+        with open(command.output_file, "wb") as f:
+            f.write(b"encoded audio")
+
+    with patch("encoder.get_tool_version", return_value="ffmpeg version 6.0"), \
+         patch("encoder.Stats"), \
+         patch.object(FFmpegCommand, "run", autospec=True, side_effect=fake_run) as mock_run:
+        first = encoder.encode(str(source), str(tmp_path / "first.mp3"))
+        second = encoder.encode(str(source), str(tmp_path / "second.mp3"))
+
+    assert mock_run.call_count == 1
+    with open(second, "rb") as f:
+        assert f.read() == b"encoded audio"
+    assert first != second
+
+def test_encode_records_history(tmp_path):
+    from encode_history import EncodeHistory
+    source = tmp_path / "song.wav"
+    source.write_bytes(b"\0" * 4000)
+    history = EncodeHistory(str(tmp_path / "history.sqlite3"))
+    encoder = Encoder(_profile("MP3", ".mp3", "acodec=libmp3lame, b:a=320k"), logger=MagicMock(), history=history)
+
+    def fake_run(command, **kwargs):
+        with open(command.output_file, "wb") as f:
+            f.write(b"\0" * 1000)
+        command.stderr = "bench: utime=0.300s stime=0.100s rtime=0.500s\nbench: maxrss=2048KiB\n"
+
+    with patch("encoder.Stats"), \
+         patch.object(Encoder, "get_metadata", return_value={'format': {'duration': "2.0"}}), \
+         patch.object(FFmpegCommand, "run", autospec=True, side_effect=fake_run):
+        encoder.encode(str(source), str(tmp_path / "out.mp3"))
+
+    [sample] = history.samples()
+    assert (sample.profile, sample.source_format, sample.input_bytes, sample.output_bytes) == ("MP3", "wav", 4000, 1000)
+    assert sample.duration == 2.0 and sample.cpu_seconds == pytest.approx(0.4) and sample.maxrss_kib == 2048
+
+def _fake_ffmpeg(tmp_path, script):
+    fake_ffmpeg = tmp_path / "ffmpeg"
+    fake_ffmpeg.write_text("#!/bin/sh\n" + script + "\n")
+    fake_ffmpeg.chmod(0o755)
+    return str(fake_ffmpeg)
+
+def test_compile_input_args():
+    command = FFmpegCommand("ffmpeg", logger=MagicMock()).input("pipe:0").output("pipe:1").global_args([])
+    command.input_args(["-f", "s16le"]).output_args({"f": "mp3"})
+    assert command.compile() == ["ffmpeg", "-f", "s16le", "-i", "pipe:0", "-f", "mp3", "pipe:1"]
+
+@pytest.mark.skipif(os.name == "nt", reason="uses a POSIX shell script as a fake ffmpeg")
+def test_run_stream_pipes_source_through(tmp_path):
+    command = FFmpegCommand(_fake_ffmpeg(tmp_path, "exec cat"), logger=MagicMock()).input("pipe:0").output("pipe:1")
+    source = [b"x" * 100000, b"y" * 100000]
+
+    chunks = list(command.run_stream(iter(source), chunk_size=4096))
+
+    assert b"".join(chunks) == b"".join(source)
+    assert max(len(chunk) for chunk in chunks) <= 4096
+
+@pytest.mark.skipif(os.name == "nt", reason="uses a POSIX shell script as a fake ffmpeg")
+def test_run_stream_failure(tmp_path):
+    command = FFmpegCommand(_fake_ffmpeg(tmp_path, "echo 'Invalid data' >&2; exit 1"), logger=MagicMock())
+    command.input("pipe:0").output("pipe:1")
+    with pytest.raises(subprocess.CalledProcessError) as exc_info:
+        list(command.run_stream(iter([b"data"])))
+    assert "Invalid data" in exc_info.value.stderr
+
+@pytest.mark.skipif(os.name == "nt", reason="uses a POSIX shell script as a fake ffmpeg")
+def test_run_stream_close_kills_process(tmp_path):
+    command = FFmpegCommand(_fake_ffmpeg(tmp_path, "exec cat /dev/zero"), logger=MagicMock())
+    stream = command.input("in.wav").output("pipe:1").run_stream(chunk_size=1024)
+
+    start = time.monotonic()
+    assert len(next(stream)) <= 1024
+    stream.close()
+    assert time.monotonic() - start < 10
+
+def test_encode_stream_uses_pipe_muxer():
+    encoder = Encoder(_profile("FLAC", ".flac", "acodec=flac"), logger=MagicMock())
+    with patch.object(FFmpegCommand, "run_stream", autospec=True, return_value=iter([b"fLaC", b"data"])) as mock_run_stream:
+        output = b"".join(encoder.encode_stream(iter([b"raw"]), input_args=["-f", "s16le"]))
+
+    assert output == b"fLaCdata"
+    command = mock_run_stream.call_args[0][0].compile()
+    assert command[1:5] == ["-f", "s16le", "-i", "pipe:0"]
+    assert command[-3:] == ["-f", "flac", "pipe:1"]
+
+def test_encode_stream_unsupported_extension():
+    encoder = Encoder(_profile("Raw", ".raw", "acodec=pcm_s16le"), logger=MagicMock())
+    with pytest.raises(EncodingError):
+        list(encoder.encode_stream(iter([b"raw"])))
+
+def test_get_metadata_many_probes_only_misses(tmp_path):
+    from probe_cache import ProbeCache
+    paths = []
+    for name in ["a.flac", "b.flac", "c.flac"]:
+        (tmp_path / name).write_bytes(b"audio")
+        paths.append(str(tmp_path / name))
+    encoder = Encoder(_profile("FLAC", ".flac", "acodec=flac"), logger=MagicMock(),
+                      probe_cache=ProbeCache(str(tmp_path / "probes.sqlite3")))
+
+    def fake_probe(file_path, cmd=None):
+        if file_path.endswith("c.flac"):
+            raise RuntimeError("broken file")
+        return {"format": {"filename": file_path}}
+
+    with patch("encoder.get_tool_version", return_value="ffprobe 6.0"), \
+         patch.object(encoder.ffmpeg_cmd, "probe", side_effect=fake_probe) as mock_probe:
+        assert encoder.get_metadata(paths[0]) == {"format": {"filename": paths[0]}}
+        results = encoder.get_metadata_many(paths + [paths[0]], jobs=2)
+        assert mock_probe.call_count == 3
+
+        mock_probe.reset_mock()
+        assert encoder.get_metadata_many(paths[:2]) == {path: {"format": {"filename": path}} for path in paths[:2]}
+        mock_probe.assert_not_called()
+
+    assert list(results) == paths
+    assert results[paths[2]] is None
+
+def test_get_metadata_native_fast_path():
+    file_path = os.path.join(os.path.dirname(__file__), "resources", "audio", "test.flac")
+    encoder = Encoder(_profile("FLAC", ".flac", "acodec=flac"), logger=MagicMock())
+    with patch.object(encoder.ffmpeg_cmd, "probe") as mock_probe:
+        assert encoder.get_metadata(file_path)["streams"][0]["codec_name"] == "flac"
+        mock_probe.assert_not_called()
+
+        encoder.native_probe = False
+        encoder.get_metadata(file_path)
+        mock_probe.assert_called_once()
+
+def test_progress_parser():
+    from encoder import ProgressParser
+    parser = ProgressParser(start=time.monotonic())
+    block = ["bitrate=N/A", "total_size=N/A", "out_time_us=N/A", "speed=N/A"]
+    assert [parser.feed(line) for line in block] == [None] * 4
+    event = parser.feed("progress=continue")
+    assert (event.out_time_us, event.total_size, event.speed, event.done) == (0, 0, None, False)
+
+    for line in [b"total_size=4096\n", b"out_time_us=1500000\n", b"speed=2.5x\n"]:
+        parser.feed(line)
+    event = parser.feed(b"progress=end\n")
+    assert (event.out_time_us, event.total_size, event.speed, event.done) == (1500000, 4096, 2.5, True)
+
+def test_progress_event_fraction_and_eta():
+    from encoder import ProgressEvent
+    event = ProgressEvent(out_time_us=2_000_000, total_size=0, speed=2.0, elapsed=1.0, duration_us=10_000_000)
+    assert event.fraction == 0.2
+    assert event.eta == 4.0
+    assert ProgressEvent(0, 0, None, 0.0).fraction is None
+
+@pytest.mark.skipif(os.name == "nt", reason="uses a POSIX shell script as a fake ffmpeg")
+def test_run_reports_progress(tmp_path):
+    script = ("printf 'out_time_us=500000\\nspeed=10x\\nprogress=continue\\n'; "
+              "printf 'out_time_us=1000000\\ntotal_size=10\\nspeed=12x\\nprogress=end\\n'")
+    command = FFmpegCommand(_fake_ffmpeg(tmp_path, script), logger=MagicMock()).input("in.wav").output("out.flac")
+    events = []
+
+    command.run(capture_stdout=True, capture_stderr=True, progress=events.append)
+
+    assert [(event.out_time_us, event.speed, event.done) for event in events] == [(500000, 10.0, False), (1000000, 12.0, True)]
+
+@pytest.mark.skipif(os.name == "nt", reason="uses a POSIX shell script as a fake ffmpeg")
+def test_run_async_reports_progress(tmp_path):
+    script = "printf 'out_time_us=1000000\\nprogress=end\\n'; echo failed >&2; exit 1"
+    command = FFmpegCommand(_fake_ffmpeg(tmp_path, script), logger=MagicMock()).input("in.wav").output("out.flac")
+    events = []
+
+    with pytest.raises(subprocess.CalledProcessError) as exc_info:
+        asyncio.run(command.run_async(progress=events.append))
+
+    assert [event.out_time_us for event in events] == [1000000]
+    assert "failed" in exc_info.value.stderr
+
+def test_encode_progress_yields_events(tmp_path):
+    from encoder import ProgressEvent
+    source = tmp_path / "song.wav"
+    source.write_bytes(b"audio")
+    encoder = Encoder(_profile("FLAC", ".flac", "acodec=flac"), logger=MagicMock())
+
+    async def fake_run_async(command, capture_stdout=False, capture_stderr=False, progress=None):
+        progress(ProgressEvent(500000, 10, 1.0, 0.5))
+        await asyncio.sleep(0)
+        progress(ProgressEvent(1000000, 20, 1.0, 1.0, done=True))
+
+    async def collect():
+        return [event async for event in encoder.encode_progress(str(source), str(tmp_path / "out.flac"))]
+
+    with patch("encoder.Stats"), \
+         patch.object(encoder, "get_metadata", return_value={"format": {"duration": "2.0"}}), \
+         patch.object(FFmpegCommand, "run_async", autospec=True, side_effect=fake_run_async):
+        events = asyncio.run(collect())
+
+    assert [event.fraction for event in events] == [0.25, 1.0]
+    assert all(event.output_file == str(tmp_path / "out.flac") for event in events)
+
+def test_command_template_matches_compile():
+    encoder = Encoder(_profile("MP3", ".mp3", "acodec=libmp3lame, b:a=320k"), logger=MagicMock())
+    template = encoder.command_template({"ar": "44100"})
+    command = (FFmpegCommand(template.ffmpeg_path, logger=MagicMock())
+               .input("in.wav").output("out.mp3").global_args(list(template.global_options))
+               .output_args({"acodec": "libmp3lame", "b:a": "320k", "ar": "44100"}).metadata({"title": "A"}))
+
+    assert template.argv("in.wav", "out.mp3", {"title": "A"}) == command.compile()
+    # shared by every encoder of the profile
+    assert Encoder(encoder.profile, logger=MagicMock()).command_template({"ar": "44100"}) is template
+    assert encoder.command_template() is not template
+
+def test_templated_command_does_not_leak_between_encodes():
+    encoder = Encoder(_profile("MP3", ".mp3", "acodec=libmp3lame"), logger=MagicMock())
+    command = encoder._build_command(encoder.ffmpeg_cmd, "a.wav", "a.mp3", {"title": "A"})
+    assert "title=A" in command.compile()
+
+    command = encoder._build_command(encoder.ffmpeg_cmd, "b.wav", "b.mp3")
+    command.output_args({"ar": "48000"})
+    assert "title=A" not in command.compile() and command.compile()[-3:] == ["-ar", "48000", "b.mp3"]
+    assert "ar" not in encoder.command_template().output_options
+
+def test_encode_writes_tags_in_the_encode_pass(tmp_path):
+    source = tmp_path / "song.wav"
+    source.write_bytes(b"source audio")
+    cover = os.path.join(os.path.dirname(__file__), "resources", "audio", "cover.jpg")
+    encoder = Encoder(_profile("MP3", ".mp3", "acodec=libmp3lame, b:a=320k"), logger=MagicMock())
+    commands = []
+
+    def fake_run(command, **kwargs):
+        commands.append(command.compile())
+        with open(command.output_file, "wb") as f:
+            f.write(b"encoded audio")
+
+    with patch("encoder.Stats"), \
+         patch("meta_updater.AudioMetaUpdater.update_metadata_list", autospec=True) as mock_update, \
+         patch.object(FFmpegCommand, "run", autospec=True, side_effect=fake_run):
+        output = encoder.encode(str(source), str(tmp_path / "out.mp3"), metadata_tags={"TIT2": "Raw", "TSSE": "x"},
+                                tags={"title": "Song", "lyrics": "La la", "cover_art": cover}, ffmpeg_global_args={"-vn": ""})
+
+    argv = commands[0]
+    assert argv[1:5] == ["-i", str(source), "-i", cover] and "-vn" not in argv
+    assert argv[argv.index("-disposition:v") + 1] == "attached_pic"
+    assert "TIT2=Song" in argv and "TSSE=x" in argv and "TIT2=Raw" not in argv
+    # the lyrics ffmpeg can't write are applied with a single save, before the output is finalized
+    mock_update.assert_called_once()
+    updater, remaining = mock_update.call_args[0]
+    assert updater.file_path == output and remaining == [("lyrics", "La la")]
+
+def test_encode_cache_key_covers_tags(tmp_path):
+    from encode_cache import EncodeCache
+    source = tmp_path / "song.wav"
+    source.write_bytes(b"source audio")
+    cover = os.path.join(os.path.dirname(__file__), "resources", "audio", "cover.jpg")
+    encoder = Encoder(_profile("FLAC", ".flac", "acodec=flac"), logger=MagicMock(), cache=EncodeCache(str(tmp_path / "cache")))
+
+    def fake_run(command, **kwargs):
+        with open(command.output_file, "wb") as f:
+            f.write(b"encoded audio")
+
+    with patch("encoder.get_tool_version", return_value="ffmpeg version 6.0"), \
+         patch("encoder.Stats"), \
+         patch.object(FFmpegCommand, "run", autospec=True, side_effect=fake_run) as mock_run:
+        encoder.encode(str(source), str(tmp_path / "a.flac"), tags={"title": "Song"})
+        encoder.encode(str(source), str(tmp_path / "b.flac"), tags={"title": "Song", "cover_art": cover})
+        encoder.encode(str(source), str(tmp_path / "c.flac"), tags={"title": "Song", "cover_art": cover})
+
+    assert mock_run.call_count == 2
+
+def test_encode_reserves_tag_padding(tmp_path):
+    from meta_updater import TagPadding
+    source = tmp_path / "song.wav"
+    source.write_bytes(b"source audio")
+    padding = TagPadding(reserve=1024)
+    encoder = Encoder(_profile("FLAC", ".flac", "acodec=flac"), logger=MagicMock(), tag_padding=padding)
+
+    def fake_run(command, **kwargs):
+        with open(command.output_file, "wb") as f:
+            f.write(b"encoded audio")
+
+    with patch("encoder.Stats"), \
+         patch("meta_updater.AudioMetaUpdater.reserve_padding", autospec=True) as mock_reserve, \
+         patch.object(FFmpegCommand, "run", autospec=True, side_effect=fake_run):
+        output = encoder.encode(str(source), str(tmp_path / "out.flac"))
+
+    updater = mock_reserve.call_args[0][0]
+    assert updater.file_path == output and updater.padding is padding
@@ -2,7 +2,7 @@ import pytest
 import os
 import sys
 from models import ProfileConstants
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, patch, MagicMock
 
 # Mock imports that might be problematic during testing if not available
 # or if they have external dependencies
@@ -45,7 +45,7 @@ except ImportError:
 
 
 # Import the script itself AFTER mocking, to prevent early imports of those mocked modules.
-from encoder_cli import check_ffmpeg, show_profiles, encode, copy, kvp_as_dic, main  # Assuming your script is named program.py
+from encoder_cli import check_ffmpeg, show_profiles, encode, encode_batch, copy, kvp_as_dic, main  # Assuming your script is named program.py
 
 # Mock global variables/constants if needed
 TEST_FFMPEG_PATH = "test_ffmpeg_path"
@@ -170,7 +170,7 @@ def test_main_encode_missing_profile(capsys):
 def test_main_encode_success(mock_encode, capsys):
     with patch('sys.argv', ['program.py', 'input.mp3', 'output.mp3', '-o', 'encode', '-p', 'profileA']):
         main()
-    mock_encode.assert_called_once_with('input.mp3', 'output.mp3', 'profileA', None)
+    mock_encode.assert_called_once_with('input.mp3', 'output.mp3', 'profileA', None, False, False, False)
     captured = capsys.readouterr()
 
 @patch('encoder_cli.copy')
@@ -196,4 +196,123 @@ def test_main_input_output(capsys):
         assert pytest_wrapped_e.type is SystemExit
         assert pytest_wrapped_e.value.code == 1
         captured = capsys.readouterr()
-        assert "Error: Requires Operation (-o)." in captured.err
\ No newline at end of file
+        assert "Error: Requires Operation (-o)." in captured.err
+
+@patch('encoder_cli.encode_batch', return_value=True)
+def test_main_encode_directory(mock_encode_batch, tmp_path):
+    with patch('sys.argv', ['program.py', str(tmp_path), '-o', 'encode', '-p', 'profileA', '--jobs', '4']):
+        main()
+    mock_encode_batch.assert_called_once_with(str(tmp_path), str(tmp_path), 'profileA', None, 4, False, False, None, False)
+
+@patch('encoder_cli.BatchEncoder')
+def test_encode_batch(mock_batch_encoder, tmp_path, capsys):
+    from batch_encoder import EncodeResult
+    mock_instance = mock_batch_encoder.return_value
+    mock_instance.encode.return_value = iter([
+        EncodeResult("a.wav", "a.mp3", True),
+        EncodeResult("b.wav", None, False, "boom")
+    ])
+    assert encode_batch(str(tmp_path), str(tmp_path), "profileA", "key1=value1", jobs=2) is False
+    mock_batch_encoder.assert_called_once_with("profileA", jobs=2)
+    mock_instance.collect_jobs.assert_called_once_with(str(tmp_path), str(tmp_path), metadata_tags={"key1": "value1"})
+    captured = capsys.readouterr()
+    assert "[failed] b.wav: boom" in captured.out
+    assert "1/2 files encoded" in captured.out
+
+def test_main_cache_prune(tmp_path, capsys):
+    from encode_cache import EncodeCache
+    encoded = tmp_path / "encoded.mp3"
+    encoded.write_bytes(b"x" * 100)
+    cache_dir = str(tmp_path / "cache")
+    EncodeCache(cache_dir).put("aa1", ".mp3", str(encoded))
+
+    with patch('sys.argv', ['program.py', 'cache', 'prune', '--cache-dir', cache_dir, '--max-size', '0']):
+        with pytest.raises(SystemExit) as pytest_wrapped_e:
+            main()
+    assert pytest_wrapped_e.value.code == 0
+    captured = capsys.readouterr()
+    assert "Pruned 1 entries, 100 bytes freed." in captured.out
+    assert "Entries: 0" in captured.out
+
+def test_parse_size():
+    from encoder_cli import parse_size
+    assert parse_size("512") == 512
+    assert parse_size("2K") == 2048
+    assert parse_size("1.5GB") == int(1.5 * 1024 ** 3)
+
+@patch('encoder_cli.LibrarySync')
+def test_main_sync(mock_library_sync, capsys):
+    from library_sync import SyncReport
+    mock_library_sync.return_value.sync.return_value = SyncReport(encoded=["a.wav"], removed=["b.mp3"], unchanged=2)
+    with patch('sys.argv', ['program.py', 'sync', 'src', 'dst', '-p', 'profileA', '-j', '2']):
+        with pytest.raises(SystemExit) as pytest_wrapped_e:
+            main()
+    assert pytest_wrapped_e.value.code == 0
+    mock_library_sync.assert_called_once_with('src', 'dst', 'profileA', jobs=2)
+    captured = capsys.readouterr()
+    assert "Encoded 1, removed 1, unchanged 2, failed 0." in captured.out
+
+@patch('encoder_cli.LibrarySync')
+def test_main_sync_headroom(mock_library_sync):
+    from library_sync import SyncReport
+    mock_library_sync.return_value.sync.return_value = SyncReport()
+    with patch('sys.argv', ['program.py', 'sync', 'src', 'dst', '-p', 'profileA', '--headroom', '2G']):
+        with pytest.raises(SystemExit):
+            main()
+    guard = mock_library_sync.call_args.kwargs['admission']
+    assert guard.headroom_bytes == 2 * 1024 ** 3
+
+def test_profiles_measured(tmp_path, capsys):
+    from encode_history import EncodeHistory, EncodeSample
+    history_path = str(tmp_path / "history.sqlite3")
+    with patch('sys.argv', ['program.py', 'profiles', '--measured', '--history-path', history_path]):
+        with pytest.raises(SystemExit) as pytest_wrapped_e:
+            main()
+    assert pytest_wrapped_e.value.code == 0
+    assert "No encodes recorded yet" in capsys.readouterr().out
+
+    EncodeHistory(history_path).record(EncodeSample("MP3 Standard 320kbps", "flac", 400000, 100000, 2.0, 0.1, 0.1))
+    with patch('sys.argv', ['program.py', 'profiles', '--measured', '--history-path', history_path]):
+        with pytest.raises(SystemExit):
+            main()
+    captured = capsys.readouterr()
+    assert "MP3 Standard 320kbps" in captured.out and "0.25" in captured.out
+
+def test_print_progress(capsys):
+    from encoder import ProgressEvent
+    from encoder_cli import print_progress
+    print_progress(ProgressEvent(30_000_000, 1024, 2.0, 15.0, duration_us=60_000_000, output_file="out.flac"))
+    captured = capsys.readouterr()
+    assert captured.out.strip() == "[encoding] out.flac 30.0s 50% speed=2x eta=15s size=1024"
+
+@patch('encoder_cli.encode')
+def test_main_timing(mock_encode, capsys):
+    with patch('sys.argv', ['program.py', 'input.mp3', 'output.mp3', '--timing', '-o', 'encode', '-p', 'profileA']):
+        main()
+    mock_encode.assert_called_once_with('input.mp3', 'output.mp3', 'profileA', None, False, False, False)
+    assert "timing: imports" in capsys.readouterr().err
+
+def test_import_leaves_heavy_modules_unloaded():
+    import subprocess
+    import encoder_cli
+    code = "import sys, encoder_cli, config; print([name for name in encoder_cli.LAZY_MODULES if name in sys.modules], config.file_sink_configured())"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(encoder_cli.__file__), check=True)
+    assert result.stdout.strip() == "[] False"
+
+@patch('encoder_cli.BulkTagger')
+def test_main_tag_directory(mock_bulk_tagger, tmp_path, capsys):
+    from bulk_tagger import TagResult
+    from meta_updater import TagPadding
+    mock_bulk_tagger.collect_jobs.return_value = ["job"]
+    mock_bulk_tagger.return_value.tag.return_value = iter([TagResult("a.flac", True, tags=2), TagResult("b.mp3", False, "broken")])
+    with patch('sys.argv', ['program.py', 'tag', str(tmp_path), '-m', 'album=A', '--manifest', 'tags.json', '-j', '3']):
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+
+    assert exc_info.value.code == 1
+    mock_bulk_tagger.collect_jobs.assert_called_once_with(str(tmp_path), 'tags.json', {'album': 'A'})
+    mock_bulk_tagger.assert_called_once_with(jobs=3, use_processes=True, padding=ANY)
+    # retagging the library later stays in place
+    assert isinstance(mock_bulk_tagger.call_args.kwargs['padding'], TagPadding)
+    assert "Tagging complete! 1/2 files tagged." in capsys.readouterr().out
@@ -0,0 +1,145 @@
+import os
+import pytest
+from unittest.mock import patch
+from models import Profile
+from library_sync import LibrarySync, MANIFEST_FILE
+
+@pytest.fixture
+def profile():
+    return Profile(
+        Name="Test Profile",
+        Codec="MP3",
+        Extension=".mp3",
+        FFmpegSetup="acodec=libmp3lame, b:a=320k",
+        SizeFactor=1.0,
+        CpuFactor=1.0,
+        Description="Test profile description"
+    )
+
+@pytest.fixture
+def library(tmp_path):
+    source = tmp_path / "src"
+    (source / "album").mkdir(parents=True)
+    for name in ["a.flac", "album/b.wav", "album/b.flac", "cover.jpg"]:
+        (source / name).write_bytes(b"source")
+    return str(source), str(tmp_path / "dst")
+
+@pytest.fixture
+def mock_encode():
+    def fake_encode(path, output_path, **kwargs):
+        with open(output_path, "wb") as f:
+            f.write(b"encoded " + path.encode())
+        return output_path
+    with patch("batch_encoder.Encoder.encode", side_effect=fake_encode) as mock:
+        yield mock
+
+def test_sync_mirrors_tree(library, profile, mock_encode):
+    source, output = library
+
+    report = LibrarySync(source, output, profile, jobs=2).sync()
+
+    assert len(report.encoded) == 3 and not report.failed
+    outputs = sorted(os.path.relpath(os.path.join(root, name), output)
+                     for root, _, files in os.walk(output) for name in files)
+    assert outputs == sorted([MANIFEST_FILE, "a.mp3", os.path.join("album", "b_flac.mp3"), os.path.join("album", "b_wav.mp3")])
+
+def test_sibling_sources_do_not_rename_outputs(library, profile, mock_encode):
+    source, output = library
+    LibrarySync(source, output, profile).sync()
+
+    # a.flac keeps a.mp3 when a sibling shows up, the newcomer is suffixed
+    with open(os.path.join(source, "a.wav"), "wb") as f:
+        f.write(b"source")
+    report = LibrarySync(source, output, profile).sync()
+
+    assert report.encoded == [os.path.join(source, "a.wav")] and not report.removed
+    assert os.path.exists(os.path.join(output, "a.mp3")) and os.path.exists(os.path.join(output, "a_wav.mp3"))
+
+def test_sync_is_incremental(library, profile, mock_encode):
+    source, output = library
+    LibrarySync(source, output, profile).sync()
+    mock_encode.reset_mock()
+
+    report = LibrarySync(source, output, profile).sync()
+    assert report.unchanged == 3 and not report.encoded
+    mock_encode.assert_not_called()
+
+    with open(os.path.join(source, "a.flac"), "wb") as f:
+        f.write(b"changed source")
+    os.remove(os.path.join(source, "album", "b.wav"))
+    report = LibrarySync(source, output, profile).sync()
+
+    assert report.encoded == [os.path.join(source, "a.flac")]
+    assert report.removed == [os.path.join(output, "album", "b_wav.mp3")]
+    assert not os.path.exists(os.path.join(output, "album", "b_wav.mp3"))
+    assert report.unchanged == 1
+
+def test_removed_album_leaves_no_empty_directory(library, profile, mock_encode):
+    source, output = library
+    LibrarySync(source, output, profile).sync()
+    for name in ["b.wav", "b.flac"]:
+        os.remove(os.path.join(source, "album", name))
+
+    report = LibrarySync(source, output, profile).sync()
+
+    assert len(report.removed) == 2
+    assert sorted(os.listdir(output)) == sorted([MANIFEST_FILE, "a.mp3"])
+
+def test_removed_output_keeps_directory_with_other_files(library, profile, mock_encode):
+    source, output = library
+    LibrarySync(source, output, profile).sync()
+    with open(os.path.join(output, "album", "notes.txt"), "w") as f:
+        f.write("kept")
+    for name in ["b.wav", "b.flac"]:
+        os.remove(os.path.join(source, "album", name))
+
+    LibrarySync(source, output, profile).sync()
+
+    assert os.listdir(os.path.join(output, "album")) == ["notes.txt"]
+
+def test_source_deleted_during_plan_is_skipped(library, profile, mock_encode):
+    source, output = library
+    LibrarySync(source, output, profile).sync()
+    sync = LibrarySync(source, output, profile)
+    walk = sync._targets
+
+    def walk_then_delete(manifest=None):
+        targets = walk(manifest)
+        os.remove(os.path.join(source, "a.flac"))
+        return targets
+
+    with patch.object(sync, "_targets", side_effect=walk_then_delete):
+        plan = sync.plan()
+
+    assert plan.remove == [os.path.join(output, "a.mp3")] and plan.unchanged == 2
+
+def test_profile_change_reencodes(library, profile, mock_encode):
+    source, output = library
+    LibrarySync(source, output, profile).sync()
+    changed = Profile(Name="Test Profile", Codec="MP3", Extension=".mp3", FFmpegSetup="acodec=libmp3lame, b:a=128k",
+                      SizeFactor=1.0, CpuFactor=1.0, Description="")
+
+    assert len(LibrarySync(source, output, changed).plan().encode) == 3
+
+def test_failed_encode_leaves_no_output(library, profile):
+    source, output = library
+    def failing_encode(path, output_path, **kwargs):
+        with open(output_path, "wb") as f:
+            f.write(b"partial")
+        raise ValueError("broken input")
+
+    with patch("batch_encoder.Encoder.encode", side_effect=failing_encode):
+        report = LibrarySync(source, output, profile).sync()
+
+    assert len(report.failed) == 3
+    assert sorted(os.listdir(output)) == sorted([MANIFEST_FILE, "album"])
+    assert not os.listdir(os.path.join(output, "album"))
+
+def test_dry_run_changes_nothing(library, profile, mock_encode):
+    source, output = library
+
+    report = LibrarySync(source, output, profile).sync(dry_run=True)
+
+    assert len(report.encoded) == 3
+    mock_encode.assert_not_called()
+    assert not os.path.exists(output)
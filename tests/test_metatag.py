@@ -3,7 +3,7 @@ import os
 from unittest.mock import patch, mock_open, MagicMock
 from mutagen.id3 import ID3
 from config import logger, MUTAGEN_AUDIO_TAGS
-from meta_updater import AudioMetaUpdater, AudioFormatError, MetadataError
+from meta_updater import AudioMetaUpdater, AudioFormatError, MetadataError, TagPadding, TagSchema, plan_ffmpeg_tags
 
 class TestAudioMetaUpdater(unittest.TestCase):
 
@@ -77,7 +77,7 @@ class TestAudioMetaUpdater(unittest.TestCase):
     def test_load_tag_mappings(self):
         """Test loading tag mappings from the actual config file."""
         updater = AudioMetaUpdater(os.path.join(self.resources_dir, 'test.mp3'), self.tags_path)
-        mp3_tags, mp4_tags = updater._load_tag_mappings(self.tags_path)
+        mp3_tags, mp4_tags = updater.schema.mp3_tags, updater.schema.mp4_tags
         
         # Test MP3 tags
         self.assertIn('title', mp3_tags)
@@ -219,12 +219,9 @@ class TestAudioMetaUpdater(unittest.TestCase):
         mock_flac.return_value = mock_audio
         test_flac_path = os.path.join(self.resources_dir, 'test.flac')
         
-        # Valid tags file content
-        tags_json = '''{
-            "mp3_tags": {"title": {"mutagen_frame": "TIT2"}},
-            "mp4_tags": {"title": {"mutagen_key": "©nam"}}
-        }'''
-        
+        # The tag schema is compiled once per process, only the metadata file is opened
+        updater = AudioMetaUpdater(test_flac_path, self.tags_path)
+
         test_cases = [
             {
                 'name': 'invalid_json',
@@ -254,12 +251,9 @@ class TestAudioMetaUpdater(unittest.TestCase):
         
         for test_case in test_cases:
             with self.subTest(name=test_case['name']):
-                mock_file = mock_open(read_data=tags_json)
                 mock_metadata_file = mock_open(read_data=test_case['content'])
-                mock_file.side_effect = [mock_file.return_value, mock_metadata_file.return_value]
                 
-                with patch('builtins.open', mock_file):
-                    updater = AudioMetaUpdater(test_flac_path, self.tags_path)
+                with patch('builtins.open', mock_metadata_file):
                     if test_case['error_type']:
                         with self.assertRaises(test_case['error_type']) as context:
                             updater.update_metadata_from_json(os.path.join(self.resources_dir, 'metadata.json'))
@@ -306,9 +300,6 @@ class TestAudioMetaUpdater(unittest.TestCase):
         test_mp3_path = os.path.join(self.resources_dir, 'test.mp3')
         updater = AudioMetaUpdater(test_mp3_path, self.tags_path)
         
-        # Mock the tag mappings with proper module.class format
-        updater._mp3_tag_cache = {'lyrics': {'mutagen_frame': 'mutagen.id3.USLT'}}
-        
         # Test lyrics with language
         updater.update_or_add_metadata('lyrics', 'Test lyrics', lang='spa')
         self.assertTrue(mock_tags.add.called)
@@ -356,4 +347,93 @@ class TestAudioMetaUpdater(unittest.TestCase):
             with self.assertRaises(AudioFormatError) as context:
                 updater = AudioMetaUpdater(test_path, self.tags_path)
                 updater._load_audio_file()
-            self.assertIn("Unsupported audio format", str(context.exception))
\ No newline at end of file
+            self.assertIn("Unsupported audio format", str(context.exception))
+
+    def test_tag_schema_is_shared_and_compiled(self):
+        """Updaters share one compiled schema, with resolved frame classes and decoded atom names."""
+        from mutagen.id3 import TIT2, USLT
+        first = AudioMetaUpdater(os.path.join(self.resources_dir, 'test.mp3'), self.tags_path)
+        second = AudioMetaUpdater(os.path.join(self.resources_dir, 'test.flac'), self.tags_path)
+        self.assertIs(first.schema, second.schema)
+
+        schema = first.schema
+        self.assertIsInstance(schema.id3_frame('title', 'T', 3, 'eng'), TIT2)
+        lyrics = schema.id3_frame('lyrics', 'L', 3, 'spa')
+        self.assertEqual((type(lyrics), lyrics.lang, lyrics.desc), (USLT, 'spa', ''))
+        custom = schema.id3_frame('not_mapped', 'C', 3, 'eng')
+        self.assertEqual((type(custom), custom.desc), (USLT, 'not_mapped'))
+
+        self.assertEqual(schema.mp4_atom('title', 'T'), ('\xa9nam', 'T'))
+        self.assertEqual(schema.mp4_atom('discnumber', '2/3'), ('disk', [(2, 3)]))
+        self.assertEqual(schema.mp4_atom('tracknumber', 4), ('trkn', [(4, 0)]))
+        self.assertEqual(schema.mp4_atom('bpm', '120'), ('tmpo', [120]))
+        self.assertEqual(schema.mp4_atom('isrc', 'X'), ('----:com.apple.iTunes:ISRC', [b'X']))
+        self.assertEqual(schema.mp4_atom('not_mapped', 'C'), ('----:com.apple.iTunes:not_mapped', [b'C']))
+
+    def test_tag_schema_recompiled_when_file_changes(self):
+        """The schema cache is keyed by path and modification time."""
+        import json
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            tags_path = os.path.join(directory, 'tags.json')
+            mappings = {"mp3_tags": {"title": {"mutagen_frame": "mutagen.id3.TIT2"}},
+                        "mp4_tags": {"title": {"mutagen_key": "\\xa9nam"}}}
+            with open(tags_path, 'w') as f:
+                json.dump(mappings, f)
+            schema = TagSchema.load(tags_path)
+            self.assertIs(TagSchema.load(tags_path), schema)
+
+            mappings["mp3_tags"]["album"] = {"mutagen_frame": "mutagen.id3.TALB"}
+            with open(tags_path, 'w') as f:
+                json.dump(mappings, f)
+            os.utime(tags_path, ns=(0, os.stat(tags_path).st_mtime_ns + 1))
+            reloaded = TagSchema.load(tags_path)
+            self.assertIsNot(reloaded, schema)
+            self.assertIn('album', reloaded.id3_frames)
+
+            mappings["mp3_tags"]["album"] = {"mutagen_frame": "mutagen.id3.NOPE"}
+            with open(tags_path, 'w') as f:
+                json.dump(mappings, f)
+            with self.assertRaises(MetadataError) as context:
+                TagSchema.load(tags_path)
+            self.assertIn("Failed to load frame class for tag 'album'", str(context.exception))
+
+    def test_plan_ffmpeg_tags(self):
+        """Tags are split between ffmpeg metadata writing the same frames and the ones left to the updater."""
+        cover = os.path.join(self.resources_dir, 'cover.jpg')
+        tags = [('title', 'Old'), ('Title', 'Song'), ('lyrics', 'La la'), ('bpm', 120),
+                ('tracknumber', '3/9'), ('isrc', 'US1'), ('comment', ''), ('cover_art', cover)]
+
+        plan = plan_ffmpeg_tags('.mp3', tags)
+        self.assertEqual(plan.metadata, {'TIT2': 'Song', 'TBPM': '120', 'TRCK': '3/9', 'TSRC': 'US1'})
+        self.assertEqual(plan.remaining, [('lyrics', 'La la'), ('comment', '')])
+        self.assertEqual(plan.cover_path, cover)
+
+        plan = plan_ffmpeg_tags('.m4a', tags)
+        self.assertEqual(plan.metadata, {'title': 'Song', 'lyrics': 'La la', 'tmpo': '120', 'track': '3/9'})
+        self.assertEqual(plan.remaining, [('isrc', 'US1'), ('comment', '')])
+
+        plan = plan_ffmpeg_tags('.flac', tags)
+        self.assertEqual(plan.metadata, {'title': 'Song', 'lyrics': 'La la', 'bpm': '120', 'tracknumber': '3/9', 'isrc': 'US1'})
+        self.assertEqual(plan.remaining, [('comment', '')])
+
+        # WAV files get every tag from the updater, which ignores cover art
+        plan = plan_ffmpeg_tags('.wav', tags)
+        self.assertEqual((plan.metadata, plan.cover_path, len(plan.remaining)), ({}, None, 7))
+        self.assertIn('tag_plan:cover_art', plan.fingerprint())
+
+        with self.assertRaises(AudioFormatError):
+            plan_ffmpeg_tags('.opus', [('cover_art', cover)])
+        with self.assertRaises(FileNotFoundError):
+            plan_ffmpeg_tags('.mp3', [('cover_art', 'missing.jpg')])
+
+    def test_tag_padding_policy(self):
+        """Padding left is kept, exhausted padding grows with the tags and never below the reserve."""
+        from mutagen import PaddingInfo
+        padding = TagPadding(reserve=1024, growth=2.0)
+        self.assertEqual(padding.padding(PaddingInfo(100, 10 ** 6), tags_size=5000), 100)
+        self.assertEqual(padding.padding(PaddingInfo(-10, 10 ** 6), tags_size=5000), 5000)
+        self.assertEqual(padding.padding(PaddingInfo(-10, 10 ** 6), tags_size=200), 1024)
+        self.assertEqual(padding.padding(PaddingInfo(100, 10 ** 6), top_up=True), 1024)
+        with self.assertRaises(ValueError):
+            TagPadding(growth=0.5)
@@ -0,0 +1,42 @@
+import os
+import pytest
+from native_probe import probe_file
+
+AUDIO_DIR = os.path.join(os.path.dirname(__file__), 'resources', 'audio')
+
+@pytest.mark.parametrize("file_name, codec_name, format_name", [
+    ("test.flac", "flac", "flac"),
+    ("test.mp3", "mp3", "mp3"),
+    ("test.m4a", "aac", "mov,mp4,m4a,3gp,3g2,mj2"),
+    ("test.wav", "pcm_s16le", "wav"),
+])
+def test_probe_file_matches_ffprobe_shape(file_name, codec_name, format_name):
+    file_path = os.path.join(AUDIO_DIR, file_name)
+
+    metadata = probe_file(file_path)
+
+    stream = metadata["streams"][0]
+    assert stream["codec_type"] == "audio"
+    assert stream["codec_name"] == codec_name
+    assert int(stream["sample_rate"]) > 0 and stream["channels"] > 0
+    assert metadata["format"]["format_name"] == format_name
+    assert float(metadata["format"]["duration"]) > 0
+    assert metadata["format"]["size"] == str(os.path.getsize(file_path))
+    tags = metadata["format"]["tags"]
+    assert tags["title"] == "Test Song"
+    assert tags["artist"] == "Test Artist"
+
+def test_probe_file_converts_tag_names():
+    # the lyrics are stored as TXXX:USLT, ffmpeg reports them as lyrics
+    assert probe_file(os.path.join(AUDIO_DIR, "test.mp3"))["format"]["tags"]["lyrics"] == "Test lyrics\nSecond line"
+
+def test_probe_file_bit_depth():
+    assert probe_file(os.path.join(AUDIO_DIR, "test.flac"))["streams"][0]["bits_per_raw_sample"] == "16"
+    assert probe_file(os.path.join(AUDIO_DIR, "test.wav"))["streams"][0]["bits_per_sample"] == 16
+
+def test_probe_file_unsupported(tmp_path):
+    not_audio = tmp_path / "cover.flac"
+    not_audio.write_bytes(b"not audio")
+    assert probe_file(str(not_audio)) is None
+    assert probe_file(os.path.join(AUDIO_DIR, "cover.jpg")) is None
+    assert probe_file(str(tmp_path / "missing.flac")) is None
@@ -0,0 +1,52 @@
+import os
+import pickle
+import time
+import pytest
+from probe_cache import ProbeCache
+
+@pytest.fixture
+def cache(tmp_path):
+    return ProbeCache(str(tmp_path / "probes.sqlite3"), lru_size=2)
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / "song.flac"
+    path.write_bytes(b"audio")
+    return str(path)
+
+def test_miss_then_hit(cache, audio):
+    assert cache.get(audio, "ffprobe 6.0") is None
+    cache.put(audio, "ffprobe 6.0", {"format": {"duration": "1.0"}})
+
+    assert cache.get(audio, "ffprobe 6.0") == {"format": {"duration": "1.0"}}
+    assert cache.get(audio, "ffprobe 7.0") is None
+
+def test_results_persist_across_instances(cache, audio):
+    cache.put(audio, "ffprobe 6.0", {"format": {"duration": "1.0"}})
+    assert ProbeCache(cache.db_path).get(audio, "ffprobe 6.0") == {"format": {"duration": "1.0"}}
+
+def test_modified_file_is_a_miss(cache, audio):
+    cache.put(audio, "ffprobe 6.0", {"format": {"duration": "1.0"}})
+    with open(audio, "wb") as f:
+        f.write(b"new audio content")
+    os.utime(audio, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+    assert cache.get(audio, "ffprobe 6.0") is None
+
+def test_results_are_copies(cache, audio):
+    cache.put(audio, "ffprobe 6.0", {"format": {"tags": {}}})
+    cache.get(audio, "ffprobe 6.0")["format"]["tags"]["title"] = "changed"
+    assert cache.get(audio, "ffprobe 6.0") == {"format": {"tags": {}}}
+
+def test_lru_is_bounded(cache, tmp_path):
+    for i in range(3):
+        path = tmp_path / f"{i}.flac"
+        path.write_bytes(b"audio")
+        cache.put(str(path), "ffprobe 6.0", {"index": i})
+    assert len(cache._lru) == 2
+    # evicted from memory, still served from the database
+    assert cache.get(str(tmp_path / "0.flac"), "ffprobe 6.0") == {"index": 0}
+
+def test_pickle(cache, audio):
+    cache.put(audio, "ffprobe 6.0", {"format": {}})
+    restored = pickle.loads(pickle.dumps(cache))
+    assert restored.get(audio, "ffprobe 6.0") == {"format": {}}
@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from models import Profile
+from batch_encoder import BatchEncoder, BatchJob, EncodeResult
+from scheduler import CpuScheduler, DiskSpaceGuard, ScheduledJob
+
+def make_profile(name, cpu_factor, setup="acodec=libmp3lame"):
+    return Profile(Name=name, Codec="X", Extension=".mp3", FFmpegSetup=setup,
+                   SizeFactor=1.0, CpuFactor=cpu_factor, Description="")
+
+@pytest.fixture
+def mp3():
+    return make_profile("MP3", 1.0)
+
+@pytest.fixture
+def hires():
+    return make_profile("FLAC 192", 3.5, "acodec=flac, compression_level=12")
+
+def scheduled(path, profiles, duration=None):
+    metadata = {'format': {'duration': str(duration)}} if duration is not None else None
+    return ScheduledJob(BatchJob(path), profiles, metadata)
+
+def test_cost_is_duration_times_cpu_factor(mp3, hires):
+    scheduler = CpuScheduler(cores=8)
+
+    assert scheduler.cost(scheduled("a.wav", [hires], 100)) == 350
+    # equivalent profiles are encoded once and count once
+    assert scheduler.cost(scheduled("a.wav", [mp3, make_profile("MP3 copy", 1.0), hires], 100)) == 450
+
+def test_weight_is_one_core_per_encode(mp3, hires):
+    scheduler = CpuScheduler(cores=8)
+
+    # CpuFactor only orders the jobs, a Hi-Res encode still keeps a single core busy
+    assert scheduler.weight(scheduled("a.wav", [hires])) == 1
+    assert scheduler.weight(scheduled("a.wav", [mp3, make_profile("MP3 copy", 1.0), hires])) == 2
+
+def test_weight_uses_measured_cores(mp3, hires):
+    scheduler = CpuScheduler(cores=2, profile_cores={"FLAC 192": 1.5})
+
+    assert scheduler.weight(scheduled("a.wav", [hires])) == 1.5
+    assert scheduler.weight(scheduled("a.wav", [mp3, hires])) == 2
+
+def test_cost_falls_back_to_file_size(mp3, tmp_path):
+    source = tmp_path / "a.wav"
+    source.write_bytes(b"\0" * 44100 * 4 * 2)
+
+    assert CpuScheduler(cores=2).cost(ScheduledJob(BatchJob(str(source)), [mp3])) == pytest.approx(2.0)
+
+def test_order_is_longest_first(mp3, hires):
+    jobs = [scheduled("short.wav", [mp3], 60), scheduled("hires.wav", [hires], 60), scheduled("long.wav", [mp3], 600)]
+
+    ordered = CpuScheduler(cores=4).order(jobs)
+
+    assert [item.job.input_path for item in ordered] == ["long.wav", "hires.wav", "short.wav"]
+
+def test_admission_packs_core_budget(mp3, hires):
+    scheduler = CpuScheduler(cores=3)
+    big, small = scheduled("a.wav", [mp3, hires]), scheduled("b.wav", [mp3])
+
+    assert scheduler.fits(big) is None
+    scheduler.acquire(big)
+    assert scheduler.fits(big) is not None
+    assert scheduler.fits(small) is None
+    scheduler.acquire(small)
+    assert scheduler.fits(small) is not None
+    scheduler.release(big, None)
+    assert scheduler.fits(big) is None
+
+def test_profile_caps(hires):
+    scheduler = CpuScheduler(cores=64, profile_caps={"FLAC 192": 2})
+    for path in ["a.wav", "b.wav"]:
+        scheduler.acquire(scheduled(path, [hires]))
+
+    assert "FLAC 192" in scheduler.fits(scheduled("c.wav", [hires]))
+
+def test_hires_jobs_fill_every_core(hires):
+    scheduler = CpuScheduler(cores=4)
+    for path in ["a.wav", "b.wav", "c.wav", "d.wav"]:
+        job = scheduled(path, [hires])
+        assert scheduler.fits(job) is None
+        scheduler.acquire(job)
+
+    assert scheduler.fits(scheduled("e.wav", [hires])) is not None
+
+def test_oversized_job_still_fits_an_idle_budget(mp3, hires):
+    assert CpuScheduler(cores=1).fits(scheduled("a.wav", [mp3, hires])) is None
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        CpuScheduler(cores=0)
+    with pytest.raises(ValueError):
+        CpuScheduler(profile_caps={"MP3": 0})
+    with pytest.raises(ValueError):
+        CpuScheduler(profile_cores={"MP3": 0})
+
+def test_batch_encoder_schedules_jobs(mp3, hires):
+    durations = {"mp3_short.wav": 10, "mp3_long.wav": 100, "hires_a.wav": 50, "hires_b.wav": 50, "hires_c.wav": 50}
+    jobs = [BatchJob(path, profile=hires if path.startswith("hires") else None) for path in durations]
+    lock = threading.Lock()
+    started, running, peak_cores, peak_hires = [], [], 0, 0
+
+    def fake_encode(encoder, path, output_path, **kwargs):
+        nonlocal peak_cores, peak_hires
+        with lock:
+            started.append(path)
+            running.append(encoder.profile)
+            peak_cores = max(peak_cores, len(running))
+            peak_hires = max(peak_hires, sum(profile is hires for profile in running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(encoder.profile)
+        return output_path
+
+    metadata = {path: {'format': {'duration': str(duration)}} for path, duration in durations.items()}
+    scheduler = CpuScheduler(cores=3, profile_caps={"FLAC 192": 2})
+    with patch("batch_encoder.Encoder.get_metadata_many", return_value=metadata), \
+         patch("batch_encoder.Encoder.encode", autospec=True, side_effect=fake_encode):
+        results = BatchEncoder(mp3, jobs=8, admission=scheduler).encode_all(jobs)
+
+    assert all(result.success for result in results)
+    assert {result.input_path: result.output_path for result in results}["hires_a.wav"] == "hires_a.mp3"
+    assert set(started[:3]) == {"hires_a.wav", "hires_b.wav", "mp3_long.wav"}
+    assert peak_cores <= 3 and peak_hires == 2
+    assert scheduler.cores_in_use == 0
+
+def test_batch_encoder_rejects_jobs_that_never_fit(mp3):
+    class NoRoom(CpuScheduler):
+        def fits(self, job):
+            return "no room"
+
+    with patch("batch_encoder.Encoder.get_metadata_many", return_value={}), \
+         patch("batch_encoder.Encoder.encode") as mock_encode:
+        results = BatchEncoder(mp3, jobs=2, admission=[NoRoom()]).encode_all(["a.wav", "b.wav"])
+
+    assert [result.error for result in results] == ["Not admitted: no room"] * 2
+    mock_encode.assert_not_called()
+
+@pytest.fixture
+def flac():
+    return Profile(Name="FLAC Hi-Res", Codec="FLAC", Extension=".flac", FFmpegSetup="acodec=flac",
+                   SizeFactor=2.5, CpuFactor=2.7, Description="")
+
+def source(tmp_path, name, size=1000):
+    path = tmp_path / name
+    path.write_bytes(b"\0" * size)
+    return str(path)
+
+def test_disk_guard_predicts_from_source_size_and_size_factor(flac, tmp_path):
+    output_path = str(tmp_path / "out" / "a.flac")
+    job = ScheduledJob(BatchJob(source(tmp_path, "a.wav", 4000), output_path), [flac], {'format': {'duration': "100"}})
+
+    assert DiskSpaceGuard(0).predict(job) == {output_path: 10000}
+    # an unreadable source predicts nothing rather than failing the batch
+    assert DiskSpaceGuard(0).predict(ScheduledJob(BatchJob("missing.wav", output_path), [flac])) == {output_path: 0}
+
+def test_disk_guard_holds_jobs_back_until_space_is_released(flac, tmp_path):
+    guard = DiskSpaceGuard(headroom_bytes=1000)
+    jobs = [ScheduledJob(BatchJob(source(tmp_path, f"{name}.wav"), str(tmp_path / f"{name}.flac")), [flac])
+            for name in ["a", "b"]]
+    predicted = 2500
+
+    with patch.object(DiskSpaceGuard, "_free_bytes", return_value=1000 + predicted * 3 // 2):
+        assert guard.fits(jobs[0]) is None
+        guard.acquire(jobs[0])
+        assert "needs" in guard.fits(jobs[1])
+        # bytes already written by the running job no longer count as outstanding
+        (tmp_path / "a.flac").write_bytes(b"\0" * predicted)
+        assert guard.fits(jobs[1]) is None
+        guard.release(jobs[0], EncodeResult("a.wav", str(tmp_path / "a.flac"), True, outputs={"FLAC Hi-Res": str(tmp_path / "a.flac")}))
+
+    assert guard.correction == 1.0
+    assert guard._outstanding(os.stat(str(tmp_path)).st_dev) == 0
+
+def test_disk_guard_learns_from_actual_sizes(flac, tmp_path):
+    guard = DiskSpaceGuard(headroom_bytes=0)
+    output_path = tmp_path / "a.flac"
+    job = ScheduledJob(BatchJob(source(tmp_path, "a.wav"), str(output_path)), [flac])
+    predicted = 2500
+
+    guard.acquire(job)
+    output_path.write_bytes(b"\0" * predicted * 2)
+    guard.release(job, EncodeResult("a.wav", str(output_path), True, outputs={"FLAC Hi-Res": str(output_path)}))
+
+    assert guard.correction == pytest.approx(2.0)
+    assert guard.predict(job)[str(output_path)] == pytest.approx(predicted * 2, abs=1)
+
+def test_batch_encoder_fails_jobs_that_do_not_fit_the_volume(flac, tmp_path):
+    input_path = source(tmp_path, "a.wav", 10 ** 6)
+    with patch.object(DiskSpaceGuard, "_free_bytes", return_value=10 ** 6), \
+         patch("batch_encoder.Encoder.get_metadata_many", return_value={}), \
+         patch("batch_encoder.Encoder.encode") as mock_encode:
+        results = BatchEncoder(flac, admission=DiskSpaceGuard(0)).encode_all([BatchJob(input_path, str(tmp_path / "a.flac"))])
+
+    assert not results[0].success and "Not admitted" in results[0].error
+    mock_encode.assert_not_called()
@@ -0,0 +1,40 @@
+from mutagen.flac import Picture
+from mutagen.id3 import APIC, TIT2, TPE1, WOAR
+from mutagen.mp4 import AtomDataType, MP4Cover, MP4FreeForm
+from tag_diff import diff_tags, normalize_value, tags_equal
+
+def test_normalize_value_per_format():
+    assert normalize_value(TIT2(encoding=3, text=['Song', 'Other'])) == ('Song', 'Other')
+    assert normalize_value(WOAR(url='https://example.com')) == ('https://example.com',)
+    assert normalize_value(['Song']) == ('Song',)
+    assert normalize_value([(3, 12)]) == ('3/12',)
+    assert normalize_value([MP4FreeForm(b'Custom', AtomDataType.UTF8)]) == ('Custom',)
+    assert normalize_value([b'Custom']) == ('Custom',)
+    assert normalize_value([MP4Cover(b'\xff\xd8\xff')]) == (b'\xff\xd8\xff',)
+    assert normalize_value(APIC(encoding=3, mime='image/jpeg', data=b'\xff\xd8\xff')) == (b'\xff\xd8\xff',)
+
+def test_tags_equal_ignores_case_and_order():
+    assert tags_equal({'TITLE': ['Song'], 'artist': ['A', 'B']}, {'title': ['SONG'], 'artist': ['b', 'a']})
+    assert not tags_equal({'title': ['Song']}, {'title': ['Other']})
+    assert not tags_equal({'title': ['Song']}, {'artist': ['Song']})
+    assert not tags_equal({'title': ['Song']}, {'title': ['Song'], 'album': ['Album']})
+    assert tags_equal({'covr': [MP4Cover(b'\x89PNG')]}, {'covr': [MP4Cover(b'\x89PNG')]})
+    assert not tags_equal({'covr': [MP4Cover(b'\x89PNG')]}, {'covr': [MP4Cover(b'\x89PNX')]})
+
+def test_diff_tags_report():
+    original = {'TIT2': TIT2(encoding=3, text=['Song']), 'TPE1': TPE1(encoding=3, text=['Artist'])}
+    updated = {'TIT2': TIT2(encoding=3, text=['Title']), 'TALB': ['Album']}
+    assert diff_tags(original, updated) == [
+        'Value of root[\'TIT2\'] changed from "Song" to "Title".',
+        "Item root['TALB'] (Album) added to dictionary.",
+        "Item root['TPE1'] (Artist) removed from dictionary.",
+    ]
+    assert diff_tags(updated, dict(updated)) == []
+
+def test_diff_tags_reports_binary_frames_by_hash():
+    old, new = Picture(), Picture()
+    old.data, new.data = b'\xff\xd8\xff\x00', b'\xff\xd8\xff\x01'
+    assert diff_tags({'picture': [old]}, {'picture': [old]}) == []
+    lines = diff_tags({'picture': [old]}, {'picture': [new]})
+    assert len(lines) == 1
+    assert '<4 bytes sha1:' in lines[0] and '\\xff' not in lines[0]
@@ -0,0 +1,43 @@
+import os
+import pytest
+from utils import as_tag_list, materialize_file
+
+def test_materialize_file_hardlink_or_reflink(tmp_path):
+    source = tmp_path / "source.flac"
+    source.write_bytes(b"encoded")
+    target = tmp_path / "target.flac"
+
+    method = materialize_file(str(source), str(target))
+
+    assert method in ("reflink", "hardlink")
+    assert target.read_bytes() == b"encoded"
+
+def test_materialize_file_without_hardlink_is_independent(tmp_path):
+    source = tmp_path / "source.flac"
+    source.write_bytes(b"encoded")
+    target = tmp_path / "target.flac"
+
+    method = materialize_file(str(source), str(target), allow_hardlink=False)
+
+    assert method in ("reflink", "copy")
+    target.write_bytes(b"retagged")
+    assert source.read_bytes() == b"encoded"
+    assert os.stat(str(source)).st_nlink == 1
+
+def test_lazy_module_imports_on_first_use():
+    import json
+    from utils import LazyModule
+
+    lazy_json = LazyModule("json")
+
+    assert lazy_json.__dict__['_module'] is None
+    assert lazy_json.dumps is json.dumps
+    assert lazy_json.__dict__['_module'] is json
+
+def test_as_tag_list_formats():
+    expected = [("title", "A"), ("artist", "B")]
+    assert as_tag_list({"title": "A", "artist": "B"}) == expected
+    assert as_tag_list([("title", "A"), ["artist", "B"]]) == expected
+    assert as_tag_list([{"tag_key": "title", "value": "A"}, {"tag_key": "artist", "value": "B"}]) == expected
+    with pytest.raises(ValueError):
+        as_tag_list([{"tag": "title"}])